@@ -0,0 +1,140 @@
+"""
+End-to-end benchmark of kernel.py on synthetic issues with a scripted model, fully offline.
+
+Every instance goes through the real group chat, strategies, history reduction, plugins, git
+mirror/worktrees and a local code executor; only the chat completions come from ScriptedChatModel.
+
+    python -m benchmarks.e2e --instances 8 --concurrency 4 --latency-ms 50 --output e2e.json
+    python -m benchmarks.e2e --baseline e2e.json    # exits with 1 on regressions
+    python -m benchmarks.e2e --stream --latency-ms 200 --chunk-latency-ms 20    # time to first token
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.local_executor import local_executor_factory  # noqa: E402
+from benchmarks.mock_llm import ScriptedChatModel  # noqa: E402
+from benchmarks.report import finish, peak_rss_mb, trace_latencies  # noqa: E402
+from benchmarks.synthetic import generate_instances  # noqa: E402
+
+SERVICE_IDS = ["issue_analyzer", "coder", "file", "tester", "selection", "termination"]
+# What a run creates in its work directory, removed before the next run in the same one
+RUN_DIRS = ["src", "upstream", "coding", "swebench"]
+
+
+def configure(workdir: str, concurrency: int, stream: bool = False):
+    """Points kernel.py at the synthetic upstream, the local executor and the work directory; must run before importing it."""
+    os.environ.update({
+        "OPENAI_API_KEY": "offline",
+        "GITHUB_TOKEN": "offline",
+        "GITHUB_CLONE_URL": f"file://{os.path.join(workdir, 'upstream')}",
+        "EXECUTOR_BACKEND": "local",
+        "WORKSPACE_ROOT": os.path.join(workdir, "coding"),
+        "TRACE_DIR": os.path.join(workdir, "swebench", "traces"),
+        "RESULTS_DB": os.path.join(workdir, "swebench", "results.sqlite"),
+        "TRANSCRIPT_DIR": os.path.join(workdir, "swebench", "transcripts"),
+        "LLM_CACHE_MODE": "passthrough",
+        "MAX_CONCURRENT_INSTANCES": str(concurrency),
+        "STREAM_RESPONSES": "1" if stream else "0",
+    })
+    os.environ.pop("AGENTOPS_API_KEY", None)
+    os.makedirs(os.path.join(workdir, "swebench"), exist_ok=True)
+    # run_instance writes ./swebench/failures.txt
+    os.chdir(workdir)
+
+
+async def run(kernel, rows, model: ScriptedChatModel, store, console: bool) -> tuple:
+    from services import KernelFactory
+    from transcripts import StreamingConsoleSubscriber, TranscriptWriter, console_subscriber
+
+    await kernel.KERNEL_FACTORY.close()
+    kernel.KERNEL_FACTORY = KernelFactory(api_key="offline", models=model.models_for(SERVICE_IDS), transport=model)
+    semaphore = asyncio.Semaphore(kernel.MAX_CONCURRENT_INSTANCES)
+    start = time.perf_counter()
+    subscribers = [StreamingConsoleSubscriber() if kernel.STREAM_RESPONSES else console_subscriber] if console else []
+    async with TranscriptWriter(kernel.TRANSCRIPT_DIR, subscribers=subscribers) as transcripts:
+        await asyncio.gather(*(kernel.run_instance(row, semaphore, transcripts, store) for row in rows))
+    elapsed = time.perf_counter() - start
+    await kernel.KERNEL_FACTORY.close()
+    return elapsed, transcripts.stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=8)
+    parser.add_argument("--repositories", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--modules", type=int, default=50, help="modules per synthetic repository")
+    parser.add_argument("--functions", type=int, default=20, help="functions per module")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated model latency per request")
+    parser.add_argument("--stream", action="store_true", help="stream the agents' replies")
+    parser.add_argument("--chunk-latency-ms", type=float, default=0.0, help="simulated delay between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the run here instead of a temporary directory")
+    parser.add_argument("--console", action="store_true", help="print the transcripts while running")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--baseline", help="report JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="swe-mas-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    for name in RUN_DIRS:
+        shutil.rmtree(os.path.join(workdir, name), ignore_errors=True)
+
+    generation_start = time.perf_counter()
+    rows = generate_instances(workdir, args.repositories, args.instances, args.modules, args.functions, args.seed)
+    generation = time.perf_counter() - generation_start
+
+    configure(workdir, args.concurrency, args.stream)
+    import kernel
+    from results import ResultsStore
+
+    kernel.EXECUTOR_FACTORIES["local"] = local_executor_factory
+
+    store = ResultsStore(os.environ["RESULTS_DB"])
+
+    model = ScriptedChatModel(latency=args.latency_ms / 1000, chunk_latency=args.chunk_latency_ms / 1000)
+    if args.tracemalloc:
+        tracemalloc.start()
+    elapsed, transcript_stats = asyncio.run(run(kernel, rows, model, store, args.console))
+
+    results = store.summary()
+    store.close()
+    report = {
+        "workdir": workdir,
+        "instances": len(rows),
+        "completed": results["by_status"].get("completed", 0),
+        "with_patch": results["with_patch"],
+        "prompt_tokens": results["prompt_tokens"],
+        "completion_tokens": results["completion_tokens"],
+        "concurrency": args.concurrency,
+        "model_latency_ms": args.latency_ms,
+        "stream": args.stream,
+        "model_requests": sum(model.requests.values()),
+        "transcript_entries": transcript_stats["entries"],
+        "transcript_backpressure_waits": transcript_stats["backpressure_waits"],
+        "repository_generation_s": round(generation, 2),
+        "wall_s": round(elapsed, 2),
+        "instances_per_minute": round(len(rows) / elapsed * 60, 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if args.tracemalloc:
+        report["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    report["latencies"] = trace_latencies(os.environ["TRACE_DIR"])
+    return finish(report, output, baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
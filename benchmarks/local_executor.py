@@ -0,0 +1,16 @@
+"""Code executor for the offline benchmarks: runs the tester's code as local subprocesses, without Docker."""
+from autogen_ext.code_executors.local import LocalCommandLineCodeExecutor
+
+
+class LocalExecutor(LocalCommandLineCodeExecutor):
+    """Runs code blocks as local subprocesses (no isolation); for offline benchmarks only."""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+def local_executor_factory(work_dir: str) -> LocalExecutor:
+    return LocalExecutor(work_dir=work_dir)
@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import json
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Union
+import httpx
+from sk_prompts import CODER_NAME
+
+# A scripted response: {"content": str} and/or {"tools": [{"name": "Plugin-function", "arguments": {...}}]}.
+# Strings are formatted with the conversation context (see ScriptedChatModel.context).
+ScriptStep = Union[dict, Callable[[dict, dict], dict]]
+
+# The SWE workflow of kernel.py for one synthetic issue, per service id
+SWE_SCRIPT: Dict[str, List[ScriptStep]] = {
+    "issue_analyzer": [
+        {"tools": [{"name": "GitHubPlugin-clone_repository",
+                    "arguments": {"organization": "{owner}", "repository_name": "{name}"}}]},
+        {"tools": [{"name": "GitHubPlugin-checkout_commit",
+                    "arguments": {"repository": "{name}", "commit_hash": "{commit}"}}]},
+        {"content": "The repository {name} is checked out at {commit}. {function} in {file} returns a wrong value."},
+    ],
+    "coder": [
+        {"content": "Replace the body of {function} in {file} with `{fix}`."},
+    ],
+    "file": [
+        {"tools": [{"name": "FilePlugin-search_code",
+                    "arguments": {"repository_name": "{name}", "query": "def {function}"}}]},
+        {"tools": [{"name": "FilePlugin-read_file",
+                    "arguments": {"file_path": "{file}", "repo": "{name}", "symbol": "{function}"}}]},
+        {"tools": [{"name": "FilePlugin-modify_function",
+                    "arguments": {"repository_name": "{name}", "file_path": "{file}",
+                                  "function_name": "{function}", "content": "{fix}"}}]},
+        {"content": "{function} was updated. TERMINATE"},
+    ],
+    "tester": [
+        {"tools": [{"name": "ExecutorPlugin-run_code_executor_agent",
+                    "arguments": {"code": "```sh\npython -m pytest -p no:cacheprovider {test}\n```", "repo_name": "{name}"}}]},
+        {"content": "The test passes."},
+    ],
+    # Only reached when no rule applies
+    "selection": [{"content": CODER_NAME}],
+    "termination": [{"content": "no"}],
+}
+
+_TASK = re.compile(r"(?P<owner>[^/\s]+)/(?P<name>[^/\s]+)/(?P<issue>\d+) with base commit (?P<commit>\w+)")
+_FIELD = re.compile(r"^(file|function|test): (\S+)$|^fix: `([^`]+)`$", re.MULTILINE)
+
+
+def _format(value, context: dict):
+    if isinstance(value, str):
+        return value.format(**context)
+    if isinstance(value, dict):
+        return {key: _format(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_format(item, context) for item in value]
+    return value
+
+
+class ScriptedChatModel(httpx.AsyncBaseTransport):
+    """httpx transport that answers OpenAI chat completion requests from a script, fully offline.
+
+    The service is read from the requested model ("mock-<service_id>", see models_for()), the
+    conversation from its first user message, and every (conversation, service) pair walks
+    through its script in order, repeating the last step once it is exhausted. Token usage is
+    estimated at four characters per token.
+
+    Streaming requests are answered as server-sent events: latency passes before the first chunk
+    and chunk_latency between the chunks of chunk_chars characters each.
+    """
+
+    def __init__(self, script: Optional[Dict[str, List[ScriptStep]]] = None, latency: float = 0.0,
+                 chunk_latency: float = 0.0, chunk_chars: int = 16):
+        self.script = script or SWE_SCRIPT
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunk_chars = chunk_chars
+        self.requests = Counter()
+        self._steps: Counter = Counter()
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def models_for(service_ids) -> Dict[str, str]:
+        """Model map for KernelFactory(models=...) that routes every service to its script."""
+        return {service_id: f"mock-{service_id}" for service_id in service_ids}
+
+    @staticmethod
+    def context(messages: List[dict]) -> dict:
+        """Values the script can use, read from the task message kernel.run_instance sends."""
+        task = next((message.get("content") or "" for message in messages if message.get("role") == "user"), "")
+        context = {}
+        match = _TASK.search(task)
+        if match:
+            context.update(match.groupdict())
+        for field, value, fix in _FIELD.findall(task):
+            context[field or "fix"] = value or fix
+        return context
+
+    def respond(self, body: dict) -> dict:
+        service = body["model"].removeprefix("mock-")
+        messages = body.get("messages", [])
+        context = self.context(messages)
+        key = (context.get("commit"), context.get("issue"), context.get("name"), service)
+        steps = self.script.get(service) or [{"content": "OK"}]
+        step = steps[min(self._steps[key], len(steps) - 1)]
+        self._steps[key] += 1
+        self.requests[service] += 1
+        step = step(body, context) if callable(step) else _format(step, context)
+
+        message = {"role": "assistant", "content": step.get("content")}
+        if step.get("tools"):
+            message["tool_calls"] = [
+                {"id": f"call_{next(self._ids)}", "type": "function",
+                 "function": {"name": tool["name"], "arguments": json.dumps(tool["arguments"])}}
+                for tool in step["tools"]
+            ]
+        prompt_tokens = len(json.dumps(messages)) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return {
+            "id": f"chatcmpl-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "tool_calls" if step.get("tools") else "stop", "message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def chunks(self, completion: dict, include_usage: bool) -> List[dict]:
+        """The chat.completion.chunk events of a completion: text deltas, tool calls, finish and usage."""
+        choice = completion["choices"][0]
+        message = choice["message"]
+        base = {"id": completion["id"], "object": "chat.completion.chunk", "created": 0, "model": completion["model"]}
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> dict:
+            return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        content = message.get("content") or ""
+        chunks = [chunk({"role": "assistant", "content": content[:self.chunk_chars]})]
+        chunks += [chunk({"content": content[start:start + self.chunk_chars]})
+                   for start in range(self.chunk_chars, len(content), self.chunk_chars)]
+        for index, call in enumerate(message.get("tool_calls", [])):
+            chunks.append(chunk({"tool_calls": [{"index": index, **call}]}))
+        chunks.append(chunk({}, choice["finish_reason"]))
+        if include_usage:
+            chunks.append({**base, "choices": [], "usage": completion["usage"]})
+        return chunks
+
+    async def _events(self, chunks: List[dict]):
+        for index, chunk in enumerate(chunks):
+            if index and self.chunk_latency:
+                await asyncio.sleep(self.chunk_latency)
+            yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+        yield b"data: [DONE]\n\n"
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(404, json={"error": {"message": f"Not scripted: {request.url.path}"}})
+        body = json.loads(await request.aread())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        completion = self.respond(body)
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  content=self._events(self.chunks(completion, include_usage)))
+        return httpx.Response(200, json=completion)
@@ -0,0 +1,88 @@
+import glob
+import json
+import os
+import resource
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+from tracing import percentile
+
+
+def latency_stats(durations: List[float]) -> dict:
+    """Percentiles of durations given in seconds, reported in milliseconds."""
+    return {
+        "count": len(durations),
+        "p50_ms": round(percentile(durations, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2) if durations else 0.0,
+    }
+
+
+def trace_latencies(trace_dir: str) -> Dict[str, dict]:
+    """Latency percentiles per "kind:name" (and "kind:name ttft" for streamed spans) over the JSONL traces of a run."""
+    durations = defaultdict(list)
+    for path in glob.glob(os.path.join(trace_dir, "*.jsonl")):
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                if record.get("kind") != "summary":
+                    durations[f"{record['kind']}:{record['name']}"].append(record["duration_ms"] / 1000)
+                    if "ttft_ms" in record:
+                        durations[f"{record['kind']}:{record['name']} ttft"].append(record["ttft_ms"] / 1000)
+    return {name: latency_stats(values) for name, values in sorted(durations.items())}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux and bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{key}: {value}" for key, value in report.items() if not isinstance(value, dict)]
+    latencies = report.get("latencies", {})
+    if latencies:
+        width = max(len(name) for name in latencies)
+        lines.append("")
+        lines.append(f"{'operation'.ljust(width)}  {'count':>6}  {'p50 ms':>9}  {'p95 ms':>9}  {'max ms':>9}")
+        for name, stats in latencies.items():
+            lines.append(f"{name.ljust(width)}  {stats['count']:>6}  {stats['p50_ms']:>9.2f}  "
+                         f"{stats['p95_ms']:>9.2f}  {stats['max_ms']:>9.2f}")
+    return "\n".join(lines)
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.25, min_delta_ms: float = 2.0,
+            throughput_key: Optional[str] = "instances_per_minute") -> List[str]:
+    """
+    Lists the regressions of a report against a baseline report of the same benchmark.
+
+    An operation regresses if its p50 grew by more than tolerance and by more than min_delta_ms,
+    so sub-millisecond noise does not fail a run.
+    """
+    regressions = []
+    for name, stats in report.get("latencies", {}).items():
+        before = baseline.get("latencies", {}).get(name)
+        if before is None:
+            continue
+        delta = stats["p50_ms"] - before["p50_ms"]
+        if delta > min_delta_ms and stats["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before['p50_ms']}ms -> {stats['p50_ms']}ms")
+    if throughput_key and throughput_key in report and throughput_key in baseline:
+        if report[throughput_key] < baseline[throughput_key] * (1 - tolerance):
+            regressions.append(f"{throughput_key}: {baseline[throughput_key]} -> {report[throughput_key]}")
+    return regressions
+
+
+def finish(report: dict, output: Optional[str], baseline: Optional[str], tolerance: float) -> int:
+    """Prints the report, writes it as JSON and returns the exit code (1 on regressions)."""
+    print(format_report(report))
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if not baseline:
+        return 0
+    with open(baseline, "r", encoding="utf-8") as file:
+        regressions = compare(report, json.load(file), tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
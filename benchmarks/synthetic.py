@@ -0,0 +1,128 @@
+import os
+import random
+import subprocess
+from typing import List, Tuple
+
+# No digits: run_instance takes the first number in an instance id as the issue number
+PROJECT_NAMES = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+def _git(*args: str, cwd: str) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def _module_source(rng: random.Random, module: int, functions: int, bugs: set) -> Tuple[str, List[tuple]]:
+    """A module of small arithmetic functions and a class; returns its source and (function, correct body, f(3)) triples."""
+    lines = [f'"""Synthetic module {module}."""', "import math", ""]
+    bodies = []
+    for index in range(functions):
+        name = f"compute_m{module}_f{index}"
+        factor, offset = rng.randint(2, 9), rng.randint(0, 9)
+        body = f"return x * {factor} + {offset}"
+        bodies.append((name, body, 3 * factor + offset))
+        written = f"return x * {factor} + {offset + 1}" if name in bugs else body
+        lines += [
+            "",
+            f"def {name}(x):",
+            f'    """Scales x by {factor} and shifts it by {offset}."""',
+            "    # keep the arithmetic simple, the tests check exact values",
+            f"    {written}",
+            "",
+        ]
+    lines += [
+        "",
+        f"class Accumulator{module}:",
+        f'    """Collects values of module {module}."""',
+        "",
+        "    def __init__(self):",
+        "        self.values = []",
+        "",
+        "    def add(self, value):",
+        "        self.values.append(value)",
+        "        return len(self.values)",
+        "",
+        "    def norm(self):",
+        "        return math.sqrt(sum(value * value for value in self.values))",
+        "",
+    ]
+    return "\n".join(lines), bodies
+
+
+def generate_repository(root: str, owner: str, name: str, modules: int = 50, functions: int = 20,
+                        bugs: int = 4, seed: int = 0) -> Tuple[str, List[dict]]:
+    """
+    Creates a synthetic Python project and publishes it as a bare repository at root/upstream/owner/name.git.
+
+    Every module has `functions` functions with a test each; `bugs` functions return a wrong value
+    at the base commit.
+
+    Returns:
+        Tuple[str, List[dict]]: The base commit and one entry per bug (file, function, fix, test).
+    """
+    rng = random.Random(f"{seed}:{owner}/{name}")
+    work = os.path.join(root, "src", owner, name)
+    package = os.path.join(work, "project")
+    os.makedirs(package, exist_ok=True)
+    os.makedirs(os.path.join(work, "tests"), exist_ok=True)
+    with open(os.path.join(package, "__init__.py"), "w") as file:
+        file.write('"""Synthetic benchmark project."""\n')
+
+    buggy = set(rng.sample([f"compute_m{m}_f{f}" for m in range(modules) for f in range(functions)], bugs))
+    found = []
+    for module in range(modules):
+        source, bodies = _module_source(rng, module, functions, buggy)
+        with open(os.path.join(package, f"mod{module}.py"), "w") as file:
+            file.write(source)
+        tests = [f"from project.mod{module} import *", ""]
+        for function, body, expected in bodies:
+            tests += ["", f"def test_{function}():", f"    assert {function}(3) == {expected}", ""]
+            if function in buggy:
+                found.append({
+                    "file": f"project/mod{module}.py",
+                    "function": function,
+                    "fix": body,
+                    "test": f"tests/test_mod{module}.py::test_{function}",
+                })
+        with open(os.path.join(work, "tests", f"test_mod{module}.py"), "w") as file:
+            file.write("\n".join(tests))
+    with open(os.path.join(work, "README.md"), "w") as file:
+        file.write(f"# {name}\n\nSynthetic repository for offline benchmarks.\n")
+
+    _git("init", "-q", "-b", "main", cwd=work)
+    _git("add", "-A", cwd=work)
+    _git("-c", "user.name=bench", "-c", "user.email=bench@example.com", "commit", "-q", "-m", "Base", cwd=work)
+    commit = _git("rev-parse", "HEAD", cwd=work).strip()
+
+    bare = os.path.join(root, "upstream", owner, f"{name}.git")
+    os.makedirs(os.path.dirname(bare), exist_ok=True)
+    _git("clone", "-q", "--bare", work, bare, cwd=root)
+    return commit, found
+
+
+def generate_instances(root: str, repositories: int = 2, instances: int = 8, modules: int = 50,
+                       functions: int = 20, seed: int = 0) -> List[dict]:
+    """
+    Generates repositories and SWE-bench style rows that point at their bugs.
+
+    The upstream repositories live under root/upstream, so GITHUB_CLONE_URL=file://<root>/upstream.
+    """
+    if repositories > len(PROJECT_NAMES):
+        raise ValueError(f"At most {len(PROJECT_NAMES)} repositories are supported")
+    per_repository = -(-instances // repositories)
+    rows = []
+    for index in range(repositories):
+        name = f"project-{PROJECT_NAMES[index]}"
+        commit, bugs = generate_repository(root, "synthetic", name, modules, functions, per_repository, seed)
+        for number, bug in enumerate(bugs, start=1):
+            if len(rows) == instances:
+                break
+            rows.append({
+                "instance_id": f"synthetic__{name}-{100 + number}",
+                "repo": f"synthetic/{name}",
+                "base_commit": commit,
+                "problem_statement": (
+                    f"{bug['function']} returns a wrong value.\n"
+                    f"file: {bug['file']}\nfunction: {bug['function']}\nfix: `{bug['fix']}`\ntest: {bug['test']}\n"
+                ),
+            })
+    return rows
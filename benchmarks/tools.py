@@ -0,0 +1,120 @@
+"""
+Micro-benchmarks of the FilePlugin and GitHubPlugin operations on a synthetic repository, offline.
+
+    python -m benchmarks.tools --modules 500 --repeat 20 --output tools.json
+    python -m benchmarks.tools --modules 500 --baseline tools.json    # exits with 1 on regressions
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.report import finish, latency_stats, peak_rss_mb  # noqa: E402
+from benchmarks.synthetic import generate_repository  # noqa: E402
+from plugins.file_plugin import FilePlugin  # noqa: E402
+from plugins.github import GitHubPlugin, GitHubSettings  # noqa: E402
+
+OWNER, NAME = "synthetic", "project-alpha"
+
+
+class Timer:
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    async def measure(self, name: str, call, *args, **kwargs):
+        start = time.perf_counter()
+        result = call(*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            result = await result
+        self.durations[name].append(time.perf_counter() - start)
+        if isinstance(result, str) and result.startswith("Error"):
+            raise RuntimeError(f"{name} failed: {result}")
+        return result
+
+
+async def bench_github(timer: Timer, root: str, commit: str, repeat: int):
+    settings = GitHubSettings(token="offline", clone_url=f"file://{os.path.join(root, 'upstream')}")
+    mirror_root = os.path.join(root, "mirrors")
+    for index in range(repeat):
+        # The first clone creates the mirror, the others only add worktrees
+        workspace = os.path.join(root, "coding", f"github-{index}")
+        plugin = GitHubPlugin(settings=settings, workspace=workspace, mirror_root=mirror_root)
+        name = "github:clone_repository (cold mirror)" if index == 0 else "github:clone_repository (warm mirror)"
+        await timer.measure(name, plugin.clone_repository, OWNER, NAME)
+        await timer.measure("github:checkout_commit", plugin.checkout_commit, NAME, commit)
+
+
+async def bench_files(timer: Timer, root: str, bugs: list, repeat: int):
+    workspace = os.path.join(root, "coding", "files")
+    shutil.copytree(os.path.join(root, "src", OWNER, NAME), os.path.join(workspace, NAME))
+    target = bugs[0]
+
+    # First calls build the listing, symbol and trigram indexes
+    cold = FilePlugin(workspace=workspace)
+    await timer.measure("file:list_files_in_repository (cold)", cold.list_files_in_repository, NAME)
+    await timer.measure("file:find_symbol (cold index)", cold.find_symbol, NAME, target["function"])
+    await timer.measure("file:search_code (cold index)", cold.search_code, NAME, f"def {target['function']}")
+
+    # A new plugin loads the persisted indexes from disk
+    plugin = FilePlugin(workspace=workspace)
+    await timer.measure("file:find_symbol (persisted index)", plugin.find_symbol, NAME, target["function"])
+    await timer.measure("file:search_code (persisted index)", plugin.search_code, NAME, f"def {target['function']}")
+
+    for index in range(repeat):
+        await timer.measure("file:list_files_in_repository", plugin.list_files_in_repository, NAME, extensions="py")
+        await timer.measure("file:search_code literal", plugin.search_code, NAME, target["function"])
+        await timer.measure("file:search_code regex", plugin.search_code, NAME, r"return x \* \d \+ 7", regex=True)
+        await timer.measure("file:find_symbol", plugin.find_symbol, NAME, target["function"])
+        await timer.measure("file:read_file whole", plugin.read_file, target["file"], NAME)
+        await timer.measure("file:read_file symbol", plugin.read_file, target["file"], NAME, symbol=target["function"])
+        await timer.measure("file:list_functions", plugin.list_functions, NAME, target["file"])
+        await timer.measure("file:modify_function", plugin.modify_function, NAME, target["file"],
+                            target["function"], f"{target['fix']}  # edit {index}")
+        edits = json.dumps([
+            {"op": "replace", "file": bug["file"], "count": 1,
+             "old": f"simple{'!' * index}, the tests", "new": f"simple{'!' * (index + 1)}, the tests"}
+            for bug in bugs[1:3]
+        ])
+        await timer.measure("file:apply_edits (2 files)", plugin.apply_edits, NAME, edits)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", type=int, default=200, help="modules in the synthetic repository")
+    parser.add_argument("--functions", type=int, default=20, help="functions per module")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--baseline", help="report JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="swe-mas-tools-")
+    try:
+        commit, bugs = generate_repository(root, OWNER, NAME, args.modules, args.functions, bugs=3, seed=args.seed)
+        timer = Timer()
+        asyncio.run(bench_github(timer, root, commit, args.repeat))
+        asyncio.run(bench_files(timer, root, bugs, args.repeat))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "modules": args.modules,
+        "functions_per_module": args.functions,
+        "repeat": args.repeat,
+        "peak_rss_mb": peak_rss_mb(),
+        "latencies": {name: latency_stats(durations) for name, durations in timer.durations.items()},
+    }
+    return finish(report, args.output, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import hashlib
+import heapq
+from typing import Iterator, List, Optional, Sequence
+import pyarrow.parquet as pq
+
+# The only columns the runner reads from a SWE-bench split
+INSTANCE_COLUMNS = ("repo", "instance_id", "base_commit", "problem_statement")
+
+
+class ParquetDatasetSource:
+    """Streams SWE-bench instances from a parquet file without materializing the whole table"""
+
+    def __init__(self, path: str, columns: Sequence[str] = INSTANCE_COLUMNS, batch_size: int = 256):
+        self.path = path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+
+    def __len__(self) -> int:
+        # Read from the footer metadata, no row data is touched
+        return pq.ParquetFile(self.path).metadata.num_rows
+
+    def iter_rows(self, shard_index: int = 0, num_shards: int = 1) -> Iterator[dict]:
+        """
+        Yields the projected rows one record batch at a time.
+
+        Args:
+            shard_index (int): Which shard to yield (0 <= shard_index < num_shards).
+            num_shards (int): Number of interleaved shards the file is split into.
+
+        Returns:
+            Iterator[dict]: One dict per instance, holding only the projected columns.
+        """
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+
+        parquet_file = pq.ParquetFile(self.path)
+        position = 0
+        for batch in parquet_file.iter_batches(batch_size=self.batch_size, columns=self.columns):
+            for row in batch.to_pylist():
+                if position % num_shards == shard_index:
+                    yield row
+                position += 1
+
+    @staticmethod
+    def _sort_key(seed: int, row: dict) -> str:
+        """Stable pseudo-random position of a row in the seeded permutation."""
+        return hashlib.sha256(f"{seed}:{row['instance_id']}".encode("utf-8")).hexdigest()
+
+    def select(self,
+               seed: Optional[int] = None,
+               start: int = 0,
+               stop: Optional[int] = None,
+               shard_index: int = 0,
+               num_shards: int = 1) -> List[dict]:
+        """
+        Selects a slice of instances, optionally from a seeded permutation of the split.
+
+        With a seed, every row is ranked by a hash of (seed, instance_id) and only the
+        `stop` lowest ranked rows are kept while streaming, so memory is bounded by the
+        slice end instead of the dataset size. The order is reproducible across runs and
+        independent of the row order inside the file.
+
+        Args:
+            seed (int): Seed of the permutation, None keeps the file order.
+            start (int): First position of the slice.
+            stop (int): End position of the slice (exclusive), None for everything.
+            shard_index (int): Shard to select from.
+            num_shards (int): Number of interleaved shards.
+
+        Returns:
+            List[dict]: The selected instances.
+        """
+        rows = self.iter_rows(shard_index=shard_index, num_shards=num_shards)
+
+        if seed is None:
+            selected = []
+            for position, row in enumerate(rows):
+                if stop is not None and position >= stop:
+                    break
+                if position >= start:
+                    selected.append(row)
+            return selected
+
+        keyed = ((self._sort_key(seed, row), row) for row in rows)
+        if stop is None:
+            ranked = sorted(keyed, key=lambda item: item[0])
+        else:
+            ranked = heapq.nsmallest(stop, keyed, key=lambda item: item[0])
+        return [row for _, row in ranked[start:stop]]
@@ -0,0 +1,192 @@
+import functools
+import time
+from collections import Counter
+from collections.abc import AsyncIterable
+from typing import List, Optional
+from semantic_kernel.agents import ChatCompletionAgent
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from tracing import trace
+
+# Per-message overhead of the chat format (role, name, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@functools.lru_cache(maxsize=None)
+def load_encoding(model: str):
+    """
+    Returns the tiktoken encoding for the model, or None if it is not available locally.
+
+    Loaded once per model and process; every group chat creates several reducers.
+    """
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:  # not installed, unknown model or the BPE file can not be fetched offline
+        print(f"HISTORY no tiktoken encoding for {model} ({type(e).__name__}), estimating tokens as characters / 4")
+        return None
+
+
+class TokenBudgetHistoryReducer:
+    """Shrinks a chat history to a token budget before it is sent to a model.
+
+    The first user message (the issue) and the last `keep_last` messages are kept verbatim.
+    Older tool outputs are cut down to their head and tail, and if the history is still over
+    budget the oldest turns are dropped, keeping tool calls and their results together.
+    """
+
+    def __init__(self,
+                 max_tokens: int = 16000,
+                 keep_last: int = 6,
+                 tool_output_chars: int = 1500,
+                 model: str = "gpt-4o-mini"):
+        self.max_tokens = max_tokens
+        self.keep_last = keep_last
+        self.tool_output_chars = tool_output_chars
+        self.encoding = load_encoding(model)
+        self.stats = Counter()
+
+    def count_text(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        # Rough estimate for English text and code when no tokenizer is available
+        return len(text) // 4 + 1
+
+    def count_message(self, message: ChatMessageContent) -> int:
+        tokens = MESSAGE_OVERHEAD_TOKENS
+        for item in message.items:
+            if isinstance(item, FunctionCallContent):
+                tokens += self.count_text(f"{item.name}{item.arguments or ''}")
+            elif isinstance(item, FunctionResultContent):
+                tokens += self.count_text(str(item.result))
+            else:
+                tokens += self.count_text(str(item))
+        return tokens
+
+    def count(self, messages: List[ChatMessageContent]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+    def truncate_tool_outputs(self, message: ChatMessageContent, limit: int) -> ChatMessageContent:
+        """Returns a copy of the message with every tool result longer than limit cut to head and tail."""
+        if not any(isinstance(item, FunctionResultContent) and len(str(item.result)) > limit for item in message.items):
+            return message
+        items = []
+        for item in message.items:
+            text = str(item.result) if isinstance(item, FunctionResultContent) else None
+            if text is not None and len(text) > limit:
+                half = limit // 2
+                omitted = len(text) - 2 * half
+                text = f"{text[:half]}\n[... {omitted} characters truncated ...]\n{text[-half:]}"
+                item = item.model_copy(update={"result": text})
+            items.append(item)
+        return message.model_copy(update={"items": items})
+
+    @staticmethod
+    def turn_blocks(messages: List[ChatMessageContent]) -> List[List[ChatMessageContent]]:
+        """Groups messages so that tool results always stay with the assistant message that called them."""
+        blocks = []
+        for message in messages:
+            if message.role == AuthorRole.TOOL and blocks:
+                blocks[-1].append(message)
+            else:
+                blocks.append([message])
+        return blocks
+
+    def reduce(self, messages: List[ChatMessageContent], caller: str = "") -> List[ChatMessageContent]:
+        """
+        Reduces the messages to the token budget.
+
+        Args:
+            messages (List[ChatMessageContent]): The full history, it is not modified.
+            caller (str): Name of the agent or strategy, used for the per-caller statistics.
+
+        Returns:
+            List[ChatMessageContent]: The messages to send.
+        """
+        before = self.count(messages)
+        if before <= self.max_tokens:
+            self._record(caller, before, before)
+            return list(messages)
+
+        blocks = self.turn_blocks(messages)
+        # The leading system instructions and the issue description are always kept
+        pinned = 0
+        while pinned < len(blocks) and blocks[pinned][0].role in (AuthorRole.SYSTEM, AuthorRole.DEVELOPER, AuthorRole.USER):
+            pinned += 1
+            if blocks[pinned - 1][0].role == AuthorRole.USER:
+                break
+
+        recent = len(blocks)
+        kept_messages = 0
+        while recent > pinned and kept_messages < self.keep_last:
+            recent -= 1
+            kept_messages += len(blocks[recent])
+
+        head = blocks[:pinned]
+        older = [[self.truncate_tool_outputs(m, self.tool_output_chars) for m in block] for block in blocks[pinned:recent]]
+        tail = blocks[recent:]
+
+        def flatten(groups):
+            return [message for group in groups for message in group]
+
+        while older and self.count(flatten(head + older + tail)) > self.max_tokens:
+            older.pop(0)
+
+        reduced = flatten(head + older + tail)
+        if self.count(reduced) > self.max_tokens:
+            # The recent turns alone are over budget, so their tool outputs have to give way as well
+            reduced = [self.truncate_tool_outputs(m, self.tool_output_chars) for m in reduced]
+
+        after = self.count(reduced)
+        self._record(caller, before, after)
+        return reduced
+
+    def _record(self, caller: str, before: int, after: int):
+        self.stats["calls"] += 1
+        self.stats["tokens_in"] += before
+        self.stats["tokens_out"] += after
+        self.stats["tokens_saved"] += before - after
+        if caller:
+            self.stats[f"tokens_saved:{caller}"] += before - after
+
+
+class ReducingChatCompletionAgent(ChatCompletionAgent):
+    """ChatCompletionAgent that sends a reduced view of the group chat history to its model."""
+
+    history_reducer: Optional[TokenBudgetHistoryReducer] = None
+    agentops_name: Optional[str] = None
+
+    def __init__(self, history_reducer: Optional[TokenBudgetHistoryReducer] = None,
+                 agentops_name: Optional[str] = None, **kwargs):
+        # ChatCompletionAgent.__init__ has a fixed signature and rejects unknown keywords
+        super().__init__(**kwargs)
+        self.history_reducer = history_reducer
+        self.agentops_name = agentops_name
+
+    def _setup_agent_chat_history(self, history: ChatHistory) -> ChatHistory:
+        chat = super()._setup_agent_chat_history(history)
+        if self.history_reducer is None:
+            return chat
+        return ChatHistory(messages=self.history_reducer.reduce(chat.messages, caller=self.name))
+
+    async def invoke(self, history: ChatHistory) -> AsyncIterable[ChatMessageContent]:
+        with trace("turn", self.name) as span:
+            span["messages"] = 0
+            async for message in super().invoke(history):
+                span["messages"] += 1
+                yield message
+
+    async def invoke_stream(self, history: ChatHistory) -> AsyncIterable[StreamingChatMessageContent]:
+        with trace("turn", self.name, stream=True) as span:
+            start = time.perf_counter()
+            span["chunks"] = 0
+            async for message in super().invoke_stream(history):
+                span["chunks"] += 1
+                # Time until the first visible text, including any tool calls made before it
+                if "ttft_ms" not in span and message.content:
+                    span["ttft_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                yield message
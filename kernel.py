@@ -1,10 +1,11 @@
 import asyncio
 import os
-import agentops
+import shutil
+from typing import Optional
 from semantic_kernel import Kernel
-from semantic_kernel.agents import ChatCompletionAgent, AgentGroupChat
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+from semantic_kernel.agents import AgentGroupChat
 from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
+from semantic_kernel.filters.filter_types import FilterTypes
 from semantic_kernel.contents.chat_message_content import ChatMessageContent
 from semantic_kernel.contents.utils.author_role import AuthorRole
 from semantic_kernel.agents.strategies.selection.kernel_function_selection_strategy import (
@@ -16,31 +17,95 @@ from semantic_kernel.agents.strategies.termination.kernel_function_termination_s
 from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
 from dotenv import load_dotenv
 from sk_prompts import *
-from plugins.github import GitHubPlugin, GitHubSettings
+from plugins.github import GitHubPlugin, GitHubSettings, working_tree_diff
 from plugins.file_plugin import FilePlugin
-from plugins.execution import ExecutorPlugin
-import pyarrow.parquet as pq
-import random
+from plugins.ast_cache import ParseCache
+from plugins.blob_store import BlobOffloadFilter, BlobPlugin, BlobStore
+from plugins.execution import EXECUTOR_FACTORIES, ExecutorPlugin, ExecutorPool
+from dataset import ParquetDatasetSource
+from results import ResultsStore
+from history import ReducingChatCompletionAgent, TokenBudgetHistoryReducer
+from routing import ModelEscalator, ModelRouter, parse_prices
+from services import KernelFactory, ResponseCache, parse_model_map
+from strategies import LayeredTerminationStrategy, RuleBasedSelectionStrategy
+from tracing import CURRENT_TRACER, AgentOpsSink, Tracer, format_summary
+from transcripts import StreamingConsoleSubscriber, TranscriptWriter, console_subscriber
 import re
 
 
-agentops.init(api_key="<AGENTOPS PROJECT KEY>")
 load_dotenv()
 
-def create_kernel_with_chat_completion(service_id: str, model = "gpt-4o-mini") -> Kernel:
-    """Creates a new Kernel with Chat Completion Method"""
-    kernel = Kernel()
-    kernel.add_service(
-        OpenAIChatCompletion(
-            service_id=service_id,
-            ai_model_id=model,
-            api_key=os.environ["OPENAI_API_KEY"]
-            )
-    )
-    return kernel
+MAX_CONCURRENT_INSTANCES = int(os.getenv("MAX_CONCURRENT_INSTANCES", "4"))
+INSTANCE_TIMEOUT = float(os.getenv("INSTANCE_TIMEOUT", "1800"))
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "./coding")
+# The tester's reproduction tests and the executor's scripts, not part of the fix
+SCRATCH_FILES = ("temp_test*", "tmp_code_*")
+EXECUTOR_IDLE_TIMEOUT = float(os.getenv("EXECUTOR_IDLE_TIMEOUT", "300"))
+# A key of plugins.execution.EXECUTOR_FACTORIES; benchmarks.e2e adds "local" (no Docker)
+EXECUTOR_BACKEND = os.getenv("EXECUTOR_BACKEND", "docker")
+GITHUB_CLONE_URL = os.getenv("GITHUB_CLONE_URL", "https://github.com")
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "16000"))
+HISTORY_KEEP_LAST = int(os.getenv("HISTORY_KEEP_LAST", "6"))
+# Tool results longer than this many characters are stored as blobs; 0 keeps them in the history
+BLOB_THRESHOLD_CHARS = int(os.getenv("BLOB_THRESHOLD_CHARS", "4000"))
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "passthrough")
+RESPONSE_CACHE = None if LLM_CACHE_MODE == "passthrough" else ResponseCache(
+    os.getenv("LLM_CACHE_DIR", "./.llm_cache"), max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024
+)
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
+# Services run on a tier (SERVICE_TIERS=coder=standard,...), tiers on a model (MODEL_TIERS=strong=gpt-4o,...);
+# SERVICE_MODELS still pins a service to a model directly
+MODEL_ROUTER = ModelRouter(
+    tiers={"fast": DEFAULT_MODEL, "standard": DEFAULT_MODEL, "strong": os.getenv("STRONG_MODEL", "gpt-4o"),
+           **parse_model_map(os.getenv("MODEL_TIERS", ""))},
+    service_tiers=parse_model_map(os.getenv("SERVICE_TIERS", "")),
+    prices=parse_prices(os.getenv("MODEL_PRICES", "")),
+)
+# The Programmer moves up one tier after this many failed test runs, 0 never escalates
+ESCALATE_AFTER_FAILURES = int(os.getenv("ESCALATE_AFTER_FAILURES", "2"))
+KERNEL_FACTORY = KernelFactory(
+    api_key=os.environ["OPENAI_API_KEY"],
+    default_model=DEFAULT_MODEL,
+    models=parse_model_map(os.getenv("SERVICE_MODELS", "")),
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "64")),
+    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "32")),
+    cache=RESPONSE_CACHE,
+    cache_mode=LLM_CACHE_MODE,
+    router=MODEL_ROUTER,
+)
+DATASET_PATH = os.getenv("DATASET_PATH", os.path.join("swebench", "test-00000-of-00001.parquet"))
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join("swebench", "traces"))
+RESULTS_DB = os.getenv("RESULTS_DB", os.path.join("swebench", "results.sqlite"))
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", os.path.join("swebench", "transcripts"))
+FAILURES_PATH = os.getenv("FAILURES_PATH", os.path.join("swebench", "failures.txt"))
+TRANSCRIPT_CONSOLE = os.getenv("TRANSCRIPT_CONSOLE", "1") == "1"
+TRANSCRIPT_QUEUE_SIZE = int(os.getenv("TRANSCRIPT_QUEUE_SIZE", "1024"))
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "0.5"))
+# Streams the agents' replies (group_chat.invoke_stream) and records their time to first token
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+# agentops is an optional extra sink for the local traces
+AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY")
+if AGENTOPS_API_KEY:
+    import agentops
+    agentops.init(api_key=AGENTOPS_API_KEY, auto_start_session=False)
 
-async def main():
-    """Main"""
+def create_kernel_with_chat_completion(service_id: str, model: str = None) -> Kernel:
+    """Creates a new Kernel with Chat Completion Method on the shared connection pool"""
+    return KERNEL_FACTORY.create_kernel(service_id, model)
+
+def create_group_chat(workspace: str, executor_pool: ExecutorPool) -> AgentGroupChat:
+    """Creates a fresh group chat with its own agents and plugins bound to the given workspace"""
+
+    history_reducer = TokenBudgetHistoryReducer(max_tokens=HISTORY_TOKEN_BUDGET, keep_last=HISTORY_KEEP_LAST)
+    # Both FilePlugin instances work on the same workspace, so they share parsed modules
+    parse_cache = ParseCache()
+    blob_store = BlobStore(os.path.join(workspace, ".blobs"))
+
+    def add_blob_offload(kernel: Kernel):
+        """Large results of the kernel's tools go to the blob store, read_blob reads them back."""
+        if BLOB_THRESHOLD_CHARS:
+            kernel.add_plugin(BlobPlugin(blob_store), plugin_name="BlobPlugin")
+            kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, BlobOffloadFilter(blob_store, BLOB_THRESHOLD_CHARS))
 
     issue_analyzer_id = "issue_analyzer"
     issue_analyzer_kernel = create_kernel_with_chat_completion(issue_analyzer_id)
@@ -48,11 +113,17 @@ async def main():
     analyzer_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
 
     issue_analyzer_kernel.add_plugin(
-        GitHubPlugin(settings=GitHubSettings(token=os.environ["GITHUB_TOKEN"])),
+        GitHubPlugin(
+            settings=GitHubSettings(token=os.environ["GITHUB_TOKEN"], clone_url=GITHUB_CLONE_URL),
+            workspace=workspace,
+            mirror_root=os.path.join(WORKSPACE_ROOT, ".mirrors"),
+        ),
         plugin_name="GitHubPlugin",
     )
+    add_blob_offload(issue_analyzer_kernel)
 
-    issue_analyzer_agent = ChatCompletionAgent(
+    issue_analyzer_agent = ReducingChatCompletionAgent(
+        history_reducer=history_reducer,
         service_id=issue_analyzer_id,
         kernel=issue_analyzer_kernel,
         name=ANALYZER_NAME,
@@ -66,7 +137,8 @@ async def main():
     coder_settings = coder_kernel.get_prompt_execution_settings_from_service_id(service_id=coder_id)
     coder_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
 
-    coder_agent = ChatCompletionAgent(
+    coder_agent = ReducingChatCompletionAgent(
+        history_reducer=history_reducer,
         service_id=coder_id,
         kernel=coder_kernel,
         name=CODER_NAME,
@@ -78,11 +150,13 @@ async def main():
     file_id = "file"
     file_kernel = create_kernel_with_chat_completion(file_id)
 
-    file_kernel.add_plugin(FilePlugin(), plugin_name="FilePlugin")
+    file_kernel.add_plugin(FilePlugin(workspace=workspace, parse_cache=parse_cache), plugin_name="FilePlugin")
+    add_blob_offload(file_kernel)
     file_settings = file_kernel.get_prompt_execution_settings_from_service_id(service_id=file_id)
     file_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
 
-    file_agent = ChatCompletionAgent(
+    file_agent = ReducingChatCompletionAgent(
+        history_reducer=history_reducer,
         service_id=file_id,
         kernel=file_kernel,
         name=FILE_MANI_NAME,
@@ -93,13 +167,15 @@ async def main():
 
     tester_id = "tester"
     tester_kernel = create_kernel_with_chat_completion(tester_id)
-    tester_kernel.add_plugin(ExecutorPlugin(), plugin_name="ExecutorPlugin")
-    tester_kernel.add_plugin(FilePlugin(), plugin_name="FilePlugin")
+    tester_kernel.add_plugin(ExecutorPlugin(workspace=workspace, pool=executor_pool), plugin_name="ExecutorPlugin")
+    tester_kernel.add_plugin(FilePlugin(workspace=workspace, parse_cache=parse_cache), plugin_name="FilePlugin")
+    add_blob_offload(tester_kernel)
 
     tester_settings = tester_kernel.get_prompt_execution_settings_from_service_id(service_id=tester_id)
     tester_settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
 
-    tester_agent = ChatCompletionAgent(
+    tester_agent = ReducingChatCompletionAgent(
+        history_reducer=history_reducer,
         service_id=tester_id,
         kernel=tester_kernel,
         name=TESTER_NAME,
@@ -121,62 +197,176 @@ async def main():
     selection_kernel = create_kernel_with_chat_completion("selection")
     termination_kernel = create_kernel_with_chat_completion("termination")
 
-    group_chat = AgentGroupChat(
+    return AgentGroupChat(
         agents=[issue_analyzer_agent, coder_agent, file_agent, tester_agent],
-        selection_strategy=KernelFunctionSelectionStrategy(
-            function=selection_function,
-            kernel=selection_kernel,
-            result_parser=lambda result: str(result.value[0]) if result.value is not None else CODER_NAME,
-            agent_variable_name="agents",
-            history_variable_name="history",
+        selection_strategy=RuleBasedSelectionStrategy(
+            history_reducer=history_reducer,
+            fallback=KernelFunctionSelectionStrategy(
+                function=selection_function,
+                kernel=selection_kernel,
+                result_parser=lambda result: str(result.value[0]) if result.value is not None else CODER_NAME,
+                agent_variable_name="agents",
+                history_variable_name="history",
+            ),
         ),
-        termination_strategy=KernelFunctionTerminationStrategy(
+        termination_strategy=LayeredTerminationStrategy(
             agents=[tester_agent],
-            function=termination_function,
-            kernel=termination_kernel,
-            result_parser=lambda result: TERMINATION_KEYWORD in str(result.value[0]).lower(),
-            history_variable_name="history",
+            history_reducer=history_reducer,
+            fallback=KernelFunctionTerminationStrategy(
+                agents=[tester_agent],
+                function=termination_function,
+                kernel=termination_kernel,
+                result_parser=lambda result: TERMINATION_KEYWORD in str(result.value[0]).lower(),
+                history_variable_name="history",
+            ),
             maximum_iterations=10,
+            blob_store=blob_store,
+            on_test_failure=ModelEscalator(MODEL_ROUTER, coder_agent, after_failures=ESCALATE_AFTER_FAILURES),
         ),
     )
 
 
-    table = pq.read_table('.\\swebench\\test-00000-of-00001.parquet')
-
-    data_dict = table.to_pydict()
-    columns = data_dict.keys()
-    rows = [{col: data_dict[col][i] for col in columns} for i in range(len(next(iter(data_dict.values()))))]
-
-    random.seed(30)
-    random.shuffle(rows)
-    log = open('./swebench/log.txt', "a")
-
-    for row in rows[21:30]:
+async def run_instance(row: dict, semaphore: asyncio.Semaphore, transcripts: TranscriptWriter,
+                       store: Optional[ResultsStore] = None) -> None:
+    """Runs a single SWE-bench instance in its own group chat and workspace"""
+    async with semaphore:
+        instance_id = row["instance_id"]
         repo = row["repo"]
-        print(repo)
-        issue = int(re.search(r'\d+', row["instance_id"]).group())
-        print(issue)
+        issue = int(re.search(r'\d+', instance_id).group())
         commit = row["base_commit"]
         issue_detail = row["problem_statement"]
-        print(commit)
+        print(f"START {instance_id} ({repo}#{issue} @ {commit})")
+
+        workspace = os.path.join(WORKSPACE_ROOT, instance_id)
+        if store is not None:
+            if store.status(instance_id) is not None:
+                # A retry must not see the edits of the failed or interrupted attempt
+                shutil.rmtree(workspace, ignore_errors=True)
+            store.start(row)
+        # Set up inside the try below, so a failing setup fails this instance only
+        executor_pool = None
+        group_chat = None
+        tracer = None
+        turns = 0
+
+        async def record(message: ChatMessageContent):
+            nonlocal turns
+            turns += 1
+            await transcripts.write(instance_id, message.role.value, message.name, message.content, turn=turns)
+
+        def set_up():
+            nonlocal executor_pool, group_chat, tracer
+            os.makedirs(workspace, exist_ok=True)
+            executor_pool = ExecutorPool(executor_factory=EXECUTOR_FACTORIES[EXECUTOR_BACKEND], idle_timeout=EXECUTOR_IDLE_TIMEOUT)
+            group_chat = create_group_chat(workspace, executor_pool)
+            sinks = []
+            if AGENTOPS_API_KEY:
+                session = agentops.start_session(tags=[instance_id])
+                if session:
+                    sinks.append(AgentOpsSink(session))
+            tracer = Tracer(instance_id, path=os.path.join(TRACE_DIR, f"{instance_id}.jsonl"), sinks=sinks)
+            CURRENT_TRACER.set(tracer)
+
+        async def converse():
+            task = ChatMessageContent(role=AuthorRole.USER, content=f"{repo}/{issue} with base commit {commit} ISSUE Description: {issue_detail}")
+            await group_chat.add_chat_message(task)
+            await transcripts.write(instance_id, task.role.value, task.name, task.content, turn=turns)
+
+            if not STREAM_RESPONSES:
+                async for response in group_chat.invoke():
+                    await record(response)
+                return
+
+            # The complete messages of a turn reach the history when it ends, i.e. before the
+            # first chunk of the next turn or after the last one
+            recorded = len(group_chat.history.messages)
+            async for chunk in group_chat.invoke_stream():
+                for message in group_chat.history.messages[recorded:]:
+                    await record(message)
+                recorded = len(group_chat.history.messages)
+                if chunk.content:
+                    await transcripts.write(instance_id, chunk.role.value, chunk.name, chunk.content, partial=True)
+            for message in group_chat.history.messages[recorded:]:
+                await record(message)
+
+        summary = None
         try:
-            await group_chat.add_chat_message(ChatMessageContent(role=AuthorRole.USER, content=f"{repo}/{issue} with base commit {commit} ISSUE Description: {issue_detail}"))
+            set_up()
+            await asyncio.wait_for(converse(), timeout=INSTANCE_TIMEOUT)
 
-            async for response in group_chat.invoke():
-                print(f"# {response.role} - {response.name or '*'}: '{response.content}'")
-                log.write(f"# {response.role} - {response.name or '*'}: '{response.content}'")
-                    
-                
+            termination = group_chat.termination_strategy
+            gave_up = termination.stop_reason == "repeated_failure"
+            summary = tracer.close('GaveUp' if gave_up else 'Success')
+            print(format_summary(summary))
+            if store is not None:
+                store.finish(instance_id, "gave_up" if gave_up else "completed", turns=turns,
+                             patch=await instance_patch(workspace, repo, commit), trace_summary=summary,
+                             error=f"the same test failure {termination.max_repeated_failures} times in a row" if gave_up else None)
+            print(f"DONE {instance_id} selection: {dict(group_chat.selection_strategy.counters)} "
+                  f"termination: {dict(termination.counters)} "
+                  f"history: {dict(group_chat.agents[0].history_reducer.stats)}")
         except Exception as e:
-            with open('./swebench/failures.txt', "a") as f:
-                f.write(str(e))
-                f.close()
-                agentops.end_session('Failure')
-    
-        agentops.end_session('Success')
-        
-    log.close()
-        
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            reason = f"timed out after {INSTANCE_TIMEOUT}s" if timed_out else f"{type(e).__name__}: {e}"
+            with open(FAILURES_PATH, "a") as f:
+                f.write(f"{instance_id}: {reason}\n")
+            print(f"FAILED {instance_id}: {reason}")
+            # The trace is already closed if the bookkeeping after a finished conversation failed
+            if summary is None and tracer is not None:
+                summary = tracer.close('Fail')
+                print(format_summary(summary))
+            if store is not None:
+                store.finish(instance_id, "timeout" if timed_out else "failed", turns=turns,
+                             patch=await instance_patch(workspace, repo, commit), error=reason, trace_summary=summary)
+        finally:
+            if executor_pool is not None:
+                await executor_pool.close()
+            await transcripts.close_instance(instance_id)
+
+
+async def instance_patch(workspace: str, repo: str, commit: str) -> Optional[str]:
+    """The agents' changes to the checked-out repository without scratch files, None if it was never cloned."""
+    repo_path = os.path.join(workspace, repo.split("/")[-1])
+    if not os.path.isdir(repo_path):
+        return None
+    try:
+        return await working_tree_diff(repo_path, commit, exclude=SCRATCH_FILES)
+    except Exception as e:
+        print(f"PATCH {repo_path}: {e}")
+        return None
+
+
+async def main():
+    """Main"""
+
+    # Failed instances are appended to FAILURES_PATH from the error handler, which must not raise itself
+    os.makedirs(os.path.dirname(FAILURES_PATH) or ".", exist_ok=True)
+    source = ParquetDatasetSource(DATASET_PATH)
+    rows = source.select(seed=30, start=21, stop=30)
+
+    store = ResultsStore(RESULTS_DB)
+    pending = store.pending(rows)
+    print(f"{len(rows) - len(pending)} of {len(rows)} instances already completed, running {len(pending)}")
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_INSTANCES)
+    console = StreamingConsoleSubscriber() if STREAM_RESPONSES else console_subscriber
+    subscribers = [console] if TRANSCRIPT_CONSOLE else []
+    async with TranscriptWriter(TRANSCRIPT_DIR, subscribers=subscribers, max_queue=TRANSCRIPT_QUEUE_SIZE,
+                                flush_interval=TRANSCRIPT_FLUSH_INTERVAL) as transcripts:
+        # Every instance owns its chat, agents and workspace, so they can overlap freely
+        results = await asyncio.gather(*(run_instance(row, semaphore, transcripts, store) for row in pending),
+                                       return_exceptions=True)
+    # run_instance records its own failures; what reaches here broke that bookkeeping, e.g. the store
+    for row, result in zip(pending, results):
+        if isinstance(result, BaseException):
+            print(f"ERROR {row['instance_id']}: {type(result).__name__}: {result}")
+    print(f"TRANSCRIPTS {dict(transcripts.stats)} in {TRANSCRIPT_DIR}")
+
+    print(f"RESULTS {store.summary()}")
+    store.export(os.path.join(os.path.dirname(RESULTS_DB), "predictions.jsonl"))
+    store.close()
+    await GitHubPlugin.aclose()
+    await KERNEL_FACTORY.close()
 
 
 # Run the main function
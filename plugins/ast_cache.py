@@ -0,0 +1,69 @@
+import ast
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ParseCache:
+    """LRU cache of parsed Python files, keyed by path and validated against mtime and size.
+
+    Memory is bounded by the total size of the cached sources (the trees are roughly
+    proportional to it) and by the number of entries.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # path -> (mtime_ns, size, source, tree or None until first parse)
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: str) -> Tuple[str, ast.Module]:
+        """
+        Returns the source and parsed tree of a file, parsing it only if it changed on disk.
+
+        The tree is shared with later callers and must not be modified; edits splice the source text instead.
+        """
+        path = os.path.abspath(path)
+        key = self._stat(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry[:2] == key:
+            self._entries.move_to_end(path)
+            source, tree = entry[2], entry[3]
+            if tree is None:
+                tree = ast.parse(source)
+                self._entries[path] = (*key, source, tree)
+            self.hits += 1
+            return source, tree
+
+        self.misses += 1
+        with open(path, "r") as file:
+            source = file.read()
+        tree = ast.parse(source)
+        self._store(path, key, source, tree)
+        return source, tree
+
+    def update(self, path: str, source: str):
+        """Records content that was just written to path; it is parsed lazily on the next get()."""
+        path = os.path.abspath(path)
+        self._store(path, self._stat(path), source, None)
+
+    def invalidate(self, path: str):
+        entry = self._entries.pop(os.path.abspath(path), None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def _store(self, path: str, key: Tuple[int, int], source: str, tree: Optional[ast.Module]):
+        self.invalidate(path)
+        self._entries[path] = (*key, source, tree)
+        self.size += len(source)
+        while self._entries and (self.size > self.max_bytes or len(self._entries) > self.max_entries):
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted[2])
@@ -0,0 +1,196 @@
+from semantic_kernel.filters.functions.function_invocation_context import FunctionInvocationContext
+from semantic_kernel.functions.function_result import FunctionResult
+from semantic_kernel.functions.kernel_function_decorator import kernel_function
+from collections import Counter
+from typing import Annotated, Optional
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+from plugins.file_reader import read_lines
+from tracing import trace
+
+HANDLE = re.compile(r"^blob:([0-9a-f]{16})$")
+# The first line of a result that BlobOffloadFilter replaced
+OFFLOADED = re.compile(r"^\[\S+ returned \d+ lines \(\d+ characters\), stored as (blob:[0-9a-f]{16})\.")
+# Lines of a stored output shown in the history, and the cap on their length
+PREVIEW_HEAD_LINES = 20
+PREVIEW_TAIL_LINES = 10
+PREVIEW_LINE_CHARS = 200
+
+
+class BlobStore:
+    """Content-addressed store of large tool outputs, one file per distinct output."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.stats = Counter()
+
+    def path(self, handle: str) -> str:
+        match = HANDLE.match(handle.strip())
+        if not match:
+            raise ValueError(f"Invalid blob handle '{handle}', expected blob:<16 hex digits>")
+        key = match.group(1)
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def put(self, text: str) -> str:
+        """Stores the text (once per content) and returns its handle."""
+        handle = f"blob:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+        path = self.path(handle)
+        if os.path.exists(path):
+            self.stats["reused"] += 1
+            return handle
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+        self.stats["stored"] += 1
+        self.stats["stored_chars"] += len(text)
+        return handle
+
+    def get(self, handle: str) -> str:
+        with open(self.path(handle), "r", encoding="utf-8", newline="") as file:
+            return file.read()
+
+    def expand(self, text: str) -> str:
+        """The full output behind a result that BlobOffloadFilter replaced, any other text as is."""
+        match = OFFLOADED.match(text)
+        if match is None:
+            return text
+        try:
+            return self.get(match.group(1))
+        except (OSError, ValueError):
+            return text
+
+
+def as_text(value) -> Optional[str]:
+    """Tool results as the model sees them: lists one item per line, dicts as JSON, None for anything else."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(item, str) for item in value):
+            return "\n".join(value)
+        return json.dumps(value, default=str)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return None
+
+
+def preview(text: str, max_chars: int = 2000, head_lines: int = PREVIEW_HEAD_LINES,
+            tail_lines: int = PREVIEW_TAIL_LINES) -> str:
+    """
+    First and last lines of the text, each cut to PREVIEW_LINE_CHARS, with the omitted lines marked.
+
+    Two thirds of max_chars go to the head and one third to the tail, so lines are dropped
+    from the preview rather than letting it grow past max_chars.
+    """
+    lines = [line if len(line) <= PREVIEW_LINE_CHARS else f"{line[:PREVIEW_LINE_CHARS]} [...]"
+             for line in text.splitlines()]
+
+    def fit(candidates, budget: int) -> list:
+        taken = []
+        for line in candidates:
+            budget -= len(line) + 1
+            if budget < 0:
+                break
+            taken.append(line)
+        return taken
+
+    head = fit(lines[:head_lines], max_chars * 2 // 3)
+    tail = fit(reversed(lines[len(head):][-tail_lines:]), max_chars // 3)[::-1]
+    omitted = len(lines) - len(head) - len(tail)
+    if not omitted:
+        return "\n".join(head + tail)
+    marker = f"[... lines {len(head) + 1}-{len(head) + omitted} omitted ...]"
+    return "\n".join(head + [marker] + tail)
+
+
+class BlobOffloadFilter:
+    """
+    Function invocation filter that moves tool results longer than threshold characters into a
+    BlobStore, so the chat history (and every later request) carries a handle and a preview instead.
+
+    Lists and dicts are measured (and stored) as text. Code that has to judge the whole output, like
+    the termination strategy reading test results, gets it back with BlobStore.expand().
+
+    Functions that already page their output (read_blob, read_file with its max_chars cap and
+    continuation marker) are exempt; offloading them would only hide the page that was asked for.
+    """
+
+    def __init__(self, store: BlobStore, threshold: int = 4000, exempt_plugins: tuple = ("BlobPlugin",),
+                 exempt_functions: tuple = ("FilePlugin.read_file",)):
+        self.store = store
+        self.threshold = threshold
+        self.exempt_plugins = exempt_plugins
+        self.exempt_functions = exempt_functions
+
+    async def __call__(self, context: FunctionInvocationContext, next):
+        await next(context)
+        value = as_text(context.result.value) if context.result is not None else None
+        if value is None or len(value) <= self.threshold:
+            return
+        if context.function.plugin_name in self.exempt_plugins:
+            return
+        name = f"{context.function.plugin_name}.{context.function.name}" if context.function.plugin_name else context.function.name
+        if name in self.exempt_functions:
+            return
+
+        # The trace summary sums saved_tokens, i.e. what is kept out of every later request
+        with trace("blob", name) as span:
+            handle = await asyncio.to_thread(self.store.put, value)
+            total_lines = value.count("\n") + 1
+            replacement = (
+                f"[{name} returned {total_lines} lines ({len(value)} characters), stored as {handle}. "
+                f"Only the first and last lines are shown; call read_blob(handle=\"{handle}\", start_line, end_line) "
+                f"to read other lines.]\n{preview(value, self.threshold // 2)}"
+            )
+            span["saved_tokens"] = (len(value) - len(replacement)) // 4
+        self.store.stats["offloaded"] += 1
+        context.result = FunctionResult(function=context.function.metadata, value=replacement,
+                                        metadata=context.result.metadata)
+
+
+class BlobPlugin:
+    """A plugin for reading large tool outputs that were stored as blobs"""
+
+    def __init__(self, store: BlobStore):
+        self.store = store
+
+    @kernel_function
+    async def read_blob(self,
+                        handle: Annotated[str, "The blob handle, e.g. blob:0123456789abcdef"],
+                        start_line: Annotated[int, "First line to read (1-based)"] = 1,
+                        end_line: Annotated[int, "Last line to read (inclusive), 0 for the end"] = 0,
+                        max_chars: Annotated[int, "Maximum number of characters to return"] = 4000,
+                        start_column: Annotated[int, "Character offset within start_line to continue a truncated long line from"] = 0,
+                        ) -> str:
+        """
+        Reads a line range of a large tool output that was stored as a blob instead of being shown in full.
+
+        Args:
+            handle (str): The handle from the tool result, e.g. blob:0123456789abcdef.
+
+        Returns:
+            str: The lines or an error message.
+        """
+        try:
+            path = self.store.path(handle)
+            text, meta = await asyncio.to_thread(read_lines, path, start_line, end_line or None, max_chars,
+                                                 start_column)
+        except ValueError as e:
+            return f"Error: {e}"
+        except FileNotFoundError:
+            return f"Error: Blob '{handle}' not found."
+        header = f"[{handle.strip()} | lines {meta['start_line']}-{meta['end_line']} of {meta['total_lines']}]"
+        if meta["total_lines"] and meta["start_line"] > meta["total_lines"]:
+            return f"{header}\nError: start_line is past the end of the blob."
+        if meta["next_column"]:
+            text += (f"\n[... line {meta['end_line']} is longer than max_chars and was cut, "
+                     f"continue with start_line={meta['end_line']}, start_column={meta['next_column']} ...]")
+        elif meta["truncated"]:
+            text += (f"\n[... truncated at line {meta['end_line']} of {meta['total_lines']}, "
+                     f"continue with start_line={meta['end_line'] + 1} ...]")
+        return f"{header}\n{text}"
@@ -0,0 +1,550 @@
+import base64
+import fnmatch
+import json
+import os
+import re
+import threading
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+# Larger files are neither indexed nor searched (generated data, vendored bundles)
+MAX_FILE_BYTES = 1024 * 1024
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+SEARCH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+MAX_MATCHES_PER_FILE = 10
+MAX_LINE_CHARS = 300
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, flags: int) -> re.Pattern:
+    return re.compile(pattern, flags)
+
+
+def trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Zero-width escapes; the literals on both sides stay adjacent
+_ANCHOR_ESCAPES = set("bBAZ")
+_CHAR_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a"}
+_QUANTIFIER = re.compile(r"\*|\+|\?|\{(\d*)(?:,\d*)?\}")
+
+
+def _group_end(pattern: str, start: int) -> int:
+    """Index of the ")" closing the group that opens at start, -1 if there is none."""
+    depth = 0
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _class_end(pattern, i)
+            if i < 0:
+                return -1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def _class_end(pattern: str, start: int) -> int:
+    """Index of the "]" closing the character class that opens at start, -1 if there is none."""
+    i = start + 1
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1  # a leading "]" is a member of the class
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            i += 2
+            continue
+        if pattern[i] == "]":
+            return i
+        i += 1
+    return -1
+
+
+def _has_alternation(pattern: str) -> bool:
+    """Whether the pattern has a "|" outside of groups and character classes."""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _class_end(pattern, i)
+            if i < 0:
+                return True
+        elif char == "(":
+            i = _group_end(pattern, i)
+            if i < 0:
+                return True
+        elif char == "|":
+            return True
+        i += 1
+    return False
+
+
+def _literal_runs(pattern: str) -> Optional[List[str]]:
+    """The literal runs of a pattern without top-level alternation, None if it uses syntax this parser skips."""
+    literals = []
+    run = []
+
+    def end_run():
+        if run:
+            literals.append("".join(run))
+            run.clear()
+
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        # What the next atom must match: one known character (str) or the literals inside it (list)
+        if char == "\\":
+            if i + 1 >= len(pattern):
+                return None
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped in _ANCHOR_ESCAPES:
+                continue
+            if escaped in _CHAR_ESCAPES:
+                atom = _CHAR_ESCAPES[escaped]
+            elif escaped.isalnum():
+                atom = []  # a class like \w, a hex or unicode escape or a backreference
+            else:
+                atom = escaped
+        elif char in "^$":
+            i += 1
+            continue
+        elif char == "[":
+            end = _class_end(pattern, i)
+            if end < 0:
+                return None
+            i = end + 1
+            atom = []
+        elif char == "(":
+            end = _group_end(pattern, i)
+            if end < 0:
+                return None
+            body = pattern[i + 1:end]
+            i = end + 1
+            if body.startswith(("?=", "?!", "?<=", "?<!", "?#")) or re.fullmatch(r"\?[aiLmsux-]+", body):
+                continue  # lookarounds, comments and inline flags take no text
+            if body.startswith(("?:", "?>")):
+                body = body[2:]
+            elif body.startswith("?P<"):
+                body = body.partition(">")[2]
+            elif body.startswith("?"):
+                flags, colon, scoped = body[1:].partition(":")
+                if not colon or not re.fullmatch(r"[aiLmsux-]+", flags):
+                    return None  # backreferences by name, conditionals
+                body = scoped
+            atom = [] if _has_alternation(body) else _literal_runs(body)
+            if atom is None:
+                return None
+        elif char == ".":
+            i += 1
+            atom = []
+        else:
+            # The pattern compiled, so this is not a quantifier
+            i += 1
+            atom = char
+
+        quantifier = _QUANTIFIER.match(pattern, i)
+        if quantifier is not None and quantifier.group(0) != "{}":
+            i = quantifier.end()
+            if i < len(pattern) and pattern[i] in "?+":
+                i += 1  # lazy or possessive
+            required = quantifier.group(0) == "+" or int(quantifier.group(1) or 0) > 0
+            end_run()
+            if not required:
+                continue
+            # A repeated atom is in every match, but what follows it is not adjacent to it
+            if isinstance(atom, str):
+                literals.append(atom)
+            else:
+                literals.extend(atom)
+            continue
+
+        if isinstance(atom, str):
+            run.append(atom)
+        else:
+            end_run()
+            literals.extend(atom)
+    end_run()
+    return literals
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Literal strings every match of the regex must contain, e.g. "def (\\w+)_view" -> ["def ", "_view"].
+
+    Alternations and optional parts contribute nothing, and syntax the parser does not know (or
+    verbose patterns) gives no literals at all; an empty result means the index can not narrow
+    the search and every file is scanned.
+    """
+    if flags & re.VERBOSE or "(?x" in pattern or _has_alternation(pattern):
+        return []
+    return [literal for literal in _literal_runs(pattern) or [] if literal]
+
+
+def file_trigrams(repo_path: str, rel_path: str) -> Optional[Set[str]]:
+    """The trigrams of a file, or None for binary/huge files."""
+    try:
+        with open(os.path.join(repo_path, rel_path), "rb") as file:
+            data = file.read(MAX_FILE_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > MAX_FILE_BYTES or b"\0" in data[:8192]:
+        return None
+    return trigrams(data.decode("utf-8", errors="replace"))
+
+
+def chunk_postings(repo_path: str, files: List[Tuple[str, int]]) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Worker entry point: the postings of some (rel_path, file id) pairs, and the paths that can not be indexed.
+
+    Each posting is a bitset of file ids. Bits are set relative to the smallest id, so the
+    intermediate ints stay as small as the chunk.
+    """
+    base = min((file_id for _, file_id in files), default=0)
+    postings: Dict[str, int] = {}
+    unindexable = []
+    for rel_path, file_id in files:
+        found = file_trigrams(repo_path, rel_path)
+        if found is None:
+            unindexable.append(rel_path)
+            continue
+        bit = 1 << (file_id - base)
+        for trigram in found:
+            postings[trigram] = postings.get(trigram, 0) | bit
+    return {trigram: bits << base for trigram, bits in postings.items()}, unindexable
+
+
+def bit_ids(bits: int) -> List[int]:
+    """The positions of the set bits, lowest first."""
+    digits = bin(bits)[:1:-1]
+    ids = []
+    position = digits.find("1")
+    while position >= 0:
+        ids.append(position)
+        position = digits.find("1", position + 1)
+    return ids
+
+
+def search_file(repo_path: str, rel_path: str, pattern: str, flags: int, context: int) -> Tuple[str, int, List[dict]]:
+    """
+    Searches one file.
+
+    Returns:
+        Tuple[str, int, List[dict]]: The path, the number of matching lines and the first
+        MAX_MATCHES_PER_FILE matches with their context lines.
+    """
+    try:
+        with open(os.path.join(repo_path, rel_path), "r", encoding="utf-8", errors="replace") as file:
+            text = file.read(MAX_FILE_BYTES + 1)
+    except OSError:
+        return rel_path, 0, []
+    compiled = compile_pattern(pattern, flags)
+    lines = None
+    matches = []
+    count = 0
+    last_line = -1
+    line_number = 0
+    position = 0
+    for match in compiled.finditer(text):
+        line_number += text.count("\n", position, match.start())
+        position = match.start()
+        if line_number == last_line:
+            continue
+        last_line = line_number
+        count += 1
+        if len(matches) < MAX_MATCHES_PER_FILE:
+            if lines is None:
+                lines = text.splitlines()
+            matches.append({
+                "line": line_number + 1,
+                "text": lines[line_number][:MAX_LINE_CHARS] if line_number < len(lines) else "",
+                "before": [line[:MAX_LINE_CHARS] for line in lines[max(0, line_number - context):line_number]],
+                "after": [line[:MAX_LINE_CHARS] for line in lines[line_number + 1:line_number + 1 + context]],
+            })
+    return rel_path, count, matches
+
+
+class TrigramIndex:
+    """Persistent trigram index of the text files of a repository, used to skip files that can not match.
+
+    Files are re-indexed only when their mtime or size changed since the last refresh. Every
+    indexed file has a small integer id and each trigram maps to a bitset of ids (one int), so
+    a query intersects ints instead of sets of paths. Use search_index() to get the index of a
+    repository; it is shared by everything that searches it.
+    """
+
+    VERSION = 2
+
+    def __init__(self, repo_path: str, index_path: str, max_workers: Optional[int] = None):
+        self.repo_path = repo_path
+        self.index_path = index_path
+        self.max_workers = max_workers
+        # rel_path -> [mtime_ns, size, file id or None if not indexable]
+        self.files: Dict[str, list] = {}
+        # Re-indexed files not saved yet; small refreshes only save with the next large one or flush()
+        self.dirty = False
+        self._paths: List[Optional[str]] = []
+        self._free_ids: List[int] = []
+        self._postings: Dict[str, int] = {}
+        self._indexed = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Reads the saved index; a missing, damaged or older index is rebuilt by the next refresh."""
+        self.files, self._paths, self._free_ids, self._postings, self._indexed = {}, [], [], {}, 0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                saved = json.load(file)
+            if saved.get("version") != self.VERSION:
+                return
+            width = saved["width"]
+            packed = zlib.decompress(base64.b64decode(saved["postings"]))
+            postings = {
+                trigram: int.from_bytes(packed[i * width:(i + 1) * width], "little")
+                for i, trigram in enumerate(saved["trigrams"])
+            }
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError, zlib.error):
+            return
+        self.files, self._paths, self._postings = saved["files"], saved["paths"], postings
+        self._free_ids = [file_id for file_id, rel_path in enumerate(self._paths) if rel_path is None]
+        self._indexed = sum(1 << file_id for file_id, rel_path in enumerate(self._paths) if rel_path is not None)
+
+    def save(self):
+        """Writes the file table and the postings, packed as fixed-width bitsets and compressed."""
+        width = (len(self._paths) + 7) // 8
+        trigrams_in_order = list(self._postings)
+        packed = b"".join(self._postings[trigram].to_bytes(width, "little") for trigram in trigrams_in_order)
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "version": self.VERSION,
+                "files": self.files,
+                "paths": self._paths,
+                "trigrams": trigrams_in_order,
+                "width": width,
+                "postings": base64.b64encode(zlib.compress(packed, 1)).decode("ascii"),
+            }, file)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def flush(self):
+        """Writes re-indexed files that were not saved yet."""
+        with self._lock:
+            if self.dirty:
+                self.save()
+
+    def _new_id(self, rel_path: str) -> int:
+        if self._free_ids:
+            file_id = self._free_ids.pop()
+            self._paths[file_id] = rel_path
+        else:
+            file_id = len(self._paths)
+            self._paths.append(rel_path)
+        return file_id
+
+    def _free_id(self, file_id: int):
+        self._paths[file_id] = None
+        self._free_ids.append(file_id)
+
+    def refresh(self, rel_paths: List[str]) -> int:
+        """
+        Brings the index up to date with the given files on disk.
+
+        Returns:
+            int: Number of files that were (re-)indexed or removed.
+        """
+        with self._lock:
+            on_disk = {}
+            for rel_path in rel_paths:
+                try:
+                    on_disk[rel_path] = os.stat(os.path.join(self.repo_path, rel_path))
+                except OSError:
+                    pass
+            changed = [
+                rel_path for rel_path, stat in on_disk.items()
+                if rel_path not in self.files
+                or self.files[rel_path][0] != stat.st_mtime_ns
+                or self.files[rel_path][1] != stat.st_size
+            ]
+            removed = [rel_path for rel_path in self.files if rel_path not in on_disk]
+            if not changed and not removed:
+                return 0
+
+            # Clear the bits of every file that goes away or is indexed again, in one pass over the postings
+            stale = 0
+            for rel_path in changed + removed:
+                file_id = self.files.get(rel_path, [None, None, None])[2]
+                if file_id is not None:
+                    stale |= 1 << file_id
+            if stale:
+                keep = ~stale
+                for trigram, bits in list(self._postings.items()):
+                    if bits & stale:
+                        if bits & keep:
+                            self._postings[trigram] = bits & keep
+                        else:
+                            del self._postings[trigram]
+                self._indexed &= keep
+            for rel_path in removed:
+                file_id = self.files.pop(rel_path)[2]
+                if file_id is not None:
+                    self._free_id(file_id)
+
+            work = []
+            for rel_path in changed:
+                file_id = self.files.get(rel_path, [None, None, None])[2]
+                work.append((rel_path, file_id if file_id is not None else self._new_id(rel_path)))
+            if len(work) >= PARALLEL_THRESHOLD:
+                workers = self.max_workers or os.cpu_count() or 1
+                size = -(-len(work) // (workers * 2))
+                chunks = [work[i:i + size] for i in range(0, len(work), size)]
+                with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                    results = list(pool.map(chunk_postings, [self.repo_path] * len(chunks), chunks))
+            else:
+                results = [chunk_postings(self.repo_path, work)]
+
+            unindexable = set()
+            for postings, skipped in results:
+                for trigram, bits in postings.items():
+                    self._postings[trigram] = self._postings.get(trigram, 0) | bits
+                unindexable.update(skipped)
+            for rel_path, file_id in work:
+                stat = on_disk[rel_path]
+                if rel_path in unindexable:
+                    self._free_id(file_id)
+                    file_id = None
+                else:
+                    self._indexed |= 1 << file_id
+                self.files[rel_path] = [stat.st_mtime_ns, stat.st_size, file_id]
+
+            self.dirty = True
+            if len(changed) >= PARALLEL_THRESHOLD or removed:
+                self.save()
+            return len(changed) + len(removed)
+
+    def candidates(self, literals: List[str]) -> Set[str]:
+        """Files that contain every trigram of the literals (all indexable files if there is none)."""
+        wanted = set().union(*(trigrams(literal) for literal in literals)) if literals else set()
+        with self._lock:
+            result = self._indexed
+            # Rarest trigram first empties the result soonest
+            for trigram in sorted(wanted, key=lambda trigram: self._postings.get(trigram, 0).bit_count()):
+                result &= self._postings.get(trigram, 0)
+                if not result:
+                    break
+            return {self._paths[file_id] for file_id in bit_ids(result)}
+
+
+# One index per repository directory, alive while a FilePlugin holds it
+_INDEXES: "weakref.WeakValueDictionary[str, TrigramIndex]" = weakref.WeakValueDictionary()
+_INDEXES_LOCK = threading.Lock()
+
+
+def search_index(repo_path: str, index_path: str) -> TrigramIndex:
+    """The shared trigram index of a repository, loaded on first use."""
+    key = os.path.realpath(repo_path)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = TrigramIndex(repo_path, index_path)
+            _INDEXES[key] = index
+        return index
+
+
+def rank_key(rel_path: str, count: int, matches: List[dict]):
+    """Files defining what was searched for come first, then non-test files, then by number of matches."""
+    definitions = sum(1 for match in matches if match["text"].lstrip().startswith(("def ", "class ", "async def ")))
+    is_test = "test" in rel_path.lower()
+    return -definitions, is_test, -count, rel_path
+
+
+def search(index: TrigramIndex,
+           files: List[str],
+           query: str,
+           regex: bool = False,
+           case_sensitive: bool = False,
+           file_pattern: str = "",
+           context: int = 2,
+           max_results: int = 50) -> Tuple[List[Tuple[str, int, List[dict]]], int, int, int]:
+    """
+    Searches the files of a repository, using the trigram index to skip files that can not match.
+
+    Returns:
+        Tuple: The ranked (path, match count, matches) per file within max_results, the total number of
+        matching lines and files, and the number of files that were actually scanned.
+    """
+    pattern = query if regex else re.escape(query)
+    flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+    compile_pattern(pattern, flags)  # raises re.error before any work is done
+
+    index.refresh(files)
+    if file_pattern:
+        files = [rel_path for rel_path in files if fnmatch.fnmatch(rel_path, file_pattern)]
+    literals = required_literals(pattern, flags) if regex else [query]
+    candidates = sorted(index.candidates(literals) & set(files))
+
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        results = [
+            result for result in pool.map(
+                lambda rel_path: search_file(index.repo_path, rel_path, pattern, flags, context), candidates
+            )
+            if result[1]
+        ]
+    results.sort(key=lambda result: rank_key(*result))
+
+    total = sum(count for _, count, _ in results)
+    shown, budget = [], max_results
+    for rel_path, count, matches in results:
+        if budget <= 0:
+            break
+        shown.append((rel_path, count, matches[:budget]))
+        budget -= len(shown[-1][2])
+    return shown, total, len(results), len(candidates)
+
+
+def format_results(results: List[Tuple[str, int, List[dict]]], total: int, total_files: int) -> str:
+    """grep -n style output: "path:line: text" for matches, "path-line- text" for context and "--" between hunks."""
+    blocks = []
+    for rel_path, count, matches in results:
+        numbered = {}
+        for match in matches:
+            first = match["line"] - len(match["before"])
+            for offset, text in enumerate(match["before"] + [match["text"]] + match["after"]):
+                numbered.setdefault(first + offset, text)
+        matching = {match["line"] for match in matches}
+        lines = []
+        previous = None
+        for number in sorted(numbered):
+            if previous is not None and number > previous + 1:
+                lines.append("--")
+            separator = ":" if number in matching else "-"
+            lines.append(f"{rel_path}{separator}{number}{separator} {numbered[number]}")
+            previous = number
+        if count > len(matches):
+            lines.append(f"... {count - len(matches)} more matches in {rel_path}")
+        blocks.append("\n".join(lines))
+    shown = sum(len(matches) for _, _, matches in results)
+    header = f"{total} matching lines in {total_files} files"
+    if shown < total:
+        header += f", showing {shown} in the {len(results)} most relevant files"
+    return header + "\n\n" + "\n\n".join(blocks)
@@ -0,0 +1,146 @@
+import ast
+import os
+import re
+from typing import Dict, List, Optional
+from plugins.source_editor import SourceEditError, replace_function
+
+
+def _create_temp(directory: str):
+    """A new file next to the target, created with 0666 so the kernel applies the umask like for open()."""
+    while True:
+        tmp_path = os.path.join(directory, f".edit-{os.urandom(4).hex()}")
+        try:
+            return os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+class EditError(Exception):
+    """An edit could not be applied; the whole batch is rejected."""
+
+
+class EditTransaction:
+    """Applies a batch of edits to in-memory copies of files and writes them all or none.
+
+    Supported edits (dicts):
+        {"op": "replace", "file": ..., "old": ..., "new": ..., "count": 0}     literal, count 0 = all
+        {"op": "regex", "file": ..., "pattern": ..., "replacement": ...}
+        {"op": "replace_function", "file": ..., "function": ..., "content": ...}  same as modify_function
+        {"op": "write", "file": ..., "content": ...}                         create or overwrite
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.originals: Dict[str, Optional[str]] = {}
+        self.contents: Dict[str, str] = {}
+
+    def _resolve(self, file_path: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, file_path))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise EditError(f"'{file_path}' is outside of the repository")
+        return path
+
+    def _load(self, file_path: str) -> str:
+        path = self._resolve(file_path)
+        if path not in self.contents:
+            try:
+                with open(path, "r") as file:
+                    self.originals[path] = file.read()
+            except FileNotFoundError:
+                raise EditError(f"File '{file_path}' not found")
+            self.contents[path] = self.originals[path]
+        return self.contents[path]
+
+    def apply(self, edit: dict):
+        op = edit.get("op")
+        file_path = edit.get("file")
+        if not file_path:
+            raise EditError(f"Edit {edit} has no 'file'")
+
+        if op == "write":
+            path = self._resolve(file_path)
+            if path not in self.originals:
+                try:
+                    with open(path, "r") as file:
+                        self.originals[path] = file.read()
+                except FileNotFoundError:
+                    self.originals[path] = None
+            self.contents[path] = edit["content"]
+            return
+
+        content = self._load(file_path)
+        path = self._resolve(file_path)
+        if op == "replace":
+            old, new = edit["old"], edit["new"]
+            if old not in content:
+                raise EditError(f"Text to replace not found in '{file_path}': {old[:80]!r}")
+            count = edit.get("count", 0) or -1
+            self.contents[path] = content.replace(old, new, count)
+        elif op == "regex":
+            modified, replaced = re.subn(edit["pattern"], edit["replacement"], content)
+            if not replaced:
+                raise EditError(f"Pattern {edit['pattern']!r} did not match in '{file_path}'")
+            self.contents[path] = modified
+        elif op == "replace_function":
+            try:
+                self.contents[path] = replace_function(content, ast.parse(content), edit["function"], edit["content"])
+            except SyntaxError as e:
+                raise EditError(f"'{file_path}' does not parse before replacing {edit['function']}: {e}")
+            except SourceEditError as e:
+                raise EditError(f"{e} in '{file_path}'")
+        else:
+            raise EditError(f"Unknown edit op '{op}'")
+
+    def validate(self):
+        """Every edited Python file must still parse; this is the only full parse per file."""
+        for path, content in self.contents.items():
+            if path.endswith(".py"):
+                try:
+                    ast.parse(content, filename=path)
+                except SyntaxError as e:
+                    raise EditError(f"'{os.path.relpath(path, self.root)}' would not parse: {e.msg} (line {e.lineno})")
+
+    def commit(self) -> List[str]:
+        """
+        Writes all changed files with temp-file renames.
+
+        All temp files are written before the first rename; if a rename fails, the files already
+        replaced are restored from their original content.
+
+        Returns:
+            List[str]: Absolute paths of the files that changed.
+        """
+        self.validate()
+        changed = [path for path, content in self.contents.items() if content != self.originals.get(path)]
+
+        staged = {}
+        try:
+            for path in changed:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = _create_temp(os.path.dirname(path))
+                with os.fdopen(fd, "w") as file:
+                    file.write(self.contents[path])
+                if os.path.exists(path):
+                    os.chmod(tmp_path, os.stat(path).st_mode)
+                staged[path] = tmp_path
+        except OSError as e:
+            for tmp_path in staged.values():
+                os.remove(tmp_path)
+            raise EditError(f"Could not stage edits: {e}")
+
+        replaced = []
+        try:
+            for path in changed:
+                os.replace(staged.pop(path), path)
+                replaced.append(path)
+        except OSError as e:
+            for tmp_path in staged.values():
+                os.remove(tmp_path)
+            for path in replaced:
+                if self.originals.get(path) is None:
+                    os.remove(path)
+                else:
+                    with open(path, "w") as file:
+                        file.write(self.originals[path])
+            raise EditError(f"Could not apply edits, rolled back: {e}")
+        return changed
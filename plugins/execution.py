@@ -1,12 +1,126 @@
+import asyncio
+import glob
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 from autogen_ext.code_executors.docker import DockerCommandLineCodeExecutor
 from autogen_agentchat.agents import CodeExecutorAgent
 from autogen_agentchat.messages import TextMessage
 from autogen_core import CancellationToken
+from plugins.file_listing import invalidate_listing
+from tracing import trace
+
+
+def docker_executor_factory(work_dir: str) -> DockerCommandLineCodeExecutor:
+    return DockerCommandLineCodeExecutor(work_dir=work_dir, auto_remove=True)
+
+
+# Directories created by running Python and pytest in a repository
+RUN_CACHE_DIRS = ("__pycache__", ".pytest_cache")
+# Backends selectable with EXECUTOR_BACKEND; the offline benchmarks register "local"
+EXECUTOR_FACTORIES = {"docker": docker_executor_factory}
+
+
+class ExecutorPool:
+    """Keeps one started code executor (container) per working directory warm and reaps idle ones.
+
+    Any object with async start()/stop() and execute_code_blocks() works as executor, so tests
+    can pass a factory for a local stand-in instead of Docker.
+    """
+
+    def __init__(self,
+                 executor_factory: Callable[[str], object] = docker_executor_factory,
+                 idle_timeout: float = 300.0):
+        self.executor_factory = executor_factory
+        self.idle_timeout = idle_timeout
+        self._executors: Dict[str, object] = {}
+        self._last_used: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def acquire(self, work_dir: str):
+        """Yields a started executor for work_dir, exclusive to the caller until the block exits."""
+        work_dir = os.path.abspath(work_dir)
+        lock = self._locks.setdefault(work_dir, asyncio.Lock())
+        async with lock:
+            executor = self._executors.get(work_dir)
+            if executor is None:
+                print(f"DOCKER EXECUTOR starting for {work_dir}")
+                executor = self.executor_factory(work_dir)
+                with trace("docker", "start"):
+                    await executor.start()
+                self._executors[work_dir] = executor
+            self._ensure_reaper()
+            try:
+                yield executor
+            finally:
+                self._reset(work_dir)
+                self._last_used[work_dir] = time.monotonic()
+
+    @staticmethod
+    def _reset(work_dir: str):
+        """
+        Removes what running code leaves behind: the executor's tmp_code_* scripts and the bytecode
+        and pytest caches, so the next use starts from the repository state.
+
+        The tester's temp_test* files stay; the tester writes them through FilePlugin before every
+        run, and kernel.SCRATCH_FILES keeps them out of the instance patch.
+        """
+        for path in glob.glob(os.path.join(work_dir, "tmp_code_*")):
+            os.remove(path)
+        for root, dirs, _ in os.walk(work_dir):
+            for name in [name for name in dirs if name in RUN_CACHE_DIRS or name == ".git"]:
+                dirs.remove(name)
+                if name != ".git":
+                    # Files a container wrote as root may not be removable; listings skip these directories anyway
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        # The executed code may have created or deleted files the git index does not know about
+        invalidate_listing(work_dir)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        while self._executors:
+            await asyncio.sleep(self.idle_timeout / 2)
+            await self.reap_idle()
+
+    async def reap_idle(self):
+        """Stops every executor that has not been used for idle_timeout seconds."""
+        now = time.monotonic()
+        for work_dir in list(self._executors):
+            lock = self._locks[work_dir]
+            if lock.locked() or now - self._last_used.get(work_dir, now) < self.idle_timeout:
+                continue
+            async with lock:
+                executor = self._executors.pop(work_dir, None)
+                if executor is not None:
+                    print(f"DOCKER EXECUTOR idle, stopping {work_dir}")
+                    await executor.stop()
+
+    async def close(self):
+        """Stops all executors, called when the instance is finished."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for work_dir in list(self._executors):
+            async with self._locks[work_dir]:
+                executor = self._executors.pop(work_dir, None)
+                if executor is not None:
+                    await executor.stop()
+
 
 class ExecutorPlugin:
     """A plugin for executing code within a container"""
-    
+
+    def __init__(self, workspace: str = "./coding", pool: Optional[ExecutorPool] = None):
+        self.workspace = workspace
+        self.pool = pool or ExecutorPool()
+
     @kernel_function
     async def run_code_executor_agent(self, code: str, repo_name: str) -> str:
         """
@@ -19,22 +133,18 @@ class ExecutorPlugin:
         Returns:
             str: The result of the execution
         """
-        docker_executor = DockerCommandLineCodeExecutor(work_dir=f"coding/{repo_name}", auto_remove=True)
-        # Create a code executor agent that uses a Docker container to execute code.
-        await docker_executor.start()
-        code_executor_agent = CodeExecutorAgent("code_executor", code_executor=docker_executor)
-        # Run the agent with a given code snippet.
-        task = TextMessage(
-            content=code,
-            source="user",
-        )
-        print("DOCKER EXECUTION running...")
-        response = await code_executor_agent.on_messages([task], CancellationToken())
-
-        # Stop the code executor.
-        await docker_executor.stop()
-        print("DOCKER EXECUTION finished.")
-        return response.chat_message.__str__
+        async with self.pool.acquire(f"{self.workspace}/{repo_name}") as docker_executor:
+            # The container stays warm in the pool, the agent is cheap to create per call.
+            code_executor_agent = CodeExecutorAgent("code_executor", code_executor=docker_executor)
+            task = TextMessage(
+                content=code,
+                source="user",
+            )
+            print("DOCKER EXECUTION running...")
+            with trace("docker", "exec"):
+                response = await code_executor_agent.on_messages([task], CancellationToken())
+            print("DOCKER EXECUTION finished.")
+        return response.chat_message.content
     
     # @kernel_function
     # async def write_file(self, repository_name: str, file_path: str, content: str) -> str:
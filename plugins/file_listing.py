@@ -0,0 +1,188 @@
+import base64
+import fnmatch
+import hashlib
+import os
+import subprocess
+import threading
+import weakref
+from typing import Iterable, List, Optional, Tuple
+
+# Never useful to an agent reading code
+IGNORED_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".tox", ".nox", ".venv", "venv",
+                ".mypy_cache", ".pytest_cache", ".ruff_cache", "build", "dist", ".symbol_index",
+                ".search_index"}
+IGNORED_EXTENSIONS = {".pyc", ".pyo", ".so", ".o", ".a", ".dll", ".dylib", ".class", ".jar", ".whl", ".egg",
+                      ".zip", ".gz", ".bz2", ".xz", ".tar", ".7z", ".png", ".jpg", ".jpeg", ".gif", ".bmp",
+                      ".ico", ".svg", ".pdf", ".woff", ".woff2", ".ttf", ".eot", ".mo", ".pkl", ".npy",
+                      ".npz", ".parquet", ".db", ".sqlite3", ".mp3", ".mp4"}
+
+
+# One lister per repository directory, shared by every FilePlugin of the process and dropped
+# with the last plugin holding it (i.e. when the instance's workspace is done)
+_LISTERS: "weakref.WeakValueDictionary[str, FileLister]" = weakref.WeakValueDictionary()
+_LISTERS_LOCK = threading.Lock()
+
+
+def file_lister(repo_path: str) -> "FileLister":
+    """The shared lister of a repository, so a write through any plugin invalidates what all of them see."""
+    key = os.path.realpath(repo_path)
+    with _LISTERS_LOCK:
+        lister = _LISTERS.get(key)
+        if lister is None:
+            lister = FileLister(repo_path)
+            _LISTERS[key] = lister
+        return lister
+
+
+def invalidate_listing(path: str):
+    """
+    Drops the cached listing of the repository containing path.
+
+    The cache key only covers commits and the git index, so whoever creates or deletes
+    untracked files (a FilePlugin write, a script run by the executor) has to call this.
+    """
+    path = os.path.realpath(path)
+    with _LISTERS_LOCK:
+        listers = list(_LISTERS.items())
+    for repo_path, lister in listers:
+        if path == repo_path or path.startswith(repo_path + os.sep):
+            lister.invalidate()
+
+
+class ListingChanged(Exception):
+    """The continuation token belongs to a different listing (other query or repository state)."""
+
+
+class FileLister:
+    """Lists the files of a repository, from the git index when there is one and with os.scandir otherwise.
+
+    The unfiltered listing is cached per commit and index state, so repeated and paginated
+    queries only filter an in-memory list.
+    """
+
+    def __init__(self, repo_path: str, ignored_dirs: Iterable[str] = IGNORED_DIRS,
+                 ignored_extensions: Iterable[str] = IGNORED_EXTENSIONS):
+        self.repo_path = repo_path
+        self.ignored_dirs = set(ignored_dirs)
+        self.ignored_extensions = set(ignored_extensions)
+        self._git_dir: Optional[str] = None
+        self._cache_key: Optional[tuple] = None
+        self._files: Optional[List[str]] = None
+
+    def _ignored(self, rel_path: str) -> bool:
+        parts = rel_path.split("/")
+        if any(part in self.ignored_dirs or part.endswith(".egg-info") for part in parts[:-1]):
+            return True
+        return os.path.splitext(parts[-1])[1].lower() in self.ignored_extensions
+
+    def _resolve_git_dir(self) -> Optional[str]:
+        if self._git_dir is None and os.path.exists(os.path.join(self.repo_path, ".git")):
+            result = subprocess.run(["git", "-C", self.repo_path, "rev-parse", "--absolute-git-dir"],
+                                    capture_output=True, text=True)
+            if result.returncode == 0:
+                self._git_dir = result.stdout.strip()
+        return self._git_dir
+
+    def state_key(self) -> Optional[tuple]:
+        """Identifies the commit and index state, or None when the listing can not be cached."""
+        git_dir = self._resolve_git_dir()
+        if git_dir is None:
+            return None
+        try:
+            with open(os.path.join(git_dir, "HEAD"), "r") as file:
+                head = file.read().strip()
+            index_mtime = os.stat(os.path.join(git_dir, "index")).st_mtime_ns
+        except OSError:
+            return None
+        return head, index_mtime
+
+    def _git_files(self) -> List[str]:
+        result = subprocess.run(
+            ["git", "-C", self.repo_path, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            capture_output=True, check=True,
+        )
+        paths = {path.decode("utf-8", errors="replace") for path in result.stdout.split(b"\0") if path}
+        # Deleted but not yet staged files are still in the index
+        return [path for path in paths if not self._ignored(path) and os.path.exists(os.path.join(self.repo_path, path))]
+
+    def _scan_files(self) -> List[str]:
+        files = []
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            with os.scandir(os.path.join(self.repo_path, rel_dir)) as entries:
+                for entry in entries:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.ignored_dirs and not entry.name.endswith(".egg-info"):
+                            stack.append(rel_path)
+                    elif not self._ignored(rel_path):
+                        files.append(rel_path)
+        return files
+
+    def all_files(self) -> List[str]:
+        key = self.state_key()
+        if key is not None and key == self._cache_key and self._files is not None:
+            return self._files
+        files = self._git_files() if self._resolve_git_dir() else self._scan_files()
+        self._files = sorted(files)
+        self._cache_key = key
+        return self._files
+
+    def invalidate(self):
+        self._files = None
+
+    def list(self,
+             pattern: str = "",
+             extensions: Iterable[str] = (),
+             max_depth: int = 0,
+             page_size: int = 200,
+             continuation_token: str = "") -> Tuple[List[str], Optional[str], int]:
+        """
+        Lists files matching the filters, one page at a time.
+
+        Args:
+            pattern (str): Glob on the relative path, e.g. "django/db/*.py" ("*" also crosses "/").
+            extensions (Iterable[str]): Allowed extensions, e.g. ["py", "txt"]; empty for all.
+            max_depth (int): Maximum directory depth (1 = top level only), 0 for unlimited.
+            page_size (int): Maximum number of paths per page.
+            continuation_token (str): Token returned for the previous page, empty for the first page.
+
+        Returns:
+            Tuple[List[str], Optional[str], int]: The page, the token of the next page (None on the last page)
+            and the number of matching files after this page.
+
+        Raises:
+            ListingChanged: If the token was issued for another query or repository state.
+            ValueError: If page_size is not positive.
+        """
+        if page_size <= 0:
+            raise ValueError(f"page_size must be at least 1, got {page_size}")
+        extensions = {f".{extension.lower().lstrip('.')}" for extension in extensions if extension}
+        files = self.all_files()
+        matching = [
+            path for path in files
+            if (not pattern or fnmatch.fnmatch(path, pattern))
+            and (not extensions or os.path.splitext(path)[1].lower() in extensions)
+            and (not max_depth or path.count("/") < max_depth)
+        ]
+
+        fingerprint = hashlib.sha1(
+            repr((self._cache_key, len(files), pattern, sorted(extensions), max_depth)).encode("utf-8")
+        ).hexdigest()[:12]
+        offset = 0
+        if continuation_token:
+            try:
+                token_fingerprint, _, token_offset = base64.urlsafe_b64decode(continuation_token.encode()).decode().partition(":")
+                offset = int(token_offset)
+            except (ValueError, UnicodeDecodeError):
+                raise ListingChanged("Invalid continuation token")
+            if token_fingerprint != fingerprint:
+                raise ListingChanged("The repository or the query changed since the token was issued")
+
+        page = matching[offset:offset + page_size]
+        next_offset = offset + len(page)
+        next_token = None
+        if next_offset < len(matching):
+            next_token = base64.urlsafe_b64encode(f"{fingerprint}:{next_offset}".encode()).decode()
+        return page, next_token, len(matching) - next_offset
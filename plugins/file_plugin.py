@@ -1,15 +1,57 @@
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 from typing import Annotated, List, Optional
+import asyncio
 import ast
+import json
 import os
 import re
+from plugins.ast_cache import ParseCache
+from plugins.code_search import format_results, search, search_index
+from plugins.edit_transaction import EditError, EditTransaction
+from plugins.file_listing import FileLister, ListingChanged, file_lister, invalidate_listing
+from plugins.file_reader import read_lines
+from plugins import source_editor
+from plugins.source_editor import SourceEditError
+from plugins.symbol_index import SymbolIndex, format_symbol
 
 class FilePlugin:
     """A plugin for manipulating Python Code files"""
 
-    def __init__(self):
-        pass
+    def __init__(self, workspace: str = "./coding", parse_cache: Optional[ParseCache] = None):
+        self.workspace = workspace
+        self.parse_cache = parse_cache or ParseCache()
+        self._symbol_indexes = {}
+        self._search_indexes = {}
+        # Strong references to the shared listers of the repositories this plugin works on
+        self._file_listers = {}
+
+    def _write(self, file_path: str, content: str):
+        """Writes a file and keeps the parse cache and symbol index in sync with it."""
+        with open(file_path, "w") as file:
+            file.write(content)
+        self._written(file_path, content)
+
+    def _written(self, file_path: str, content: str):
+        self.parse_cache.update(file_path, content)
+        repository_name, _, rel_path = os.path.relpath(file_path, self.workspace).replace(os.sep, "/").partition("/")
+        invalidate_listing(file_path)
+        index = self._symbol_indexes.get(repository_name)
+        if index is not None and rel_path.endswith(".py"):
+            index.update_file(rel_path, content)
+
+    def _symbol_index(self, repository_name: str) -> SymbolIndex:
+        if repository_name not in self._symbol_indexes:
+            self._symbol_indexes[repository_name] = SymbolIndex(
+                repo_path=f"{self.workspace}/{repository_name}",
+                index_path=f"{self.workspace}/.symbol_index/{repository_name}.json",
+            )
+        return self._symbol_indexes[repository_name]
     
+    def _file_lister(self, repository_name: str) -> FileLister:
+        if repository_name not in self._file_listers:
+            self._file_listers[repository_name] = file_lister(f"{self.workspace}/{repository_name}")
+        return self._file_listers[repository_name]
+
     @kernel_function(name="overwrite_file",
                     description="Writes the provided content string to the specified file path within the repository with repository_name (overwrites existing content or creates a new file).")
     def overwrite_file(self, 
@@ -17,40 +59,29 @@ class FilePlugin:
                    file_path: Annotated[str, "Path to the file."], 
                    content: Annotated[str, "content to write to the file"]
                 ) -> Annotated[str, "Success/Error Message"]:
-        file_path = f"./coding/{repository_name}/{file_path}"
+        file_path = f"{self.workspace}/{repository_name}/{file_path}"
         try:
-            with open(file_path, "w") as file:
-                print(f"WRITE FILE {file_path}")
-                file.write(content)
+            print(f"WRITE FILE {file_path}")
+            self._write(file_path, content)
             return f"File {file_path} written successfully."
         except Exception as e:
             return f"An error occurred while writing to the file: {e}"
         
     @kernel_function(name="modify_function",
-                    description="This tool allows to access a python function within the provided a file and change the function content")
+                    description="This tool allows to access a python function within the provided a file and change the function content. "
+                                "Pass a complete def with the same name to replace the whole function (signature and decorators included), "
+                                "or only the statements to replace its body.")
     def modify_function(self, 
                    repository_name: Annotated[str, "The name of the repository"], 
                    file_path: Annotated[str, "Path to the file."], 
                    function_name: Annotated[str, "Name of the Python Function to Edit."],
                    content: Annotated[str, "content to write to the function"]
                 ) -> Annotated[str, "Success/Error Message"]:
-        file_path = f"./coding/{repository_name}/{file_path}"
-        
-        with open(file_path, "r") as file:
-            tree = ast.parse(file.read())
-            
-        class FunctionModifier(ast.NodeTransformer):
-            def visit_FunctionDef(self, node):
-                if node.name == function_name:
-                    node.body = [ast.parse(content).body[0]]
-                return node
-            
-        modified_tree = FunctionModifier().visit(tree)
-        modified_code = ast.unparse(modified_tree)
-        
-        with open(file_path, "w") as file:
-            file.write(modified_code)
+        file_path = f"{self.workspace}/{repository_name}/{file_path}"
         
+        error = self._splice(file_path, source_editor.replace_function, function_name, content)
+        if error:
+            return error
         return f"MODIFY FUNCTION {function_name} in {file_path} successful!"
             
                 
@@ -62,24 +93,22 @@ class FilePlugin:
                    replacement: Annotated[str, "The replacement for the Regex Pattern."]
                 ) -> Annotated[str, "Success or Error Message"]:
         
-        file_path = f"./coding/{repository_name}/{file_path}"
+        file_path = f"{self.workspace}/{repository_name}/{file_path}"
         
         with open(file_path, "r") as file:
             content = file.read()
         
         modified_content = re.sub(pattern, replacement, content)
-        with open(file_path, "w") as file:
-            file.write(modified_content)
+        self._write(file_path, modified_content)
             
         return f"FIND AND REPLACE in {file_path} successful!"
     
     @kernel_function
     def list_functions(self, repository_name: Annotated[str, "Name of the Repository."], filename: Annotated[str, "Path to the Python file"]) -> List[str]:
         """Returns a list of all function names in a Python file."""
-        filename = f"./coding/{repository_name}/{filename}"
+        filename = f"{self.workspace}/{repository_name}/{filename}"
 
-        with open(filename, "r") as file:
-            tree = ast.parse(file.read())
+        _, tree = self.parse_cache.get(filename)
         return [node.name for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
     
     @kernel_function
@@ -88,35 +117,42 @@ class FilePlugin:
                          function_name: Annotated[str, "Function name to extract"]) -> Optional[str]:
         """Extracts the entire source code of a given function."""
         
-        filename = f"./coding/{repository_name}/{filename}"
-        with open(filename, "r") as file:
-            tree = ast.parse(file.read())
+        filename = f"{self.workspace}/{repository_name}/{filename}"
+        source, tree = self.parse_cache.get(filename)
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and node.name == function_name:
-                return ast.unparse(node)  # Returns function source code
-        return None
+        node = source_editor.find_function(tree, function_name)
+        if node is None:
+            return None
+        return source_editor.source_segment(source, node)  # Returns function source code as written
     
+    def _splice(self, filename: str, edit, *args) -> Optional[str]:
+        """
+        Applies a source_editor edit to a file; only the edited span changes, the rest is kept byte for byte.
+
+        Returns an error message, and writes nothing, if the edit fails or the result would not parse.
+        """
+        source, tree = self.parse_cache.get(filename)
+        try:
+            modified = edit(source, tree, *args)
+            ast.parse(modified, filename=filename)
+        except SourceEditError as e:
+            return f"Error: {e} in {filename}."
+        except SyntaxError as e:
+            return f"Error: the edit would leave {filename} unparseable: {e.msg} (line {e.lineno}). Nothing was written."
+        self._write(filename, modified)
+        return None
+
+    def _edit(self, filename: str, edit, *args) -> str:
+        return self._splice(filename, edit, *args) or f"{edit.__name__.upper().replace('_', ' ')} in {filename} successful!"
+
     @kernel_function
     def modify_function_args(self, repository_name: Annotated[str, "Name of the Repository."], 
                            filename: Annotated[str, "Path to the Python file"], 
                              function_name: Annotated[str, "Function to modify"], 
-                             new_args: Annotated[List[str], "List of new argument names"]):
-        """Replaces the arguments of a given function."""
-        filename = f"./coding/{repository_name}/{filename}"
-
-        with open(filename, "r") as file:
-            tree = ast.parse(file.read())
-        
-        class ArgModifier(ast.NodeTransformer):
-            def visit_FunctionDef(self, node):
-                if node.name == function_name:
-                    node.args.args = [ast.arg(arg=name) for name in new_args]
-                return node
-        
-        modified_tree = ArgModifier().visit(tree)
-        with open(filename, "w") as file:
-            file.write(ast.unparse(modified_tree))
+                             new_args: Annotated[List[str], "New parameters in order, e.g. ['self', 'x: int = 0', '*args']"]):
+        """Replaces the parameter list of a given function."""
+        filename = f"{self.workspace}/{repository_name}/{filename}"
+        return self._edit(filename, source_editor.replace_parameters, function_name, new_args)
     
     @kernel_function
     def modify_return_type(self, repository_name: Annotated[str, "Name of the Repository."], 
@@ -124,20 +160,8 @@ class FilePlugin:
                            function_name: Annotated[str, "Function to modify"], 
                            new_return_type: Annotated[str, "New return type annotation"]):
         """Changes the return type annotation of a function."""
-        filename = f"./coding/{repository_name}/{filename}"
-
-        with open(filename, "r") as file:
-            tree = ast.parse(file.read())
-        
-        class ReturnTypeModifier(ast.NodeTransformer):
-            def visit_FunctionDef(self, node):
-                if node.name == function_name:
-                    node.returns = ast.Name(id=new_return_type)
-                return node
-        
-        modified_tree = ReturnTypeModifier().visit(tree)
-        with open(filename, "w") as file:
-            file.write(ast.unparse(modified_tree))
+        filename = f"{self.workspace}/{repository_name}/{filename}"
+        return self._edit(filename, source_editor.replace_return_type, function_name, new_return_type)
 
     @kernel_function
     def convert_function_to_method(self, repository_name: Annotated[str, "Name of the Repository."], 
@@ -145,70 +169,167 @@ class FilePlugin:
                                    function_name: Annotated[str, "Function to convert"], 
                                    class_name: Annotated[str, "Class name to place function in"]):
         """Converts a standalone function into a method inside a given class."""
-        filename = f"./coding/{repository_name}/{filename}"
-
-        with open(filename, "r") as file:
-            tree = ast.parse(file.read())
-        
-        class FunctionToMethodTransformer(ast.NodeTransformer):
-            def visit_ClassDef(self, node):
-                if node.name == class_name:
-                    for func_node in ast.walk(tree):
-                        if isinstance(func_node, ast.FunctionDef) and func_node.name == function_name:
-                            func_node.args.args.insert(0, ast.arg(arg="self"))  # Add self argument
-                            node.body.append(func_node)
-                            return node
-                return node
-
-        modified_tree = FunctionToMethodTransformer().visit(tree)
-        with open(filename, "w") as file:
-            file.write(ast.unparse(modified_tree))
+        filename = f"{self.workspace}/{repository_name}/{filename}"
+        return self._edit(filename, source_editor.move_function_to_class, function_name, class_name)
     
     @kernel_function
     def remove_function(self, repository_name: Annotated[str, "Name of the Repository."], 
                            filename: Annotated[str, "Path to the Python file"], 
                         function_name: Annotated[str, "Function to remove"]):
         """Deletes a function from the Python file."""
-        filename = f"./coding/{repository_name}/{filename}"
-        with open(filename, "r") as file:
-            tree = ast.parse(file.read())
+        filename = f"{self.workspace}/{repository_name}/{filename}"
+        return self._edit(filename, source_editor.remove_function, function_name)
 
-        class FunctionRemover(ast.NodeTransformer):
-            def visit_Module(self, node):
-                node.body = [stmt for stmt in node.body if not (isinstance(stmt, ast.FunctionDef) and stmt.name == function_name)]
-                return node
+    @kernel_function(name="apply_edits",
+                    description="Applies several edits across files of the repository as one transaction: either all edits are written or none. "
+                                "edits is a JSON list of objects, each with 'file' and 'op': "
+                                "{'op': 'replace', 'old': <exact text>, 'new': <text>, 'count': <0 = all>}, "
+                                "{'op': 'regex', 'pattern': <regex>, 'replacement': <text>}, "
+                                "{'op': 'replace_function', 'function': <name>, 'content': <complete def>} or "
+                                "{'op': 'write', 'content': <full file content>}. "
+                                "Edits to the same file apply in order. The batch is rejected if an edit does not apply or a Python file would not parse.")
+    def apply_edits(self,
+                   repository_name: Annotated[str, "The name of the repository"],
+                   edits: Annotated[str, "JSON list of edits"]
+                ) -> Annotated[str, "Success/Error Message"]:
+        try:
+            batch = json.loads(edits)
+        except json.JSONDecodeError as e:
+            return f"Error: edits is not valid JSON: {e}"
+        if isinstance(batch, dict):
+            batch = [batch]
+
+        transaction = EditTransaction(f"{self.workspace}/{repository_name}")
+        try:
+            for number, edit in enumerate(batch, start=1):
+                try:
+                    transaction.apply(edit)
+                except KeyError as e:
+                    raise EditError(f"Edit {number} is missing {e}")
+                except EditError as e:
+                    raise EditError(f"Edit {number}: {e}")
+            changed = transaction.commit()
+        except (EditError, re.error) as e:
+            return f"Error: no file was changed. {e}"
 
-        modified_tree = FunctionRemover().visit(tree)
-        with open(filename, "w") as file:
-            file.write(ast.unparse(modified_tree))
+        for path in changed:
+            self._written(path, transaction.contents[path])
+        files = ", ".join(os.path.relpath(path, transaction.root) for path in changed) or "none"
+        print(f"APPLY EDITS {repository_name}: {len(batch)} edits, changed {files}")
+        return f"APPLY EDITS successful: {len(batch)} edits applied, files changed: {files}"
+
+    @kernel_function(name="find_symbol",
+                    description="Finds where a class, function or method is defined in the repository. Accepts a plain name (e.g. 'filter'), a qualified name (e.g. 'QuerySet.filter') or a dotted module path (e.g. 'django.db.models.query.QuerySet.filter'). Returns file paths and line spans.")
+    async def find_symbol(self,
+                   repository_name: Annotated[str, "The name of the repository"],
+                   name: Annotated[str, "Name of the symbol to find"]
+                ) -> Annotated[str, "Matching symbols with file and line span"]:
+        index = self._symbol_index(repository_name)
+        # Indexing touches every file on the first call, keep the event loop free meanwhile
+        await asyncio.to_thread(index.refresh)
+        matches = index.find(name)
+        if not matches:
+            return f"No symbol named '{name}' found in {repository_name}."
+        return "\n".join(format_symbol(symbol) for symbol in matches)
+
+    @kernel_function(name="list_symbols",
+                    description="Lists the classes, functions and methods whose qualified name (e.g. 'QuerySet.') or dotted module path (e.g. 'django.db.models.') starts with the given prefix.")
+    async def list_symbols(self,
+                   repository_name: Annotated[str, "The name of the repository"],
+                   prefix: Annotated[str, "Prefix of the qualified name"],
+                   limit: Annotated[int, "Maximum number of symbols to return"] = 100
+                ) -> Annotated[str, "Matching symbols with file and line span"]:
+        index = self._symbol_index(repository_name)
+        await asyncio.to_thread(index.refresh)
+        matches = index.with_prefix(prefix)
+        if not matches:
+            return f"No symbols starting with '{prefix}' found in {repository_name}."
+        lines = [format_symbol(symbol) for symbol in matches[:limit]]
+        if len(matches) > limit:
+            lines.append(f"... {len(matches) - limit} more, narrow the prefix to see them.")
+        return "\n".join(lines)
+
+    @kernel_function(name="search_code",
+                    description="Searches all files of the repository for a literal text or a regex (like grep -n) and returns the most relevant matching lines with context. "
+                                "Files defining the searched name rank first. Use it to find where something is defined, used or raised before reading files.")
+    async def search_code(self,
+                   repository_name: Annotated[str, "The name of the repository"],
+                   query: Annotated[str, "Text or regex to search for"],
+                   regex: Annotated[bool, "Treat query as a Python regex instead of literal text"] = False,
+                   case_sensitive: Annotated[bool, "Match case exactly"] = False,
+                   file_pattern: Annotated[str, "Optional glob on the relative path, e.g. '*.py' or 'django/db/*'"] = "",
+                   context_lines: Annotated[int, "Lines of context before and after each match"] = 2,
+                   max_results: Annotated[int, "Maximum number of matching lines to return"] = 50
+                ) -> Annotated[str, "Matching lines with context or an error message"]:
+        repo_path = f"{self.workspace}/{repository_name}"
+        if not os.path.exists(repo_path):
+            return f"Error: Repository path '{repo_path}' does not exist."
+        if repository_name not in self._search_indexes:
+            # The index is shared with every other plugin searching this repository
+            self._search_indexes[repository_name] = search_index(
+                repo_path=repo_path,
+                index_path=f"{self.workspace}/.search_index/{repository_name}.json",
+            )
+        index = self._search_indexes[repository_name]
+        try:
+            files = await asyncio.to_thread(self._file_lister(repository_name).all_files)
+            results, total, total_files, scanned = await asyncio.to_thread(
+                search, index, files, query, regex, case_sensitive, file_pattern, context_lines, max_results
+            )
+        except re.error as e:
+            return f"Error: Invalid regex {query!r}: {e}"
+        print(f"SEARCH CODE {repository_name}: {query!r} scanned {scanned} of {len(files)} files, {total} matches")
+        if not total:
+            return f"No matches for {query!r} in {repository_name}."
+        return format_results(results, total, total_files)
 
     @kernel_function
-    async def list_files_in_repository(self, repo: str) -> list[str]:
+    async def list_files_in_repository(self,
+                   repo: str,
+                   pattern: Annotated[str, "Optional glob on the relative path, e.g. 'django/db/*.py'"] = "",
+                   extensions: Annotated[str, "Optional comma separated extensions, e.g. 'py,txt'"] = "",
+                   max_depth: Annotated[int, "Maximum directory depth, 1 = top level only, 0 = unlimited"] = 0,
+                   page_size: Annotated[int, "Maximum number of paths to return"] = 200,
+                   continuation_token: Annotated[str, "Token from the previous page to get the next one"] = "",
+                ) -> list[str]:
         """
-        Lists all files in a given repository directory recursively.
+        Lists the files in a given repository directory recursively, skipping VCS, build and binary data files.
 
         Returns:
-            list: A list of file paths relative to the repository root, or an error message.
+            list: A page of file paths relative to the repository root (with a note on how to get the next page), or an error message.
         """
-        repo_path = f"./coding/{repo}"
+        repo_path = f"{self.workspace}/{repo}"
         try:
             if not os.path.exists(repo_path):
                 return [f"Error: Repository path '{repo_path}' does not exist."]
-            
-            file_list = []
-            for root, _, files in os.walk(repo_path):
-                for file in files:
-                    # Construct the relative file path
-                    relative_path = os.path.relpath(os.path.join(root, file), repo_path)
-                    file_list.append(relative_path)
-            
-            return file_list
+
+            lister = self._file_lister(repo)
+            page, next_token, remaining = await asyncio.to_thread(
+                lister.list, pattern, extensions.split(","), max_depth, page_size, continuation_token
+            )
+            if next_token:
+                page.append(f"... {remaining} more files. Call again with continuation_token='{next_token}' to continue.")
+            return page
+        except ListingChanged as e:
+            return [f"Error: {e}. Start again without a continuation_token."]
         except Exception as e:
             return [f"Error: An error occurred while listing files: {e}"]
+
     @kernel_function
-    def read_file(self, file_path: str, repo: str) -> str:
+    async def read_file(self,
+                   file_path: str,
+                   repo: str,
+                   start_line: Annotated[int, "First line to read (1-based)"] = 1,
+                   end_line: Annotated[int, "Last line to read (inclusive), 0 for the end of the file"] = 0,
+                   symbol: Annotated[str, "Optional class/function/method name; reads only its definition"] = "",
+                   max_chars: Annotated[int, "Maximum number of characters to return"] = 20000,
+                   start_column: Annotated[int, "Character offset within start_line to continue a truncated long line from"] = 0,
+                ) -> str:
         """
-        Reads the content of a file and returns it as a string.
+        Reads the content of a file (or a line range / symbol of it) and returns it as a string.
+
+        The first line of the result describes what was returned (line range, total lines, encoding)
+        and a marker at the end says where to continue if the output was truncated.
 
         Args:
             file_path (str): Path to the file to be read.
@@ -216,11 +337,32 @@ class FilePlugin:
         Returns:
             str: Content of the file or an error message.
         """
-        file_path = f"./coding/{repo}/{file_path}"
+        full_path = f"{self.workspace}/{repo}/{file_path}"
         try:
-            with open(file_path, "r") as file:
-                return file.read()
+            if symbol:
+                index = self._symbol_index(repo)
+                await asyncio.to_thread(index.refresh)
+                rel_path = os.path.normpath(file_path).replace(os.sep, "/")
+                matches = [match for match in index.find(symbol) if match["file"] == rel_path]
+                if not matches:
+                    return f"Error: Symbol '{symbol}' not found in '{file_path}'."
+                start_line, end_line = matches[0]["start"], matches[0]["end"]
+
+            text, meta = await asyncio.to_thread(read_lines, full_path, start_line, end_line or None, max_chars,
+                                                 start_column)
+            column = f" from column {meta['start_column']}" if meta["start_column"] else ""
+            header = (f"[file: {file_path} | lines {meta['start_line']}-{meta['end_line']}{column} of {meta['total_lines']}"
+                      f" | encoding: {meta['encoding']} | {meta['size_bytes']} bytes]")
+            if meta["total_lines"] and meta["start_line"] > meta["total_lines"]:
+                return f"{header}\nError: start_line is past the end of the file."
+            if meta["next_column"]:
+                text += (f"\n[... line {meta['end_line']} is longer than max_chars and was cut, "
+                         f"continue with start_line={meta['end_line']}, start_column={meta['next_column']} ...]")
+            elif meta["truncated"]:
+                text += (f"\n[... truncated at line {meta['end_line']} of {meta['total_lines']}, "
+                         f"continue with start_line={meta['end_line'] + 1} ...]")
+            return f"{header}\n{text}"
         except FileNotFoundError:
-            return f"Error: File '{file_path}' not found."
+            return f"Error: File '{full_path}' not found."
         except Exception as e:
-            return f"Error: An error occurred while reading the file: {e}"
\ No newline at end of file
+            return f"Error: An error occurred while reading the file: {e}"
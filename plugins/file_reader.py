@@ -0,0 +1,116 @@
+import mmap
+import os
+from typing import Optional, Tuple
+import chardet
+
+# Newlines are counted in chunks of this size, so only one chunk is copied out of the map at a time
+COUNT_CHUNK = 1024 * 1024
+# Bytes looked at when the slice is not valid UTF-8 and the encoding has to be guessed
+DETECT_BYTES = 64 * 1024
+
+
+def count_lines(mm: mmap.mmap) -> int:
+    lines = 0
+    for offset in range(0, len(mm), COUNT_CHUNK):
+        lines += mm[offset:offset + COUNT_CHUNK].count(b"\n")
+    if len(mm) and mm[len(mm) - 1:] != b"\n":
+        lines += 1  # last line without trailing newline
+    return lines
+
+
+def line_offset(mm: mmap.mmap, line: int, start: int = 0, start_line: int = 1) -> int:
+    """Byte offset of the first character of a 1-based line (len(mm) if the file is shorter)."""
+    position = start
+    for _ in range(line - start_line):
+        position = mm.find(b"\n", position)
+        if position < 0:
+            return len(mm)
+        position += 1
+    return position
+
+
+def decode(data: bytes, sample: bytes) -> Tuple[str, str]:
+    try:
+        return data.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        guess = chardet.detect(sample)
+        # Short samples give unreliable guesses, latin-1 at least decodes every byte
+        encoding = guess.get("encoding") if (guess.get("confidence") or 0) >= 0.7 else None
+        encoding = encoding or "latin-1"
+        return data.decode(encoding, errors="replace"), encoding
+
+
+def char_boundary(mm: mmap.mmap, position: int, start: int) -> int:
+    """Moves a byte offset back so it does not split a UTF-8 sequence (at most 3 continuation bytes)."""
+    for _ in range(3):
+        if start < position < len(mm) and mm[position] & 0xC0 == 0x80:
+            position -= 1
+    return position
+
+
+def read_lines(path: str, start_line: int = 1, end_line: Optional[int] = None,
+               max_chars: int = 20000, start_column: int = 0) -> Tuple[str, dict]:
+    """
+    Reads a line range of a file through a memory map, so only the requested slice is loaded.
+
+    Args:
+        path (str): Path to the file.
+        start_line (int): First line to return (1-based).
+        end_line (int): Last line to return (inclusive), None for the end of the file.
+        max_chars (int): Cap on the returned text; the slice is cut at a line boundary above it,
+            or inside the line if a single line is longer than the cap.
+        start_column (int): Character offset within start_line to start from, used to continue
+            reading an overlong line.
+
+    Returns:
+        Tuple[str, dict]: The text and its metadata (total_lines, start_line, start_column, end_line,
+        next_column, encoding, truncated, size_bytes). next_column is non-zero when the text ends
+        inside end_line and gives the offset to continue from.
+    """
+    start_line = max(start_line, 1)
+    start_column = max(start_column, 0)
+    size = os.path.getsize(path)
+    if size == 0:
+        return "", {"total_lines": 0, "start_line": 0, "start_column": 0, "end_line": 0, "next_column": 0,
+                    "encoding": "utf-8", "truncated": False, "size_bytes": 0}
+
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        total_lines = count_lines(mm)
+        end_line = total_lines if end_line is None else min(end_line, total_lines)
+        begin = line_offset(mm, start_line)
+        end = line_offset(mm, end_line + 1, begin, start_line)
+        truncated = False
+        # A character takes at most 4 bytes, so never map in more than the cap can use
+        byte_cap = begin + (start_column + max_chars) * 4
+        if end > byte_cap:
+            # The column is at least start_column bytes into the line, a newline before it does not help
+            newline = mm.rfind(b"\n", begin + start_column, byte_cap)
+            end = newline + 1 if newline >= 0 else char_boundary(mm, byte_cap, begin)
+            truncated = True
+        text, encoding = decode(mm[begin:end], mm[begin:begin + DETECT_BYTES])
+
+    first_line = text.find("\n")
+    start_column = min(start_column, len(text) if first_line < 0 else first_line)
+    text = text[start_column:]
+    next_column = 0
+    if truncated or len(text) > max_chars:
+        truncated = True
+        cut = text.rfind("\n", 0, max_chars)
+        if cut >= 0:
+            text = text[:cut + 1]
+        else:
+            # Cut inside a single overlong line, the rest of it is read from next_column
+            text = text[:max_chars]
+            next_column = start_column + len(text)
+        end_line = start_line + text.count("\n") - (0 if next_column else 1)
+
+    return text, {
+        "total_lines": total_lines,
+        "start_line": start_line,
+        "start_column": start_column,
+        "end_line": end_line,
+        "next_column": next_column,
+        "encoding": encoding,
+        "truncated": truncated,
+        "size_bytes": size,
+    }
@@ -1,19 +1,130 @@
+import asyncio
+import re
 import httpx
 from pydantic import BaseModel
 import subprocess
-import requests
-import os
 import base64
+import time
+from collections import OrderedDict
 from pathlib import Path
+from typing import Iterable, Optional
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
+from tracing import trace
 
 class GitHubSettings(BaseModel):
     base_url: str = "https://api.github.com"
+    clone_url: str = "https://github.com"
     token: str
 
+async def _terminate(process: asyncio.subprocess.Process):
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass  # already exited
+    await process.wait()
+
+
+async def run_git(*args: str, timeout: float = 900.0, progress: bool = False) -> str:
+    """
+    Runs a git command without blocking the event loop.
+
+    Args:
+        args (str): Arguments after `git`.
+        timeout (float): Seconds after which the process is killed.
+        progress (bool): Stream git's progress output (stderr) to the console while it runs.
+
+    Returns:
+        str: The standard output.
+
+    Raises:
+        subprocess.CalledProcessError: If git exits with a non-zero status.
+        subprocess.TimeoutExpired: If the command does not finish within timeout.
+    """
+    command = ["git", *args]
+    subcommand = next((arg for prev, arg in zip(("",) + args, args)
+                       if not arg.startswith("-") and prev not in ("-C", "--git-dir")), "git")
+    with trace("git", subcommand):
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+
+        async def read_stderr() -> bytes:
+            collected = b""
+            while chunk := await process.stderr.read(4096):
+                collected += chunk
+                if progress:
+                    # git redraws progress lines with carriage returns
+                    for line in re.split(rb"[\r\n]+", chunk):
+                        if line.strip():
+                            print(f"GIT {subcommand}: {line.decode(errors='replace').strip()}")
+            return collected
+
+        try:
+            stdout, stderr, _ = await asyncio.wait_for(
+                asyncio.gather(process.stdout.read(), read_stderr(), process.wait()), timeout
+            )
+        except asyncio.TimeoutError:
+            await _terminate(process)
+            raise subprocess.TimeoutExpired(command, timeout)
+        except asyncio.CancelledError:
+            await _terminate(process)
+            raise
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+        return stdout.decode(errors="replace")
+
+
+async def working_tree_diff(repo_path: str, base_commit: str, timeout: float = 300.0,
+                            exclude: Iterable[str] = ()) -> str:
+    """
+    The changes of a checkout relative to base_commit as a patch, including files that are not tracked yet.
+
+    Files whose name matches one of the exclude globs (in any directory) are left out.
+    """
+    pathspec = ["--", ".", *(f":(exclude,glob)**/{pattern}" for pattern in exclude)]
+    # Intent-to-add only touches the index, so new files show up in the diff without being staged
+    await run_git("-C", repo_path, "add", "--intent-to-add", "--all", *pathspec, timeout=timeout)
+    return await run_git("-C", repo_path, "diff", base_commit, *pathspec, timeout=timeout)
+
+
+class ConditionalCache:
+    """LRU cache of GitHub API responses that carry an ETag or Last-Modified validator."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, path: str) -> Optional[httpx.Response]:
+        response = self._entries.get(path)
+        if response is not None:
+            self._entries.move_to_end(path)
+        return response
+
+    def put(self, path: str, response: httpx.Response):
+        self._entries[path] = response
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
 class GitHubPlugin:
-    def __init__(self, settings: GitHubSettings):
+    # Mirrors are shared between all plugin instances of the process, so are their locks
+    _mirror_locks: dict = {}
+    # One pooled API client (and response cache) per distinct GitHubSettings and transport
+    _connections: dict = {}
+
+    def __init__(self, settings: GitHubSettings, workspace: str = "./coding",
+                 mirror_root: str = "./coding/.mirrors", mirror_refresh_seconds: float = 600.0,
+                 git_timeout: float = 900.0, max_connections: int = 16,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         self.settings = settings
+        self.workspace = workspace
+        self.mirror_root = mirror_root
+        self.mirror_refresh_seconds = mirror_refresh_seconds
+        self.git_timeout = git_timeout
+        self.max_connections = max_connections
+        self.transport = transport
 
     @staticmethod
     def build_query(path: str, key: str, value: str) -> str:
@@ -28,8 +139,58 @@ class GitHubPlugin:
         response.raise_for_status()
         return response.json()
     
-    @staticmethod
-    async def list_repository_files(owner: str, repository: str, branch: str = "main") -> list:
+    def _connection(self) -> tuple:
+        """Returns the pooled client and conditional-request cache shared by all plugins with equal settings."""
+        key = (self.settings.base_url, self.settings.token, self.transport)
+        if key not in GitHubPlugin._connections:
+            client = httpx.AsyncClient(
+                base_url=self.settings.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.settings.token}",
+                    "Accept": "application/vnd.github.v3+json",
+                },
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=30.0,
+                transport=self.transport,
+            )
+            GitHubPlugin._connections[key] = (client, ConditionalCache())
+        return GitHubPlugin._connections[key]
+
+    @classmethod
+    async def aclose(cls):
+        """Closes the pooled API clients of all plugins; called once when the process is done with GitHub."""
+        connections = list(cls._connections.values())
+        cls._connections.clear()
+        for client, _ in connections:
+            await client.aclose()
+
+    async def conditional_get(self, path: str) -> httpx.Response:
+        """
+        GETs an API path, revalidating cached responses with If-None-Match / If-Modified-Since.
+
+        A 304 answer does not count against the GitHub rate limit and is served from the cache.
+
+        Returns:
+            httpx.Response: The response; on a 304 the cached 200 response.
+        """
+        client, cache = self._connection()
+        cached = cache.get(path)
+        headers = {}
+        if cached is not None:
+            if cached.headers.get("ETag"):
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if cached.headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        response = await client.get(path, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if response.status_code == 200 and ("ETag" in response.headers or "Last-Modified" in response.headers):
+            await response.aread()
+            cache.put(path, response)
+        return response
+
+    async def list_repository_files(self, owner: str, repository: str, branch: str = "main") -> list:
         """
         Lists all files in a repository on the specified branch.
         
@@ -40,13 +201,7 @@ class GitHubPlugin:
         Returns:
             list: List of all file paths.
         """
-        token = os.getenv("GITHUB_TOKEN")
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        url = f"https://api.github.com/repos/{owner}/{repository}/git/trees/{branch}?recursive=1"
-        response = requests.get(url, headers=headers)
+        response = await self.conditional_get(f"/repos/{owner}/{repository}/git/trees/{branch}?recursive=1")
         if response.status_code == 200:
             tree = response.json().get("tree", [])
             return [item["path"] for item in tree if item["type"] == "blob"]
@@ -65,24 +220,72 @@ class GitHubPlugin:
                 relevant_files.append(file_path)
         return relevant_files
 
-    @staticmethod
-    async def fetch_code_from_github(owner: str, repository: str, file_path: str, branch: str = "main") -> str:
+    async def fetch_code_from_github(self, owner: str, repository: str, file_path: str, branch: str = "main") -> str:
         """
         Fetches the content of a file from GitHub.
         """
-        token = os.getenv("GITHUB_TOKEN")
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        url = f"https://api.github.com/repos/{owner}/{repository}/contents/{file_path}?ref={branch}"
-        response = requests.get(url, headers=headers)
+        response = await self.conditional_get(f"/repos/{owner}/{repository}/contents/{file_path}?ref={branch}")
         if response.status_code == 200:
             file_content: str = response.json().get("content", "")
             return base64.b64decode(file_content).decode("utf-8")  # Decode base64 file content
         else:
             return f"Error fetching file content: {response.status_code} - {response.text}"
 
+    async def fetch_files_from_github(self, owner: str, repository: str, file_paths: list,
+                                      branch: str = "main", max_concurrency: int = 8) -> dict:
+        """
+        Fetches the contents of many files concurrently.
+
+        Args:
+            owner (str): GitHub-Owner (e.g. Username or Organisation).
+            repository (str): name of the repository.
+            file_paths (list): Paths of the files to fetch.
+            branch (str): name of the branch
+            max_concurrency (int): Maximum number of requests in flight.
+        Returns:
+            dict: File path to content (or error message), in the order of file_paths.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(file_path: str) -> str:
+            async with semaphore:
+                return await self.fetch_code_from_github(owner, repository, file_path, branch)
+
+        contents = await asyncio.gather(*(fetch(file_path) for file_path in file_paths))
+        return dict(zip(file_paths, contents))
+
+    @classmethod
+    def _mirror_lock(cls, mirror_path: Path) -> asyncio.Lock:
+        return cls._mirror_locks.setdefault(str(mirror_path.resolve()), asyncio.Lock())
+
+    async def ensure_mirror(self, organization: str, repository_name: str) -> Path:
+        """
+        Creates or refreshes the local bare mirror of an upstream repository.
+
+        The mirror is shared by all workspaces. It is fetched incrementally, at most once
+        every mirror_refresh_seconds, so repeated clones of a known repository stay local.
+
+        Returns:
+            Path: Path to the bare mirror.
+        """
+        mirror_path = Path(self.mirror_root) / organization / f"{repository_name}.git"
+        async with self._mirror_lock(mirror_path):
+            if not mirror_path.exists():
+                mirror_path.parent.mkdir(parents=True, exist_ok=True)
+                repo_url = f"{self.settings.clone_url}/{organization}/{repository_name}.git"
+                await run_git("clone", "--mirror", "--progress", repo_url, str(mirror_path),
+                              timeout=self.git_timeout, progress=True)
+                return mirror_path
+
+            fetch_head = mirror_path / "FETCH_HEAD"
+            last_fetch = fetch_head.stat().st_mtime if fetch_head.exists() else (mirror_path / "HEAD").stat().st_mtime
+            if time.time() - last_fetch > self.mirror_refresh_seconds:
+                await run_git("--git-dir", str(mirror_path), "fetch", "--prune", "--progress", "origin",
+                              timeout=self.git_timeout, progress=True)
+            # Worktrees of wiped workspaces would otherwise block re-adding the same path
+            await run_git("--git-dir", str(mirror_path), "worktree", "prune", timeout=self.git_timeout)
+        return mirror_path
+
     @kernel_function
     async def clone_repository(self, organization: str, repository_name: str) -> str:
         """
@@ -95,11 +298,8 @@ class GitHubPlugin:
             str: Path to Repository or Error.
         """
         try:
-            # Erstelle die Repository-URL
-            repo_url = f"https://github.com/{organization}/{repository_name}.git"
-            
             # Zielverzeichnis erstellen, falls es nicht existiert
-            destination_path = Path('./coding')
+            destination_path = Path(self.workspace)
             destination_path.mkdir(parents=True, exist_ok=True)
             
             # Repository-Pfad erstellen
@@ -109,17 +309,17 @@ class GitHubPlugin:
             if repo_path.exists():
                 return f"Repository '{repository_name}' wurde bereits geklont in {repo_path}."
 
-            # Git-Klon-Befehl ausführen
-            subprocess.run(
-                ["git", "clone", repo_url, str(repo_path)],
-                check=True,
-            )
+            # Worktree aus dem lokalen Mirror erstellen statt eines vollständigen Klons
+            mirror_path = await self.ensure_mirror(organization, repository_name)
+            async with self._mirror_lock(mirror_path):
+                await run_git("--git-dir", str(mirror_path), "worktree", "add", "--detach",
+                              str(repo_path.resolve()), "HEAD", timeout=self.git_timeout)
             return f"Repository erfolgreich geklont: {repo_path}"
-        except subprocess.CalledProcessError as e:
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
             return f"Fehler beim Klonen des Repositorys: {e}"
     
     @kernel_function
-    def checkout_commit(self, repository: str, commit_hash: str):
+    async def checkout_commit(self, repository: str, commit_hash: str) -> str:
         """
         Checks out on a specified commit within the repository
         
@@ -128,12 +328,23 @@ class GitHubPlugin:
             commit_hash (str): The commit hash of the commit to check out to
         """
         try:
-            destination_path = Path('./coding')
+            destination_path = Path(self.workspace)
             destination_path.mkdir(parents=True, exist_ok=True)
             
-            repo_path = destination_path / repository
-            
-            subprocess.run(["git", "-C", repo_path, "checkout", commit_hash], check=True)
+            repo_path = str(destination_path / repository)
+
+            # The mirror may predate the commit, only then go to the network
+            try:
+                await run_git("-C", repo_path, "cat-file", "-e", f"{commit_hash}^{{commit}}", timeout=self.git_timeout)
+            except subprocess.CalledProcessError:
+                common_dir = (await run_git("-C", repo_path, "rev-parse", "--git-common-dir")).strip()
+                async with self._mirror_lock(Path(repo_path) / common_dir):
+                    await run_git("-C", repo_path, "fetch", "--prune", "--progress", "origin",
+                                  timeout=self.git_timeout, progress=True)
+
+            await run_git("-C", repo_path, "checkout", "--detach", commit_hash, timeout=self.git_timeout)
             print(f"Successfully checked out to commit: {commit_hash}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error during checkout: {e}")
\ No newline at end of file
+            return f"Successfully checked out to commit: {commit_hash}"
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            print(f"Error during checkout: {e}")
+            return f"Error during checkout: {e}"
@@ -0,0 +1,236 @@
+import ast
+import io
+import re
+import textwrap
+import tokenize
+from typing import List, Optional, Tuple
+
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class SourceEditError(Exception):
+    """The requested edit does not apply to the source (missing function or class, unexpected layout)."""
+
+
+def find_function(tree: ast.AST, function_name: str) -> Optional[ast.AST]:
+    for node in ast.walk(tree):
+        if isinstance(node, FUNCTION_NODES) and node.name == function_name:
+            return node
+    return None
+
+
+def find_class(tree: ast.AST, class_name: str) -> Optional[ast.ClassDef]:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            return node
+    return None
+
+
+def node_span(node: ast.AST) -> Tuple[int, int]:
+    """1-based (first, last) line of a definition, including its decorators."""
+    first = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+    return first, node.end_lineno
+
+
+def indentation(line: str) -> str:
+    return re.match(r"[ \t]*", line).group()
+
+
+def reindent(code: str, indent: str) -> List[str]:
+    """Dedents code and indents it to indent; returns lines with line endings."""
+    lines = [indent + line if line.strip() else line.lstrip(" \t")
+             for line in textwrap.dedent(code).splitlines(keepends=True)]
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    return lines
+
+
+def char_column(line: str, col_offset: int) -> int:
+    """ast column offsets count UTF-8 bytes, string slicing counts characters."""
+    return len(line.encode("utf-8")[:col_offset].decode("utf-8", errors="ignore"))
+
+
+def source_segment(source: str, node: ast.AST) -> str:
+    """The original text of a definition including decorators and comments inside it."""
+    first, last = node_span(node)
+    return "".join(source.splitlines(keepends=True)[first - 1:last])
+
+
+def _parameters_span(lines: List[str], node: ast.AST) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+    """
+    Locates the parameter list of a def by tokenizing its header.
+
+    Returns:
+        Positions (1-based line, character column) of the opening and closing parenthesis and of the ':' ending the header.
+    """
+    header = io.StringIO("".join(lines[node.lineno - 1:node.body[0].lineno]))
+    depth = 0
+    opening = closing = None
+    try:
+        for token in tokenize.generate_tokens(header.readline):
+            if token.type != tokenize.OP:
+                continue
+            if token.string in "([{":
+                depth += 1
+                if depth == 1 and opening is None:
+                    opening = token.start
+            elif token.string in ")]}":
+                depth -= 1
+                if depth == 0 and closing is None:
+                    closing = token.start
+            elif token.string == ":" and depth == 0 and closing is not None:
+                offset = node.lineno - 1
+                return ((opening[0] + offset, opening[1]), (closing[0] + offset, closing[1]),
+                        (token.start[0] + offset, token.start[1]))
+    except (tokenize.TokenError, IndentationError):
+        pass
+    raise SourceEditError(f"Could not locate the parameters of '{node.name}'")
+
+
+def _splice(lines: List[str], start: Tuple[int, int], end: Tuple[int, int], text: str) -> List[str]:
+    """Replaces the text between two (line, column) positions; end is exclusive."""
+    before = lines[start[0] - 1][:start[1]]
+    after = lines[end[0] - 1][end[1]:]
+    return lines[:start[0] - 1] + (before + text + after).splitlines(keepends=True) + lines[end[0]:]
+
+
+def _remove_lines(lines: List[str], first: int, last: int) -> List[str]:
+    """Removes lines first..last and the blank lines after them if the block was preceded by a blank line."""
+    while last < len(lines) and not lines[last].strip() and first > 1 and not lines[first - 2].strip():
+        last += 1
+    return lines[:first - 1] + lines[last:]
+
+
+def replace_function(source: str, tree: ast.Module, function_name: str, content: str) -> str:
+    """
+    Replaces a function. If content is a def of the same name, the whole definition (decorators included)
+    is replaced; otherwise content is taken as the new body and keeps the existing signature (and the
+    docstring, unless content brings its own).
+    """
+    node = find_function(tree, function_name)
+    if node is None:
+        raise SourceEditError(f"Function '{function_name}' not found")
+    lines = source.splitlines(keepends=True)
+
+    try:
+        replacement = ast.parse(textwrap.dedent(content)).body
+    except SyntaxError as e:
+        raise SourceEditError(f"The new content of '{function_name}' is not valid Python: {e.msg} (line {e.lineno})")
+    if replacement and len(replacement) == 1 and isinstance(replacement[0], FUNCTION_NODES) \
+            and replacement[0].name == function_name:
+        first, last = node_span(node)
+        new_lines = reindent(content, indentation(lines[node.lineno - 1]))
+        return "".join(lines[:first - 1] + new_lines + lines[last:])
+
+    body_first = node.body[0].lineno
+    last = node.end_lineno
+    if body_first == node.lineno:
+        # One-line def, e.g. "def f(): return 1": move the new body below the header
+        indent = indentation(lines[node.lineno - 1]) + "    "
+        column = char_column(lines[body_first - 1], node.body[0].col_offset)
+        header = lines[body_first - 1][:column].rstrip() + "\n"
+        rest = lines[last - 1][char_column(lines[last - 1], node.end_col_offset):]
+        new_lines = reindent(content, indent)
+        if rest.strip():
+            new_lines.append(rest)
+        return "".join(lines[:node.lineno - 1] + [header] + new_lines + lines[last:])
+
+    indent = indentation(lines[body_first - 1])
+    if _docstring(node.body) is not None and not (replacement and _docstring(replacement) is not None):
+        # Keep the documentation when only the statements are replaced
+        body_first = node.body[0].end_lineno + 1
+    return "".join(lines[:body_first - 1] + reindent(content, indent) + lines[last:])
+
+
+def _docstring(body: list) -> Optional[ast.Expr]:
+    first = body[0] if body else None
+    if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+        return first
+    return None
+
+
+def replace_parameters(source: str, tree: ast.Module, function_name: str, parameters: List[str]) -> str:
+    """Replaces the parameter list of a function, e.g. ["self", "x: int = 0", "*args"]."""
+    node = find_function(tree, function_name)
+    if node is None:
+        raise SourceEditError(f"Function '{function_name}' not found")
+    lines = source.splitlines(keepends=True)
+    opening, closing, _ = _parameters_span(lines, node)
+    return "".join(_splice(lines, (opening[0], opening[1] + 1), closing, ", ".join(parameters)))
+
+
+def replace_return_type(source: str, tree: ast.Module, function_name: str, return_type: str) -> str:
+    node = find_function(tree, function_name)
+    if node is None:
+        raise SourceEditError(f"Function '{function_name}' not found")
+    lines = source.splitlines(keepends=True)
+    if node.returns is not None:
+        start = (node.returns.lineno, char_column(lines[node.returns.lineno - 1], node.returns.col_offset))
+        end = (node.returns.end_lineno, char_column(lines[node.returns.end_lineno - 1], node.returns.end_col_offset))
+        return "".join(_splice(lines, start, end, return_type))
+    _, closing, _ = _parameters_span(lines, node)
+    return "".join(_splice(lines, (closing[0], closing[1] + 1), (closing[0], closing[1] + 1), f" -> {return_type}"))
+
+
+def remove_function(source: str, tree: ast.Module, function_name: str) -> str:
+    node = find_function(tree, function_name)
+    if node is None:
+        raise SourceEditError(f"Function '{function_name}' not found")
+    lines = source.splitlines(keepends=True)
+    first, last = node_span(node)
+
+    block = _enclosing_block(tree, node)
+    if block == [node]:
+        # The enclosing block would be empty
+        return "".join(lines[:first - 1] + [indentation(lines[node.lineno - 1]) + "pass\n"] + lines[last:])
+    return "".join(_remove_lines(lines, first, last))
+
+
+def _enclosing_block(tree: ast.Module, node: ast.AST) -> Optional[list]:
+    """The statement list (body, else, finally, except or case block) that contains node, None at module level."""
+    for candidate in ast.walk(tree):
+        if isinstance(candidate, ast.Module):
+            continue
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(candidate, field, None)
+            if isinstance(block, list) and node in block:
+                return block
+    return None
+
+
+def move_function_to_class(source: str, tree: ast.Module, function_name: str, class_name: str) -> str:
+    """Moves a function to the end of a class body and adds self as its first parameter."""
+    function = find_function(tree, function_name)
+    if function is None:
+        raise SourceEditError(f"Function '{function_name}' not found")
+    cls = find_class(tree, class_name)
+    if cls is None:
+        raise SourceEditError(f"Class '{class_name}' not found")
+    first, last = node_span(function)
+    if cls.lineno <= first and last <= cls.end_lineno:
+        raise SourceEditError(f"'{function_name}' is already defined inside '{class_name}'")
+
+    lines = source.splitlines(keepends=True)
+    method = textwrap.dedent("".join(lines[first - 1:last]))
+    method_tree = ast.parse(method)
+    method_node = method_tree.body[0]
+    if not (method_node.args.posonlyargs or method_node.args.args) or \
+            (method_node.args.posonlyargs + method_node.args.args)[0].arg != "self":
+        arguments = method_node.args
+        has_parameters = any([arguments.posonlyargs, arguments.args, arguments.vararg,
+                              arguments.kwonlyargs, arguments.kwarg])
+        method_lines = method.splitlines(keepends=True)
+        opening, _, _ = _parameters_span(method_lines, method_node)
+        method = "".join(_splice(method_lines, (opening[0], opening[1] + 1), (opening[0], opening[1] + 1),
+                                 "self, " if has_parameters else "self"))
+
+    body_indent = indentation(lines[cls.body[0].lineno - 1])
+    insertion = ["\n"] + reindent(method, body_indent)
+    # Apply the later edit first so the line numbers of the earlier one stay valid
+    if first > cls.end_lineno:
+        lines = _remove_lines(lines, first, last)
+        lines = lines[:cls.end_lineno] + insertion + lines[cls.end_lineno:]
+    else:
+        lines = lines[:cls.end_lineno] + insertion + lines[cls.end_lineno:]
+        lines = _remove_lines(lines, first, last)
+    return "".join(lines)
@@ -0,0 +1,177 @@
+import ast
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Directories that never contain code worth indexing
+SKIP_DIRS = {".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "node_modules", "__pycache__", "build", "dist"}
+
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+
+def extract_symbols(source: str, rel_path: str) -> List[dict]:
+    """Returns every class, function and method in the source with its qualified name and line span."""
+    module = rel_path[:-3].replace("/", ".").replace("\\", ".")
+    if module.endswith(".__init__"):
+        module = module[:-len(".__init__")]
+    symbols = []
+
+    def visit(node, scope: List[str], in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(child, ast.ClassDef) else ("method" if in_class else "function")
+                start = min([child.lineno] + [decorator.lineno for decorator in child.decorator_list])
+                qualname = ".".join(scope + [child.name])
+                symbols.append({
+                    "name": child.name,
+                    "qualname": qualname,
+                    "module": module,
+                    "kind": kind,
+                    "file": rel_path,
+                    "start": start,
+                    "end": child.end_lineno,
+                })
+                visit(child, scope + [child.name], isinstance(child, ast.ClassDef))
+            else:
+                visit(child, scope, in_class)
+
+    visit(ast.parse(source), [], False)
+    return symbols
+
+
+def index_file(repo_path: str, rel_path: str) -> Tuple[str, Optional[List[dict]]]:
+    """Worker entry point: the symbols of one file, or None if it can not be read or parsed."""
+    try:
+        with open(os.path.join(repo_path, rel_path), "r", encoding="utf-8", errors="replace") as file:
+            return rel_path, extract_symbols(file.read(), rel_path)
+    except (SyntaxError, ValueError, OSError):
+        return rel_path, None
+
+
+class SymbolIndex:
+    """Persistent index of the classes, functions and methods of a checked-out repository.
+
+    Files are re-indexed only when their mtime or size changed since the last refresh, and
+    large rebuilds are spread over a process pool. Single-file updates after edits are kept in
+    memory until the next refresh that writes the index (or flush()); an index saved without
+    them is still correct, since the edited files no longer match their recorded mtime and size.
+    """
+
+    def __init__(self, repo_path: str, index_path: str, max_workers: Optional[int] = None):
+        self.repo_path = repo_path
+        self.index_path = index_path
+        self.max_workers = max_workers
+        # rel_path -> {"mtime_ns", "size", "symbols"}
+        self.files: Dict[str, dict] = {}
+        # update_file() changes that are not on disk yet
+        self.dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self.files = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.files = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.files, file)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def flush(self):
+        """Writes pending update_file() changes."""
+        with self._lock:
+            if self.dirty:
+                self.save()
+
+    def python_files(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for root, dirs, files in os.walk(self.repo_path):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")]
+            for name in files:
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    found[os.path.relpath(path, self.repo_path).replace(os.sep, "/")] = os.stat(path)
+        return found
+
+    def refresh(self) -> int:
+        """
+        Brings the index up to date with the files on disk.
+
+        Returns:
+            int: Number of files that were (re-)indexed or removed.
+        """
+        with self._lock:
+            on_disk = self.python_files()
+            changed = [
+                rel_path for rel_path, stat in on_disk.items()
+                if rel_path not in self.files
+                or self.files[rel_path]["mtime_ns"] != stat.st_mtime_ns
+                or self.files[rel_path]["size"] != stat.st_size
+            ]
+            removed = [rel_path for rel_path in self.files if rel_path not in on_disk]
+
+            if len(changed) >= PARALLEL_THRESHOLD:
+                with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                    results = list(pool.map(index_file, [self.repo_path] * len(changed), changed, chunksize=32))
+            else:
+                results = [index_file(self.repo_path, rel_path) for rel_path in changed]
+
+            for rel_path, symbols in results:
+                stat = on_disk[rel_path]
+                self.files[rel_path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "symbols": symbols or []}
+            for rel_path in removed:
+                del self.files[rel_path]
+
+            if changed or removed:
+                self.save()
+            return len(changed) + len(removed)
+
+    def update_file(self, rel_path: str, source: Optional[str] = None):
+        """Re-indexes a single file right after it was edited."""
+        rel_path = rel_path.replace(os.sep, "/")
+        path = os.path.join(self.repo_path, rel_path)
+        with self._lock:
+            if not os.path.exists(path):
+                self.files.pop(rel_path, None)
+            else:
+                stat = os.stat(path)
+                try:
+                    symbols = extract_symbols(source, rel_path) if source is not None else index_file(self.repo_path, rel_path)[1]
+                except SyntaxError:
+                    symbols = None
+                self.files[rel_path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "symbols": symbols or []}
+            self.dirty = True
+
+    def symbols(self):
+        for entry in self.files.values():
+            yield from entry["symbols"]
+
+    def find(self, name: str) -> List[dict]:
+        """Symbols whose name, qualified name or module-qualified name equals name (or ends with .name)."""
+        matches = []
+        for symbol in self.symbols():
+            full_name = f"{symbol['module']}.{symbol['qualname']}"
+            if name in (symbol["name"], symbol["qualname"], full_name) or full_name.endswith(f".{name}"):
+                matches.append(symbol)
+        return sorted(matches, key=lambda symbol: (symbol["file"], symbol["start"]))
+
+    def with_prefix(self, prefix: str) -> List[dict]:
+        """Symbols whose qualified or module-qualified name starts with prefix."""
+        matches = [
+            symbol for symbol in self.symbols()
+            if symbol["qualname"].startswith(prefix) or f"{symbol['module']}.{symbol['qualname']}".startswith(prefix)
+        ]
+        return sorted(matches, key=lambda symbol: (symbol["file"], symbol["start"]))
+
+
+def format_symbol(symbol: dict) -> str:
+    return f"{symbol['module']}.{symbol['qualname']} ({symbol['kind']}) {symbol['file']}:{symbol['start']}-{symbol['end']}"
@@ -0,0 +1,208 @@
+import argparse
+import csv
+import json
+import sqlite3
+import time
+from typing import Iterable, List, Optional
+
+# Instances in these states are not run again
+DONE_STATUSES = ("completed",)
+# gave_up: the conversation ended on the same failing test run repeated (see LayeredTerminationStrategy)
+STATUSES = ("running", "completed", "failed", "timeout", "gave_up")
+
+COLUMNS = [
+    "instance_id", "repo", "base_commit", "status", "attempts", "started_at", "finished_at", "duration_s",
+    "turns", "llm_calls", "prompt_tokens", "completion_tokens", "cost_usd", "escalations", "patch", "error",
+    "trace_summary",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    repo TEXT NOT NULL,
+    base_commit TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL,
+    duration_s REAL,
+    turns INTEGER,
+    llm_calls INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cost_usd REAL,
+    escalations INTEGER,
+    patch TEXT,
+    error TEXT,
+    trace_summary TEXT
+)
+"""
+
+
+def llm_usage(trace_summary: Optional[dict]) -> dict:
+    """Calls, token and cost totals over all services, and model escalations, in a tracing.Tracer summary."""
+    usage = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+    spans = (trace_summary or {}).get("spans", {})
+    for stats in spans.get("llm", {}).values():
+        usage["llm_calls"] += stats.get("count", 0)
+        usage["prompt_tokens"] += stats.get("prompt_tokens", 0)
+        usage["completion_tokens"] += stats.get("completion_tokens", 0)
+        usage["cost_usd"] += stats.get("cost_usd", 0.0)
+    usage["escalations"] = sum(stats.get("count", 0) for stats in spans.get("escalation", {}).values())
+    return usage
+
+
+class ResultsStore:
+    """SQLite record of every instance of a run, so an interrupted run resumes where it stopped.
+
+    Each state change is committed immediately; an instance left in "running" by a crash is
+    simply run again.
+    """
+
+    def __init__(self, path: str = "./swebench/results.sqlite"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        # WAL lets `python results.py summary` read while a run is writing
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def status(self, instance_id: str) -> Optional[str]:
+        row = self.connection.execute("SELECT status FROM instances WHERE instance_id = ?", (instance_id,)).fetchone()
+        return row["status"] if row else None
+
+    def pending(self, rows: Iterable[dict]) -> List[dict]:
+        """The rows that have not completed yet (new, failed, timed out, given up or interrupted)."""
+        done = {
+            row["instance_id"]
+            for row in self.connection.execute(
+                f"SELECT instance_id FROM instances WHERE status IN ({','.join('?' * len(DONE_STATUSES))})",
+                DONE_STATUSES,
+            )
+        }
+        return [row for row in rows if row["instance_id"] not in done]
+
+    def start(self, row: dict):
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO instances (instance_id, repo, base_commit, status, attempts, started_at)
+                VALUES (?, ?, ?, 'running', 1, ?)
+                ON CONFLICT(instance_id) DO UPDATE SET
+                    status = 'running', attempts = attempts + 1, started_at = excluded.started_at,
+                    finished_at = NULL, duration_s = NULL, error = NULL
+                """,
+                (row["instance_id"], row["repo"], row["base_commit"], time.time()),
+            )
+
+    def finish(self, instance_id: str, status: str, turns: int = 0, patch: Optional[str] = None,
+               error: Optional[str] = None, trace_summary: Optional[dict] = None):
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status '{status}', expected one of {STATUSES}")
+        usage = llm_usage(trace_summary)
+        finished_at = time.time()
+        with self.connection:
+            self.connection.execute(
+                """
+                UPDATE instances SET
+                    status = ?, finished_at = ?, duration_s = ? - started_at, turns = ?, patch = ?, error = ?,
+                    llm_calls = ?, prompt_tokens = ?, completion_tokens = ?, cost_usd = ?, escalations = ?,
+                    trace_summary = ?
+                WHERE instance_id = ?
+                """,
+                (status, finished_at, finished_at, turns, patch, error, usage["llm_calls"], usage["prompt_tokens"],
+                 usage["completion_tokens"], usage["cost_usd"], usage["escalations"],
+                 json.dumps(trace_summary) if trace_summary else None, instance_id),
+            )
+
+    def rows(self) -> List[dict]:
+        return [dict(row) for row in self.connection.execute("SELECT * FROM instances ORDER BY instance_id")]
+
+    def summary(self) -> dict:
+        totals = self.connection.execute(
+            """
+            SELECT COUNT(*) AS instances, SUM(attempts) AS attempts, SUM(turns) AS turns,
+                   SUM(llm_calls) AS llm_calls, SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens, SUM(cost_usd) AS cost_usd,
+                   SUM(escalations) AS escalations, AVG(duration_s) AS mean_duration_s,
+                   SUM(patch IS NOT NULL AND patch != '') AS with_patch
+            FROM instances
+            """
+        ).fetchone()
+        by_status = dict(self.connection.execute("SELECT status, COUNT(*) FROM instances GROUP BY status").fetchall())
+        summary = {key: totals[key] or 0 for key in totals.keys()}
+        summary["mean_duration_s"] = round(summary["mean_duration_s"], 2)
+        summary["cost_usd"] = round(summary["cost_usd"], 4)
+        summary["by_status"] = by_status
+        summary["by_tier"] = self.tier_summary()
+        return summary
+
+    def tier_summary(self) -> dict:
+        """Calls, latency, tokens and cost per model tier over all instances (from their 'tier' spans)."""
+        tiers = {}
+        for (trace_summary,) in self.connection.execute("SELECT trace_summary FROM instances WHERE trace_summary IS NOT NULL"):
+            for tier, stats in json.loads(trace_summary).get("spans", {}).get("tier", {}).items():
+                total = tiers.setdefault(tier, {"calls": 0, "total_s": 0.0, "prompt_tokens": 0,
+                                                "completion_tokens": 0, "cost_usd": 0.0})
+                total["calls"] += stats.get("count", 0)
+                total["total_s"] += stats.get("total_s", 0.0)
+                total["prompt_tokens"] += stats.get("prompt_tokens", 0)
+                total["completion_tokens"] += stats.get("completion_tokens", 0)
+                total["cost_usd"] += stats.get("cost_usd", 0.0)
+        for total in tiers.values():
+            total["mean_ms"] = round(total["total_s"] / total["calls"] * 1000, 1) if total["calls"] else 0.0
+            total["total_s"] = round(total["total_s"], 2)
+            total["cost_usd"] = round(total["cost_usd"], 4)
+        return tiers
+
+    def export(self, path: str, include_patches: bool = True):
+        """Writes all instances as .json or .csv (by extension), or as SWE-bench predictions for .jsonl."""
+        rows = self.rows()
+        if path.endswith(".jsonl"):
+            with open(path, "w", encoding="utf-8") as file:
+                for row in rows:
+                    if row["status"] in DONE_STATUSES:
+                        file.write(json.dumps({"instance_id": row["instance_id"], "model_patch": row["patch"] or "",
+                                               "model_name_or_path": "swe-mas-semantic-kernel"}) + "\n")
+            return
+        columns = [column for column in COLUMNS if include_patches or column not in ("patch", "trace_summary")]
+        if path.endswith(".csv"):
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump({"summary": self.summary(),
+                           "instances": [{column: row[column] for column in columns} for row in rows]}, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and export a results store")
+    parser.add_argument("command", choices=["summary", "list", "export"])
+    parser.add_argument("--db", default="./swebench/results.sqlite")
+    parser.add_argument("--output", help="export target: .json, .csv or .jsonl (SWE-bench predictions)")
+    parser.add_argument("--no-patches", action="store_true", help="leave patches and traces out of json/csv")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.command == "summary":
+        print(json.dumps(store.summary(), indent=2))
+    elif args.command == "list":
+        for row in store.rows():
+            print(f"{row['instance_id']:50} {row['status']:10} attempts={row['attempts']} turns={row['turns']} "
+                  f"tokens={row['prompt_tokens']}/{row['completion_tokens']} ${row['cost_usd'] or 0:.4f} "
+                  f"escalations={row['escalations'] or 0} {row['duration_s'] or 0:.1f}s")
+    else:
+        if not args.output:
+            parser.error("export needs --output")
+        store.export(args.output, include_patches=not args.no_patches)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from typing import Dict, Optional, Tuple
+from semantic_kernel.agents import ChatCompletionAgent
+from tracing import trace
+
+# Tiers from fastest/cheapest to strongest; escalation moves one step to the right
+TIER_ORDER = ("fast", "standard", "strong")
+
+DEFAULT_SERVICE_TIERS = {
+    "selection": "fast",
+    "termination": "fast",
+    "file": "fast",
+    "tester": "fast",
+    "issue_analyzer": "standard",
+    "coder": "standard",
+}
+
+# USD per million (prompt, completion) tokens
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "o3-mini": (1.10, 4.40),
+}
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parses 'model=prompt/completion,...' (USD per million tokens) into a dict."""
+    prices = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, price = entry.partition("=")
+        prompt, _, completion = price.partition("/")
+        try:
+            prices[model.strip()] = (float(prompt), float(completion))
+        except ValueError:
+            raise ValueError(f"Invalid price '{entry}', expected model=prompt/completion") from None
+    return prices
+
+
+class ModelRouter:
+    """Maps every service id to a tier and every tier to a model, and prices the calls.
+
+    Services without a tier use default_tier. Several tiers may share a model; tier_of() then
+    prefers the tier the service was configured with.
+    """
+
+    def __init__(self, tiers: Dict[str, str], service_tiers: Optional[Dict[str, str]] = None,
+                 default_tier: str = "standard", prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        unknown = [tier for tier in list(tiers) + list((service_tiers or {}).values()) + [default_tier]
+                   if tier not in TIER_ORDER]
+        if unknown:
+            raise ValueError(f"Unknown tiers {sorted(set(unknown))}, expected some of {TIER_ORDER}")
+        missing = [tier for tier in TIER_ORDER if tier not in tiers]
+        if missing:
+            raise ValueError(f"No model configured for tiers {missing}")
+        self.tiers = dict(tiers)
+        self.service_tiers = {**DEFAULT_SERVICE_TIERS, **(service_tiers or {})}
+        self.default_tier = default_tier
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+
+    def tier_for(self, service_id: str) -> str:
+        return self.service_tiers.get(service_id, self.default_tier)
+
+    def model_for(self, service_id: str) -> str:
+        return self.tiers[self.tier_for(service_id)]
+
+    def tier_of(self, model: str, preferred: Optional[str] = None) -> Optional[str]:
+        if preferred is not None and self.tiers.get(preferred) == model:
+            return preferred
+        return next((tier for tier in TIER_ORDER if self.tiers[tier] == model), None)
+
+    def next_tier(self, tier: str) -> Optional[str]:
+        """The next stronger tier that actually runs a different model, None at the top."""
+        for stronger in TIER_ORDER[TIER_ORDER.index(tier) + 1:]:
+            if self.tiers[stronger] != self.tiers[tier]:
+                return stronger
+        return None
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """USD for a call, 0.0 for models without a price."""
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class ModelEscalator:
+    """
+    Moves an agent to the next stronger tier after every `after_failures` failed test runs.
+
+    Meant as LayeredTerminationStrategy.on_test_failure; the agent's execution settings carry
+    the model, so the switch applies from its next turn on.
+    """
+
+    def __init__(self, router: ModelRouter, agent: ChatCompletionAgent, after_failures: int = 2):
+        self.router = router
+        self.agent = agent
+        self.after_failures = after_failures
+        self.failures = 0
+        self.escalations = 0
+
+    @property
+    def tier(self) -> Optional[str]:
+        configured = self.router.tier_for(self.agent.service_id)
+        model = self.agent.execution_settings.ai_model_id or self.router.tiers[configured]
+        return self.router.tier_of(model, preferred=configured)
+
+    def __call__(self, outcome):
+        self.failures += 1
+        if self.after_failures <= 0 or self.failures % self.after_failures:
+            return
+        current = self.tier
+        stronger = self.router.next_tier(current) if current else None
+        if stronger is None:
+            return
+        with trace("escalation", self.agent.name, from_tier=current, to_tier=stronger, failures=self.failures):
+            self.agent.execution_settings.ai_model_id = self.router.tiers[stronger]
+            self.escalations += 1
+        print(f"ESCALATE {self.agent.name} {current} -> {stronger} ({self.router.tiers[stronger]}) "
+              f"after {self.failures} failed test runs")
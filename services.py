@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, AsyncGenerator, Dict, List, Optional
+import httpx
+from openai import AsyncOpenAI
+from semantic_kernel import Kernel
+from semantic_kernel.connectors.ai.completion_usage import CompletionUsage
+from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.exceptions.service_exceptions import ServiceResponseException
+from semantic_kernel.filters.filter_types import FilterTypes
+from routing import ModelRouter
+from tracing import trace, trace_function_invocation
+
+CACHE_MODES = ("auto", "record", "replay", "passthrough")
+# Settings fields that are not sampling parameters (see PromptExecutionSettings.prepare_settings_dict)
+CACHE_KEY_EXCLUDED_SETTINGS = {
+    "service_id", "extension_data", "structured_json_response", "ai_model_id", "messages", "stream", "stream_options",
+}
+
+
+class ResponseCache:
+    """Content-addressed on-disk store of completions, evicted least-recently-used once it exceeds max_bytes."""
+
+    def __init__(self, directory: str = "./.llm_cache", max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                yield from (entry for entry in os.scandir(shard.path) if entry.name.endswith(".json"))
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        # The modification time doubles as the LRU clock
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+        self.size += os.path.getsize(path) - previous
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the store is back under max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self.size <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            os.remove(entry.path)
+            self.size -= size
+
+
+class CachingChatCompletion(OpenAIChatCompletion):
+    """OpenAIChatCompletion that records completions to a ResponseCache and replays them.
+
+    Modes:
+        auto: serve from the cache, call the model on a miss and store the result.
+        record: always call the model and overwrite the cached result.
+        replay: only serve from the cache, a miss is an error (fully offline).
+        passthrough: bypass the cache.
+
+    Streaming requests always go to the model; their spans also record the time to the first chunk.
+
+    With a router, every call is also traced as a 'tier' span with its cost, so latency and cost
+    can be compared per tier; tier is the one the service was configured with.
+    """
+
+    cache: Optional[ResponseCache] = None
+    cache_mode: str = "passthrough"
+    router: Optional[ModelRouter] = None
+    tier: Optional[str] = None
+
+    def __init__(self, cache: Optional[ResponseCache] = None, cache_mode: str = "passthrough",
+                 router: Optional[ModelRouter] = None, tier: Optional[str] = None, **kwargs):
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{cache_mode}', expected one of {CACHE_MODES}")
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.cache_mode = cache_mode if cache is not None else "passthrough"
+        self.router = router
+        self.tier = tier
+
+    def cache_key(self, chat_history: ChatHistory, settings: PromptExecutionSettings) -> str:
+        """Hash of everything that is sent to the model: model, messages, tools and sampling settings."""
+        request = {
+            "model": settings.ai_model_id or self.ai_model_id,
+            "messages": self._prepare_chat_history_for_request(chat_history),
+            # SK writes the messages, stream flags and model into the settings object on every call and
+            # reuses it across the tool loop, so those fields would make every later call miss
+            "settings": settings.model_dump(exclude=CACHE_KEY_EXCLUDED_SETTINGS, exclude_none=True, by_alias=True),
+        }
+        payload = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _inner_get_chat_message_contents(
+        self,
+        chat_history: ChatHistory,
+        settings: PromptExecutionSettings,
+    ) -> List[ChatMessageContent]:
+        with self._trace_call(settings) as span:
+            messages = await self._get_or_complete(chat_history, settings, span)
+            usage = messages[0].metadata.get("usage") if messages else None
+            if isinstance(usage, CompletionUsage):
+                span["prompt_tokens"] = usage.prompt_tokens or 0
+                span["completion_tokens"] = usage.completion_tokens or 0
+            return messages
+
+    @contextmanager
+    def _trace_call(self, settings: PromptExecutionSettings, **fields):
+        """The 'llm' span of a call, inside a 'tier' span that gets the same usage and cost when routed."""
+        model = settings.ai_model_id or self.ai_model_id
+        tier = self.router.tier_of(model, preferred=self.tier) if self.router is not None else None
+        if tier:
+            fields["tier"] = tier
+        with (trace("tier", tier) if tier else nullcontext({})) as tier_span, \
+                trace("llm", self.service_id, model=model, **fields) as span:
+            yield span
+            if self.router is not None and not span.get("cached"):
+                span["cost_usd"] = self.router.cost(model, span.get("prompt_tokens", 0), span.get("completion_tokens", 0))
+            tier_span.update({key: value for key, value in span.items()
+                              if key in ("prompt_tokens", "completion_tokens", "cost_usd", "ttft_ms", "cached")})
+
+    async def _inner_get_streaming_chat_message_contents(
+        self,
+        chat_history: ChatHistory,
+        settings: PromptExecutionSettings,
+        function_invoke_attempt: int = 0,
+    ) -> AsyncGenerator[List[StreamingChatMessageContent], Any]:
+        with self._trace_call(settings, stream=True) as span:
+            start = time.perf_counter()
+            async for messages in super()._inner_get_streaming_chat_message_contents(
+                chat_history, settings, function_invoke_attempt
+            ):
+                if "ttft_ms" not in span:
+                    span["ttft_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                usage = messages[0].metadata.get("usage") if messages else None
+                if isinstance(usage, CompletionUsage):
+                    # Only the last chunk carries the usage of the whole response
+                    span["prompt_tokens"] = usage.prompt_tokens or 0
+                    span["completion_tokens"] = usage.completion_tokens or 0
+                yield messages
+
+    async def _get_or_complete(self, chat_history: ChatHistory, settings: PromptExecutionSettings,
+                               span: dict) -> List[ChatMessageContent]:
+        if self.cache_mode == "passthrough":
+            return await super()._inner_get_chat_message_contents(chat_history, settings)
+
+        key = self.cache_key(chat_history, settings)
+        if self.cache_mode in ("auto", "replay"):
+            cached = self.cache.get(key)
+            if cached is not None:
+                span["cached"] = True
+                return self._load(cached)
+            if self.cache_mode == "replay":
+                raise ServiceResponseException(f"No cached completion for request {key} in replay mode")
+
+        messages = await super()._inner_get_chat_message_contents(chat_history, settings)
+        self.cache.put(key, json.dumps([json.loads(message.model_dump_json(exclude={"inner_content"})) for message in messages]))
+        return messages
+
+    @staticmethod
+    def _load(data: str) -> List[ChatMessageContent]:
+        messages = []
+        for raw in json.loads(data):
+            message = ChatMessageContent.model_validate(raw)
+            usage = message.metadata.get("usage")
+            if isinstance(usage, dict):
+                message.metadata["usage"] = CompletionUsage(**usage)
+            messages.append(message)
+        return messages
+
+
+class KernelFactory:
+    """Creates kernels whose chat completion services all share one pooled AsyncOpenAI client.
+
+    httpx pools per client, and every request goes to the same API host, so the pool limits
+    below are effectively the per-host connection limits.
+    """
+
+    def __init__(self,
+                 api_key: str,
+                 default_model: str = "gpt-4o-mini",
+                 models: Optional[Dict[str, str]] = None,
+                 max_connections: int = 64,
+                 max_keepalive_connections: int = 32,
+                 keepalive_expiry: float = 60.0,
+                 timeout: float = 600.0,
+                 cache: Optional[ResponseCache] = None,
+                 cache_mode: str = "passthrough",
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 router: Optional[ModelRouter] = None):
+        self.default_model = default_model
+        self.models = models or {}
+        self.router = router
+        self.cache = cache
+        self.cache_mode = cache_mode
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+            transport=transport,
+        )
+        self.client = AsyncOpenAI(api_key=api_key, http_client=self.http_client)
+
+    def model_for(self, service_id: str) -> str:
+        """An explicit model for the service wins over its tier, the default model is used without a router."""
+        if service_id in self.models:
+            return self.models[service_id]
+        if self.router is not None:
+            return self.router.model_for(service_id)
+        return self.default_model
+
+    def create_service(self, service_id: str, model: Optional[str] = None) -> CachingChatCompletion:
+        return CachingChatCompletion(
+            service_id=service_id,
+            ai_model_id=model or self.model_for(service_id),
+            async_client=self.client,
+            cache=self.cache,
+            cache_mode=self.cache_mode,
+            router=self.router,
+            tier=self.router.tier_for(service_id) if self.router is not None else None,
+        )
+
+    def create_kernel(self, service_id: str, model: Optional[str] = None) -> Kernel:
+        kernel = Kernel()
+        kernel.add_service(self.create_service(service_id, model))
+        kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, trace_function_invocation)
+        return kernel
+
+    async def close(self):
+        await self.client.close()
+
+
+def parse_model_map(spec: str) -> Dict[str, str]:
+    """Parses 'service_id=model,service_id=model' into a dict."""
+    models = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        service_id, _, model = entry.partition("=")
+        if not model:
+            raise ValueError(f"Invalid model mapping '{entry}', expected service_id=model")
+        models[service_id.strip()] = model.strip()
+    return models
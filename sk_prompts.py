@@ -104,6 +104,8 @@ Parameter "repository_name":
 "AutoCoder"
 "
 
+Long tool outputs are replaced by a blob handle with their first and last lines; call read_blob with the handle and a line range to see the lines in between (e.g. a failing test's traceback).
+
 EVERYTIME YOU ARE EXECUTED. YOU HAVE TO EXECUTE BOTH TOOLS. When finished and there were errors within the tests (ToolResponse includes failed) respond with "TERMINATEEXEC". When The Test was Successfull and the ToolResponse includes "passed in" respond with "SUCCESSFUL TERMINATEEXEC".
 """
 
@@ -124,12 +126,17 @@ You can edit the python code within files with a set of functions provided to yo
 - modify_function_args (change the parameters of a function)
 - modify_return_type (change the return type of a function)
 - remove_function (removes a python function)
+- apply_edits (applies several edits across files at once; all are written or none, use it for changes that span multiple places)
 
 ### TOOLS FOR READING:
-- read_file (reads the entire file)
+- read_file (reads a file, optionally only a line range or a single symbol; long output is truncated with a marker telling where to continue)
 - extract_function (reads a single function)
 - list_functions (lists all python functions in a file)
 - list_files_in_repository (lists all the repository file paths)
+- find_symbol (finds the file and line span where a class, function or method is defined)
+- list_symbols (lists classes, functions and methods by qualified name prefix)
+- search_code (searches the whole repository for text or a regex, like grep, and returns matching lines with context)
+- read_blob (reads a line range of a long tool output that was replaced by a blob handle and a preview)
 
 ### HINTS:
 - Always use relative file paths after the repository folder (e.g., "src/main.py").
@@ -0,0 +1,265 @@
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+from pydantic import Field, PrivateAttr
+from semantic_kernel.agents import Agent
+from semantic_kernel.agents.strategies.selection.selection_strategy import SelectionStrategy
+from semantic_kernel.agents.strategies.termination.termination_strategy import TerminationStrategy
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.exceptions.agent_exceptions import AgentExecutionException
+from history import TokenBudgetHistoryReducer
+from plugins.blob_store import BlobStore
+from tracing import trace
+from sk_prompts import ANALYZER_NAME, CODER_NAME, FILE_MANI_NAME, TESTER_NAME
+
+# A rule looks at the history and returns the name of the next agent, or None if it can not decide
+SelectionRule = Callable[[List[ChatMessageContent]], Optional[str]]
+
+
+def last_turn(history: List[ChatMessageContent]) -> Tuple[Optional[str], List[ChatMessageContent]]:
+    """Returns the name of the agent that spoke last and the messages (incl. tool calls) of its turn."""
+    speaker = None
+    turn = []
+    for message in reversed(history):
+        if message.role == AuthorRole.USER or not message.name:
+            break
+        if speaker is None:
+            speaker = message.name
+        elif message.name != speaker:
+            break
+        turn.append(message)
+    turn.reverse()
+    return speaker, turn
+
+
+def called_function(messages: List[ChatMessageContent], function_name: str) -> bool:
+    """Checks whether any of the messages contains a tool call to the given function."""
+    return any(
+        isinstance(item, FunctionCallContent) and item.function_name == function_name
+        for message in messages
+        for item in message.items
+    )
+
+
+def swe_selection_rules() -> List[SelectionRule]:
+    """The fixed transitions of the SELECTION_PROMPT workflow."""
+
+    def after_user(history):
+        speaker, _ = last_turn(history)
+        return ANALYZER_NAME if speaker is None else None
+
+    def after_analyzer(history):
+        speaker, _ = last_turn(history)
+        # Only hand over once the repository is actually on disk, otherwise let the model decide
+        if speaker == ANALYZER_NAME and called_function(history, "clone_repository"):
+            return CODER_NAME
+        return None
+
+    def after_coder(history):
+        speaker, _ = last_turn(history)
+        return FILE_MANI_NAME if speaker == CODER_NAME else None
+
+    def after_file_manipulator(history):
+        speaker, turn = last_turn(history)
+        if speaker != FILE_MANI_NAME:
+            return None
+        reply = turn[-1].content or ""
+        return TESTER_NAME if "TERMINATE" in reply else CODER_NAME
+
+    def after_tester(history):
+        speaker, _ = last_turn(history)
+        return CODER_NAME if speaker == TESTER_NAME else None
+
+    return [after_user, after_analyzer, after_coder, after_file_manipulator, after_tester]
+
+
+class RuleBasedSelectionStrategy(SelectionStrategy):
+    """Selects the next agent from deterministic rules and only asks the fallback strategy when no rule applies."""
+
+    rules: List[SelectionRule] = Field(default_factory=swe_selection_rules)
+    fallback: Optional[SelectionStrategy] = None
+    history_reducer: Optional[TokenBudgetHistoryReducer] = None
+    counters: Counter = Field(default_factory=Counter)
+
+    async def next(self, agents: List[Agent], history: List[ChatMessageContent]) -> Agent:
+        """
+        Selects the next agent.
+
+        Args:
+            agents: The agents to select from.
+            history: The conversation so far.
+
+        Returns:
+            Agent: The agent taking the next turn.
+        """
+        speaker, _ = last_turn(history)
+        by_name = {agent.name: agent for agent in agents}
+
+        with trace("selection", "rule") as span:
+            for rule in self.rules:
+                name = rule(history)
+                if name is not None and name in by_name:
+                    self.counters["rule"] += 1
+                    self.counters[f"{speaker or 'user'}->{name}"] += 1
+                    span["selected"] = name
+                    return by_name[name]
+
+        if self.fallback is None:
+            raise AgentExecutionException(f"No selection rule applies after {speaker or 'user'} and no fallback is configured")
+
+        with trace("selection", "fallback") as span:
+            if self.history_reducer is not None:
+                history = self.history_reducer.reduce(history, caller="selection")
+            agent = await self.fallback.next(agents, history)
+            span["selected"] = agent.name
+        self.counters["fallback"] += 1
+        self.counters[f"{speaker or 'user'}->{agent.name} (fallback)"] += 1
+        return agent
+
+
+_EXIT_CODE = re.compile(r"exit[ _]?code\W{0,3}(-?\d+)", re.IGNORECASE)
+# "==== 1 failed, 2 passed in 0.12s ====", or without the rule with pytest -q
+_SUMMARY_LINE = re.compile(
+    r"^(?:=+ )?(\d+ (?:passed|failed|errors?|xpassed|xfailed|skipped|deselected|warnings?)\b.*?) in [\d.]+s\b.*$",
+    re.MULTILINE,
+)
+_SUMMARY_COUNT = re.compile(r"(\d+) (passed|failed|errors?|xpassed|xfailed|skipped)")
+_FAILURE_LINE = re.compile(r"^(?:FAILED|ERROR) (\S+)(?: - (.*))?$", re.MULTILINE)
+_VOLATILE = re.compile(r"0x[0-9a-f]+|\d+")
+
+
+@dataclass
+class TestOutcome:
+    """What could be read from the output of a test run without asking a model."""
+    exit_code: Optional[int] = None
+    counts: dict = field(default_factory=dict)
+    failures: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        if self.exit_code is not None:
+            return self.exit_code == 0 and not self.failed
+        return self.counts.get("passed", 0) > 0 and not self.failed
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.counts.get("failed") or self.counts.get("error") or self.counts.get("errors") or self.failures)
+
+    @property
+    def conclusive(self) -> bool:
+        return self.exit_code is not None or bool(self.counts) or bool(self.failures)
+
+    @property
+    def signature(self) -> str:
+        """Hash of the failing tests and error messages, stable across reruns of the same failure."""
+        normalized = sorted(_VOLATILE.sub("#", line) for line in self.failures)
+        return hashlib.sha1("\n".join(normalized).encode("utf-8")).hexdigest()
+
+
+def parse_test_output(output: str) -> TestOutcome:
+    """Extracts exit status, pytest summary counts and failure lines from executor output."""
+    outcome = TestOutcome()
+
+    exit_codes = _EXIT_CODE.findall(output)
+    if exit_codes:
+        outcome.exit_code = int(exit_codes[-1])
+
+    summaries = _SUMMARY_LINE.findall(output)
+    if summaries:
+        outcome.counts = {kind: int(count) for count, kind in _SUMMARY_COUNT.findall(summaries[-1])}
+
+    outcome.failures = [" - ".join(part for part in match if part) for match in _FAILURE_LINE.findall(output)]
+    if not outcome.failures and outcome.exit_code:
+        # Crashed before pytest could report anything (install error, missing command, ...)
+        lines = [line.strip() for line in output.splitlines() if line.strip()]
+        outcome.failures = lines[-1:]
+    return outcome
+
+
+class LayeredTerminationStrategy(TerminationStrategy):
+    """Decides termination from the tester's tool results and only asks the fallback strategy when they are inconclusive."""
+
+    fallback: Optional[TerminationStrategy] = None
+    executor_function: str = "run_code_executor_agent"
+    max_repeated_failures: int = 3
+    history_reducer: Optional[TokenBudgetHistoryReducer] = None
+    # Test output moved to blobs is judged in full, not from the preview left in the history
+    blob_store: Optional[BlobStore] = None
+    # Called with every failed test run, e.g. to escalate the coder's model (see routing.ModelEscalator)
+    on_test_failure: Optional[Callable[[TestOutcome], None]] = None
+    counters: Counter = Field(default_factory=Counter)
+    # Why the last True was returned: "passed", "repeated_failure" or "fallback"
+    stop_reason: Optional[str] = None
+    _failure_signatures: List[str] = PrivateAttr(default_factory=list)
+
+    async def should_agent_terminate(self, agent: Agent, history: List[ChatMessageContent]) -> bool:
+        """
+        Checks whether the conversation is done after the agent's turn.
+
+        Args:
+            agent: The agent that just replied.
+            history: The conversation so far.
+
+        Returns:
+            bool: True to end the conversation; stop_reason says whether the tests passed.
+        """
+        with trace("termination", "local") as span:
+            decision = self._decide_locally(history)
+            span["decision"] = "inconclusive" if decision is None else decision
+        if decision is not None:
+            return decision
+
+        if self.fallback is None:
+            self.counters["local:inconclusive"] += 1
+            return False
+
+        self.counters["fallback"] += 1
+        with trace("termination", "fallback") as span:
+            if self.history_reducer is not None:
+                history = self.history_reducer.reduce(history, caller="termination")
+            span["decision"] = await self.fallback.should_agent_terminate(agent, history)
+        if span["decision"]:
+            self.stop_reason = "fallback"
+        return span["decision"]
+
+    def _decide_locally(self, history: List[ChatMessageContent]) -> Optional[bool]:
+        """Termination decision from the last test run, None if the output is inconclusive."""
+        _, turn = last_turn(history)
+        results = [
+            str(item.result)
+            for message in turn
+            for item in message.items
+            if isinstance(item, FunctionResultContent) and item.function_name == self.executor_function
+        ]
+
+        if not results:
+            # No tests were run in this turn, so there is nothing that could be satisfactory yet
+            self.counters["local:no_run"] += 1
+            return False
+
+        output = self.blob_store.expand(results[-1]) if self.blob_store is not None else results[-1]
+        outcome = parse_test_output(output)
+        if outcome.passed:
+            self.counters["local:passed"] += 1
+            self.stop_reason = "passed"
+            return True
+
+        if outcome.failed:
+            self._failure_signatures.append(outcome.signature)
+            if self.on_test_failure is not None:
+                self.on_test_failure(outcome)
+            recent = self._failure_signatures[-self.max_repeated_failures:]
+            if len(recent) == self.max_repeated_failures and len(set(recent)) == 1:
+                self.counters["local:repeated_failure"] += 1
+                # Gives up on a fix that keeps failing the same way; the run must not count as solved
+                self.stop_reason = "repeated_failure"
+                return True
+            self.counters["local:failed"] += 1
+            return False
+
+        return None
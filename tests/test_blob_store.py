@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from semantic_kernel import Kernel
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.filters.filter_types import FilterTypes
+from semantic_kernel.functions.kernel_function_decorator import kernel_function
+from plugins.blob_store import BlobOffloadFilter, BlobPlugin, BlobStore
+from plugins.file_plugin import FilePlugin
+from sk_prompts import TESTER_NAME
+from strategies import LayeredTerminationStrategy
+
+# Failures in the middle of a long run end up in the lines the preview omits
+FAILING_RUN = "\n".join(
+    [f"tests/test_m.py::test_{i} PASSED" for i in range(200)]
+    + ["FAILED tests/test_m.py::test_edge - AssertionError: 1 != 2"]
+    + [f"tests/test_n.py::test_{i} PASSED" for i in range(200)]
+    + ["=================== 1 failed, 400 passed in 1.20s ==================="]
+)
+
+
+class ToolPlugin:
+    @kernel_function
+    def listing(self) -> list:
+        """Lists many files."""
+        return [f"src/module_{i}.py" for i in range(500)]
+
+    @kernel_function
+    def run_code_executor_agent(self) -> str:
+        """Runs the tests."""
+        return FAILING_RUN
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+def invoke(store: BlobStore, function_name: str, plugin=None, plugin_name: str = "ToolPlugin", **arguments) -> str:
+    kernel = Kernel()
+    kernel.add_plugin(plugin or ToolPlugin(), plugin_name=plugin_name)
+    kernel.add_filter(FilterTypes.FUNCTION_INVOCATION, BlobOffloadFilter(store, threshold=1000))
+    result = asyncio.run(kernel.invoke(plugin_name=plugin_name, function_name=function_name, **arguments))
+    return str(result.value)
+
+
+def turn_of_tester(output: str) -> list:
+    result = FunctionResultContent(id="call_1", function_name="run_code_executor_agent",
+                                   plugin_name="ToolPlugin", result=output)
+    return [
+        ChatMessageContent(role=AuthorRole.USER, content="Fix the bug."),
+        ChatMessageContent(role=AuthorRole.TOOL, name=TESTER_NAME, items=[result]),
+    ]
+
+
+def test_list_results_are_offloaded(store):
+    replaced = invoke(store, "listing")
+    assert "stored as blob:" in replaced
+    assert len(replaced) < 1000
+    assert store.stats["offloaded"] == 1
+
+
+def test_read_file_pages_are_not_offloaded(store, tmp_path):
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "big.py").write_text(FAILING_RUN)
+    text = invoke(store, "read_file", FilePlugin(workspace=str(tmp_path)), "FilePlugin",
+                  file_path="big.py", repo="repo", max_chars=5000)
+    assert text.startswith("[file: big.py | lines 1-")
+    assert "continue with start_line=" in text
+    assert store.stats["offloaded"] == 0
+
+
+def test_termination_reads_offloaded_test_output(store):
+    offloaded = invoke(store, "run_code_executor_agent")
+    assert "FAILED" not in offloaded
+    assert store.expand(offloaded) == FAILING_RUN
+
+    failures = []
+    strategy = LayeredTerminationStrategy(blob_store=store, on_test_failure=failures.append)
+    assert asyncio.run(strategy.should_agent_terminate(None, turn_of_tester(offloaded))) is False
+    assert failures[0].failures == ["tests/test_m.py::test_edge - AssertionError: 1 != 2"]
+    assert strategy.counters["local:failed"] == 1
+
+
+def test_read_blob_returns_line_range(store):
+    handle = store.put(FAILING_RUN)
+    text = asyncio.run(BlobPlugin(store).read_blob(handle, start_line=201, end_line=201))
+    assert text.splitlines()[1] == "FAILED tests/test_m.py::test_edge - AssertionError: 1 != 2"
@@ -0,0 +1,120 @@
+import re
+import pytest
+from plugins.code_search import TrigramIndex, required_literals, search, search_index
+
+
+@pytest.mark.parametrize("pattern, literals", [
+    (r"def (\w+)_view", ["def ", "_view"]),
+    (r"class \w+Error\(", ["class ", "Error("]),
+    (r"raise ValueError", ["raise ValueError"]),
+    (r"colou?r_map", ["colo", "r_map"]),
+    (r"x{2,}y", ["x", "y"]),
+    (r"(?:get|set)_item", ["_item"]),
+    (r"(?P<name>foo)bar", ["foo", "bar"]),
+    (r"(?i:Select) \* from", ["Select", " * from"]),
+    (r"^import\s+os$", ["import", "os"]),
+    (r"(?<=self\.)cache", ["cache"]),
+    (r"[a-z]+_test", ["_test"]),
+    (r"get|set", []),
+    (r"(\w+)\s*=\s*\1", ["="]),
+    (r"(?P<q>['\"]).*(?P=q)", []),
+], ids=lambda value: value if isinstance(value, str) else None)
+def test_required_literals(pattern, literals):
+    assert required_literals(pattern) == literals
+
+
+@pytest.mark.parametrize("pattern, text", [
+    (r"def (\w+)_view", "def index_view(request):"),
+    (r"colou?r_map", "color_map = {}"),
+    (r"x{2,}y", "xxxxy"),
+    (r"(?:get|set)_item", "obj.set_item(1)"),
+    (r"a+b", "aaab"),
+])
+def test_every_match_contains_the_literals(pattern, text):
+    match = re.search(pattern, text)
+    assert match is not None
+    assert all(literal in match.group(0) for literal in required_literals(pattern))
+
+
+def test_verbose_patterns_are_not_narrowed():
+    assert required_literals("def  foo", re.VERBOSE) == []
+    assert required_literals("(?x) def foo") == []
+
+
+def make_repository(tmp_path, files: dict):
+    repo = tmp_path / "repo"
+    repo.mkdir(exist_ok=True)
+    for rel_path, content in files.items():
+        if isinstance(content, bytes):
+            (repo / rel_path).write_bytes(content)
+        else:
+            (repo / rel_path).write_text(content)
+    return repo
+
+
+def test_candidates_follow_changes_on_disk(tmp_path):
+    repo = make_repository(tmp_path, {
+        "a.py": "def parse_header(data):\n    pass\n",
+        "b.py": "import os\n",
+        "blob.bin": b"\0parse_header",
+    })
+    index = TrigramIndex(str(repo), str(tmp_path / "index.json"))
+    assert index.refresh(["a.py", "b.py", "blob.bin"]) == 3
+    assert index.candidates(["parse_header"]) == {"a.py"}
+    assert index.candidates([]) == {"a.py", "b.py"}
+
+    (repo / "b.py").write_text("from a import PARSE_HEADER\n")
+    (repo / "a.py").unlink()
+    assert index.refresh(["b.py", "blob.bin"]) == 2
+    # Matching is case-insensitive, removed files drop out and their ids are reused
+    assert index.candidates(["parse_header"]) == {"b.py"}
+    (repo / "c.py").write_text("parse_header()\n")
+    index.refresh(["b.py", "blob.bin", "c.py"])
+    assert index.candidates(["parse_header"]) == {"b.py", "c.py"}
+    assert index.refresh(["b.py", "blob.bin", "c.py"]) == 0
+
+
+def test_saved_index_is_reloaded(tmp_path):
+    repo = make_repository(tmp_path, {f"m{i}.py": f"value_{i} = {i}\n" for i in range(70)})
+    files = sorted(path.name for path in repo.iterdir())
+    index = TrigramIndex(str(repo), str(tmp_path / "index.json"), max_workers=2)
+    index.refresh(files)
+    assert not index.dirty  # a large refresh is saved right away
+
+    (repo / "m3.py").write_text("renamed = 3\n")
+    assert index.refresh(files) == 1
+    assert index.dirty
+    index.flush()
+
+    reloaded = TrigramIndex(str(repo), str(tmp_path / "index.json"))
+    assert reloaded.refresh(files) == 0
+    assert reloaded.candidates(["value_69"]) == {"m69.py"}
+    assert reloaded.candidates(["renamed"]) == {"m3.py"}
+    assert reloaded.candidates(["value_3 "]) == set()
+
+
+def test_damaged_index_is_rebuilt(tmp_path):
+    repo = make_repository(tmp_path, {"a.py": "x = 1\n"})
+    (tmp_path / "index.json").write_text('{"version": 2, "files": {}')
+    index = TrigramIndex(str(repo), str(tmp_path / "index.json"))
+    assert index.refresh(["a.py"]) == 1
+    assert index.candidates(["x = 1"]) == {"a.py"}
+
+
+def test_repository_has_one_shared_index(tmp_path):
+    repo = make_repository(tmp_path, {"a.py": "x = 1\n"})
+    first = search_index(str(repo), str(tmp_path / "index.json"))
+    assert search_index(str(tmp_path / "." / "repo"), str(tmp_path / "other.json")) is first
+
+
+def test_search_scans_only_candidates(tmp_path):
+    repo = make_repository(tmp_path, {
+        "views.py": "def index_view(request):\n    return None\n",
+        "urls.py": "from views import index_view\n",
+        "models.py": "class Model:\n    pass\n",
+    })
+    index = TrigramIndex(str(repo), str(tmp_path / "index.json"))
+    results, total, total_files, scanned = search(index, ["models.py", "urls.py", "views.py"],
+                                                  r"def (\w+)_view", regex=True)
+    assert (total, total_files, scanned) == (1, 1, 1)
+    assert results[0][0] == "views.py"
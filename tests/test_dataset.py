@@ -0,0 +1,59 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from dataset import INSTANCE_COLUMNS, ParquetDatasetSource
+
+
+def write_split(path, count: int = 40, reverse: bool = False) -> str:
+    ids = [f"org__repo-{i}" for i in range(count)]
+    if reverse:
+        ids.reverse()
+    table = pa.table({
+        "repo": ["org/repo"] * count,
+        "instance_id": ids,
+        "base_commit": [f"{i:040x}" for i in range(count)],
+        "problem_statement": [f"Issue {instance_id}" for instance_id in ids],
+        "patch": ["diff --git a/x b/x"] * count,
+        "test_patch": ["diff --git a/t b/t"] * count,
+    })
+    pq.write_table(table, str(path), row_group_size=7)
+    return str(path)
+
+
+def ids(rows: list) -> list:
+    return [row["instance_id"] for row in rows]
+
+
+def test_rows_hold_only_the_projected_columns(tmp_path):
+    source = ParquetDatasetSource(write_split(tmp_path / "split.parquet"), batch_size=5)
+    rows = list(source.iter_rows())
+    assert len(rows) == len(source) == 40
+    assert all(tuple(row) == INSTANCE_COLUMNS for row in rows)
+    narrow = ParquetDatasetSource(source.path, columns=["instance_id"])
+    assert narrow.select(stop=2) == [{"instance_id": "org__repo-0"}, {"instance_id": "org__repo-1"}]
+
+
+def test_seeded_selection_is_reproducible_and_independent_of_file_order(tmp_path):
+    forward = ParquetDatasetSource(write_split(tmp_path / "forward.parquet"), batch_size=3)
+    backward = ParquetDatasetSource(write_split(tmp_path / "backward.parquet", reverse=True), batch_size=16)
+    first = ids(forward.select(seed=30, start=5, stop=15))
+    assert len(first) == 10
+    assert ids(forward.select(seed=30, start=5, stop=15)) == first
+    assert ids(backward.select(seed=30, start=5, stop=15)) == first
+    # The bounded selection is a slice of the full permutation
+    assert ids(forward.select(seed=30))[5:15] == first
+    assert ids(forward.select(seed=31, start=5, stop=15)) != first
+
+
+def test_unseeded_selection_keeps_file_order(tmp_path):
+    source = ParquetDatasetSource(write_split(tmp_path / "split.parquet"))
+    assert ids(source.select(start=3, stop=6)) == ["org__repo-3", "org__repo-4", "org__repo-5"]
+
+
+def test_shards_partition_the_split(tmp_path):
+    source = ParquetDatasetSource(write_split(tmp_path / "split.parquet"), batch_size=4)
+    shards = [ids(source.iter_rows(shard_index=index, num_shards=3)) for index in range(3)]
+    assert sorted(sum(shards, [])) == sorted(ids(source.iter_rows()))
+    assert shards[1][:2] == ["org__repo-1", "org__repo-4"]
+    with pytest.raises(ValueError):
+        list(source.iter_rows(shard_index=3, num_shards=3))
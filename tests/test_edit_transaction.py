@@ -0,0 +1,27 @@
+import os
+import stat
+from plugins.edit_transaction import EditTransaction
+
+
+def mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_commit_keeps_mode_of_existing_file(tmp_path):
+    script = tmp_path / "run.sh"
+    script.write_text("echo one\n")
+    script.chmod(0o755)
+    transaction = EditTransaction(str(tmp_path))
+    transaction.apply({"op": "replace", "file": "run.sh", "old": "one", "new": "two"})
+    transaction.commit()
+    assert script.read_text() == "echo two\n"
+    assert mode(script) == 0o755
+
+
+def test_commit_creates_new_file_with_umask_mode(tmp_path):
+    transaction = EditTransaction(str(tmp_path))
+    transaction.apply({"op": "write", "file": "pkg/new.py", "content": "x = 1\n"})
+    transaction.commit()
+    (tmp_path / "plain.py").write_text("")
+    assert mode(tmp_path / "pkg" / "new.py") == mode(tmp_path / "plain.py")
+    assert [path.name for path in (tmp_path / "pkg").iterdir()] == ["new.py"]
@@ -0,0 +1,83 @@
+import asyncio
+from plugins.execution import ExecutorPool
+
+
+class FakeExecutor:
+    """Stands in for a Docker container: counts starts and stops."""
+
+    def __init__(self, work_dir: str):
+        self.work_dir = work_dir
+        self.started = 0
+        self.stopped = 0
+
+    async def start(self):
+        self.started += 1
+
+    async def stop(self):
+        self.stopped += 1
+
+
+def fake_pool(created: list, idle_timeout: float = 300.0) -> ExecutorPool:
+    def factory(work_dir: str) -> FakeExecutor:
+        created.append(FakeExecutor(work_dir))
+        return created[-1]
+
+    return ExecutorPool(executor_factory=factory, idle_timeout=idle_timeout)
+
+
+def test_executor_is_reused_per_work_dir(tmp_path):
+    created = []
+
+    async def scenario():
+        pool = fake_pool(created)
+        async with pool.acquire(str(tmp_path / "a")) as first:
+            pass
+        async with pool.acquire(str(tmp_path / "a")) as second:
+            pass
+        async with pool.acquire(str(tmp_path / "b")):
+            pass
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert len(created) == 2
+    assert [(executor.started, executor.stopped) for executor in created] == [(1, 1), (1, 1)]
+
+
+def test_release_removes_executor_scripts(tmp_path):
+    (tmp_path / "module.py").write_text("x = 1\n")
+
+    async def scenario():
+        pool = fake_pool([])
+        async with pool.acquire(str(tmp_path)):
+            (tmp_path / "tmp_code_0123.sh").write_text("pytest\n")
+            (tmp_path / "temp_test_1.py").write_text("def test(): pass\n")
+            for cache in ("__pycache__", ".pytest_cache", "pkg/__pycache__"):
+                (tmp_path / cache).mkdir(parents=True)
+                (tmp_path / cache / "entry").write_text("")
+        await pool.close()
+
+    asyncio.run(scenario())
+    # The tester's test file is kept for its next run
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["module.py", "pkg", "temp_test_1.py"]
+    assert list((tmp_path / "pkg").iterdir()) == []
+
+
+def test_idle_executors_are_reaped_and_restarted(tmp_path):
+    created = []
+
+    async def scenario():
+        pool = fake_pool(created, idle_timeout=0.05)
+        async with pool.acquire(str(tmp_path)):
+            # In use, so the reaper must leave it alone
+            await asyncio.sleep(0.1)
+            assert created[0].stopped == 0
+        await asyncio.sleep(0.15)
+        assert created[0].stopped == 1
+        async with pool.acquire(str(tmp_path)) as executor:
+            assert executor is created[1]
+        await pool.close()
+
+    asyncio.run(scenario())
+    assert [(executor.started, executor.stopped) for executor in created] == [(1, 1), (1, 1)]
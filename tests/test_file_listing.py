@@ -0,0 +1,72 @@
+import asyncio
+import gc
+import os
+import subprocess
+import pytest
+from plugins import file_listing
+from plugins.execution import ExecutorPool
+from plugins.file_plugin import FilePlugin
+
+
+class FakeExecutor:
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+def git_repository(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("x = 1\n")
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "add", "a.py"], cwd=repo, check=True)
+    return repo
+
+
+def listing(plugin: FilePlugin) -> list:
+    return asyncio.run(plugin.list_files_in_repository("repo"))
+
+
+def test_write_through_one_plugin_is_listed_by_another(tmp_path):
+    git_repository(tmp_path)
+    reader, writer = FilePlugin(workspace=str(tmp_path)), FilePlugin(workspace=str(tmp_path))
+    assert listing(reader) == ["a.py"]
+
+    assert "successfully" in writer.overwrite_file("repo", "b.py", "y = 2\n")
+    assert listing(reader) == ["a.py", "b.py"]
+
+
+def test_files_created_by_the_executor_are_listed(tmp_path):
+    repo = git_repository(tmp_path)
+    plugin = FilePlugin(workspace=str(tmp_path))
+    assert listing(plugin) == ["a.py"]
+
+    async def run_script():
+        pool = ExecutorPool(executor_factory=lambda work_dir: FakeExecutor(), idle_timeout=60)
+        async with pool.acquire(str(repo)):
+            (repo / "test_a.py").write_text("def test(): pass\n")
+        await pool.close()
+
+    asyncio.run(run_script())
+    assert listing(plugin) == ["a.py", "test_a.py"]
+
+
+def test_lister_is_dropped_with_the_last_plugin(tmp_path):
+    git_repository(tmp_path)
+    plugin = FilePlugin(workspace=str(tmp_path))
+    listing(plugin)
+    assert os.path.realpath(tmp_path / "repo") in file_listing._LISTERS
+
+    del plugin
+    gc.collect()
+    assert os.path.realpath(tmp_path / "repo") not in file_listing._LISTERS
+
+
+def test_page_size_must_be_positive(tmp_path):
+    repo = git_repository(tmp_path)
+    with pytest.raises(ValueError):
+        file_listing.file_lister(str(repo)).list(page_size=0)
+    result = asyncio.run(FilePlugin(workspace=str(tmp_path)).list_files_in_repository("repo", page_size=0))
+    assert result[0].startswith("Error:")
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from plugins.file_plugin import FilePlugin
+from plugins.file_reader import read_lines
+
+
+def write(tmp_path, content: str, name: str = "m.py") -> str:
+    path = tmp_path / name
+    path.write_bytes(content.encode("utf-8"))
+    return str(path)
+
+
+def test_cap_cuts_at_line_boundary(tmp_path):
+    path = write(tmp_path, "".join(f"line {i}\n" for i in range(1, 101)))
+    text, meta = read_lines(path, max_chars=20)
+    assert text == "line 1\nline 2\n"
+    assert (meta["end_line"], meta["next_column"], meta["truncated"]) == (2, 0, True)
+
+
+def test_newline_at_first_character_is_a_line_boundary(tmp_path):
+    path = write(tmp_path, "\n" + "x" * 50 + "\n")
+    text, meta = read_lines(path, max_chars=10)
+    assert text == "\n"
+    assert (meta["end_line"], meta["next_column"]) == (1, 0)
+
+
+@pytest.mark.parametrize("line", ["x" * 95, "x" + "é€" * 40], ids=["ascii", "multibyte"])
+def test_overlong_line_is_read_in_pieces(tmp_path, line):
+    path = write(tmp_path, "short\n" + line + "\nlast\n")
+    pieces = []
+    text, meta = read_lines(path, start_line=2, max_chars=30)
+    while meta["next_column"]:
+        assert meta["end_line"] == 2
+        pieces.append(text)
+        text, meta = read_lines(path, start_line=2, max_chars=30, start_column=meta["next_column"])
+    pieces.append(text)
+    assert "".join(pieces) == line + "\nlast\n"
+    assert meta["encoding"] == "utf-8"
+    assert meta["end_line"] == 3
+
+
+def test_column_past_the_end_of_the_line_is_clamped(tmp_path):
+    path = write(tmp_path, "abc\ndef\n")
+    text, meta = read_lines(path, start_line=1, start_column=10)
+    assert (text, meta["start_column"]) == ("\ndef\n", 3)
+
+
+def test_read_file_marker_continues_inside_the_line(tmp_path):
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "bundle.js").write_text("var a=" + "1," * 40 + "0;\n")
+    plugin = FilePlugin(workspace=str(tmp_path))
+    first = asyncio.run(plugin.read_file("bundle.js", "repo", max_chars=50))
+    assert first.endswith("continue with start_line=1, start_column=50 ...]")
+    rest = asyncio.run(plugin.read_file("bundle.js", "repo", max_chars=50, start_column=50))
+    assert rest.splitlines()[0].startswith("[file: bundle.js | lines 1-1 from column 50 of 1")
+    assert first.splitlines()[1] + rest.splitlines()[1] == "var a=" + "1," * 40 + "0;"
@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import httpx
+from plugins.github import GitHubPlugin, GitHubSettings
+
+
+class GitHubStub:
+    """In-process stand-in for the contents API: answers with ETags and honours If-None-Match."""
+
+    def __init__(self, files: dict, delay: float = 0.0):
+        self.files = files
+        self.delay = delay
+        self.requests = []
+        # (If-None-Match sent, status answered) per request
+        self.exchanges = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        path = request.url.path.split("/contents/", 1)[1]
+        if path not in self.files:
+            return httpx.Response(404, json={"message": "Not Found"})
+        etag = f'"{len(self.files[path])}-{sum(self.files[path].encode("utf-8"))}"'
+        sent = request.headers.get("If-None-Match")
+        if sent == etag:
+            self.exchanges.append((sent, 304))
+            return httpx.Response(304, headers={"ETag": etag})
+        self.exchanges.append((sent, 200))
+        content = base64.b64encode(self.files[path].encode("utf-8")).decode("ascii")
+        return httpx.Response(200, headers={"ETag": etag}, json={"content": content})
+
+
+def plugin(stub: GitHubStub) -> GitHubPlugin:
+    return GitHubPlugin(GitHubSettings(token="offline"), transport=httpx.MockTransport(stub))
+
+
+def test_unchanged_file_is_revalidated_with_etag():
+    stub = GitHubStub({"src/a.py": "x = 1\n"})
+    github = plugin(stub)
+
+    async def scenario():
+        try:
+            first = await github.fetch_code_from_github("org", "repo", "src/a.py")
+            second = await github.fetch_code_from_github("org", "repo", "src/a.py")
+            stub.files["src/a.py"] = "x = 2\n"
+            third = await github.fetch_code_from_github("org", "repo", "src/a.py")
+        finally:
+            await GitHubPlugin.aclose()
+        return first, second, third
+
+    assert asyncio.run(scenario()) == ("x = 1\n", "x = 1\n", "x = 2\n")
+    assert stub.exchanges == [(None, 200), ('"6-304"', 304), ('"6-304"', 200)]
+
+
+def test_fetch_files_keeps_order_and_limits_concurrency():
+    files = {f"src/m{i}.py": f"value = {i}\n" for i in range(20)}
+    stub = GitHubStub(files, delay=0.01)
+    github = plugin(stub)
+    paths = list(reversed(files)) + ["src/missing.py"]
+
+    async def scenario():
+        try:
+            return await github.fetch_files_from_github("org", "repo", paths, max_concurrency=4)
+        finally:
+            await GitHubPlugin.aclose()
+
+    contents = asyncio.run(scenario())
+    assert list(contents) == paths
+    assert all(contents[path] == files[path] for path in files)
+    assert contents["src/missing.py"].startswith("Error fetching file content: 404")
+    assert len(stub.requests) == 21
+    assert 1 < stub.max_in_flight <= 4
+
+
+def test_aclose_closes_the_pooled_clients():
+    github = plugin(GitHubStub({"src/a.py": "x = 1\n"}))
+
+    async def scenario():
+        await github.fetch_code_from_github("org", "repo", "src/a.py")
+        client, _ = github._connection()
+        await GitHubPlugin.aclose()
+        return client
+
+    assert asyncio.run(scenario()).is_closed
+    assert GitHubPlugin._connections == {}
@@ -0,0 +1,87 @@
+import asyncio
+import subprocess
+from pathlib import Path
+from plugins.github import GitHubPlugin, GitHubSettings, working_tree_diff
+
+
+def git(*args: str, cwd: Path) -> str:
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def commit(work: Path, content: str) -> str:
+    (work / "module.py").write_text(content)
+    git("add", "module.py", cwd=work)
+    git("commit", "-q", "-m", content, cwd=work)
+    return git("rev-parse", "HEAD", cwd=work)
+
+
+def upstream(tmp_path: Path) -> tuple:
+    """A local bare repository at <tmp_path>/upstream/org/repo.git and a clone to push new commits from."""
+    work = tmp_path / "work"
+    work.mkdir()
+    git("init", "-q", "-b", "main", cwd=work)
+    commits = [commit(work, "x = 1\n"), commit(work, "x = 2\n")]
+    bare = tmp_path / "upstream" / "org" / "repo.git"
+    bare.parent.mkdir(parents=True)
+    git("clone", "-q", "--bare", str(work), str(bare), cwd=tmp_path)
+    git("remote", "add", "origin", str(bare), cwd=work)
+    return work, commits
+
+
+def plugin(tmp_path: Path, instance: str) -> GitHubPlugin:
+    settings = GitHubSettings(token="offline", clone_url=str(tmp_path / "upstream"))
+    return GitHubPlugin(settings, workspace=str(tmp_path / "coding" / instance),
+                        mirror_root=str(tmp_path / "coding" / ".mirrors"), mirror_refresh_seconds=3600)
+
+
+def test_instances_share_one_mirror_and_check_out_their_own_commit(tmp_path):
+    _, commits = upstream(tmp_path)
+    first, second = plugin(tmp_path, "first"), plugin(tmp_path, "second")
+
+    async def scenario():
+        for instance in (first, second):
+            assert "erfolgreich" in await instance.clone_repository("org", "repo")
+        assert "Success" in await first.checkout_commit("repo", commits[0])
+        assert "Success" in await second.checkout_commit("repo", commits[1])
+
+    asyncio.run(scenario())
+    assert (tmp_path / "coding" / "first" / "repo" / "module.py").read_text() == "x = 1\n"
+    assert (tmp_path / "coding" / "second" / "repo" / "module.py").read_text() == "x = 2\n"
+    assert [path.name for path in (tmp_path / "coding" / ".mirrors" / "org").iterdir()] == ["repo.git"]
+    # Worktrees, not clones: the checkouts use the mirror's object store
+    assert (tmp_path / "coding" / "first" / "repo" / ".git").is_file()
+
+
+def test_checkout_fetches_commits_newer_than_the_mirror(tmp_path):
+    work, _ = upstream(tmp_path)
+    instance = plugin(tmp_path, "first")
+
+    async def scenario():
+        await instance.clone_repository("org", "repo")
+        newer = commit(work, "x = 3\n")
+        git("push", "-q", "origin", "main", cwd=work)
+        return newer, await instance.checkout_commit("repo", newer)
+
+    newer, result = asyncio.run(scenario())
+    assert result == f"Successfully checked out to commit: {newer}"
+    assert (tmp_path / "coding" / "first" / "repo" / "module.py").read_text() == "x = 3\n"
+
+
+def test_clone_of_unknown_repository_reports_error(tmp_path):
+    upstream(tmp_path)
+    result = asyncio.run(plugin(tmp_path, "first").clone_repository("org", "missing"))
+    assert result.startswith("Fehler beim Klonen")
+
+
+def test_working_tree_diff_leaves_out_excluded_files(tmp_path):
+    work, commits = upstream(tmp_path)
+    (work / "module.py").write_text("x = 3\n")
+    (work / "new.py").write_text("y = 1\n")
+    (work / "temp_test_1.py").write_text("def test(): pass\n")
+    (work / "pkg").mkdir()
+    (work / "pkg" / "tmp_code_ab12.sh").write_text("pytest\n")
+
+    patch = asyncio.run(working_tree_diff(str(work), commits[-1], exclude=("temp_test*", "tmp_code_*")))
+    changed = [line.split(" b/")[-1] for line in patch.splitlines() if line.startswith("diff --git")]
+    assert changed == ["module.py", "new.py"]
@@ -0,0 +1,72 @@
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_call_content import FunctionCallContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from history import TokenBudgetHistoryReducer
+
+SYSTEM = ChatMessageContent(role=AuthorRole.SYSTEM, content="You fix bugs.")
+ISSUE = ChatMessageContent(role=AuthorRole.USER, content="parse_header drops the last field.")
+
+
+def tool_turn(number: int, output_chars: int = 8000) -> list:
+    call_id = f"call_{number}"
+    return [
+        ChatMessageContent(role=AuthorRole.ASSISTANT, items=[
+            FunctionCallContent(id=call_id, name="FilePlugin-read_file", arguments=f'{{"file_path": "m{number}.py"}}'),
+        ]),
+        ChatMessageContent(role=AuthorRole.TOOL, items=[
+            FunctionResultContent(id=call_id, function_name="read_file", plugin_name="FilePlugin",
+                                  result=f"# m{number}.py\n" + "x = 1\n" * (output_chars // 6)),
+        ]),
+        ChatMessageContent(role=AuthorRole.ASSISTANT, content=f"m{number}.py does not define parse_header."),
+    ]
+
+
+def conversation(turns: int) -> list:
+    return [SYSTEM, ISSUE] + [message for number in range(turns) for message in tool_turn(number)]
+
+
+def assert_calls_and_results_pair_up(messages: list):
+    pending = set()
+    for message in messages:
+        for item in message.items:
+            if isinstance(item, FunctionCallContent):
+                pending.add(item.id)
+            elif isinstance(item, FunctionResultContent):
+                assert item.id in pending, f"result {item.id} without its call"
+                pending.discard(item.id)
+    assert not pending, f"calls without results: {pending}"
+
+
+def test_history_under_budget_is_unchanged():
+    reducer = TokenBudgetHistoryReducer(max_tokens=100_000)
+    messages = conversation(2)
+    assert reducer.reduce(messages) == messages
+    assert reducer.stats["tokens_saved"] == 0
+
+
+def test_reduced_history_fits_budget_and_keeps_pinned_and_recent_messages():
+    reducer = TokenBudgetHistoryReducer(max_tokens=3000, keep_last=3, tool_output_chars=600)
+    messages = conversation(10)
+    reduced = reducer.reduce(messages, caller="Programmer")
+
+    assert reducer.count(reduced) <= 3000 < reducer.count(messages)
+    assert reduced[:2] == [SYSTEM, ISSUE]
+    assert reduced[-1] == messages[-1]
+    assert_calls_and_results_pair_up(reduced)
+    # The oldest turns go first
+    assert "m0.py" not in "".join(str(message.content) + str(message.items) for message in reduced[2:])
+    assert reducer.stats["tokens_saved:Programmer"] == reducer.count(messages) - reducer.count(reduced)
+
+
+def test_recent_tool_outputs_are_truncated_when_they_alone_exceed_the_budget():
+    reducer = TokenBudgetHistoryReducer(max_tokens=1500, keep_last=6, tool_output_chars=400)
+    messages = [SYSTEM, ISSUE] + tool_turn(0, output_chars=20000) + tool_turn(1, output_chars=20000)
+    reduced = reducer.reduce(messages)
+
+    assert reducer.count(reduced) <= 1500
+    assert_calls_and_results_pair_up(reduced)
+    results = [item.result for message in reduced for item in message.items if isinstance(item, FunctionResultContent)]
+    assert results and all("characters truncated" in result for result in results)
+    # The full history is not modified
+    assert len(messages[3].items[0].result) > 19000
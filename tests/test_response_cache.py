@@ -0,0 +1,87 @@
+import asyncio
+import json
+import httpx
+import pytest
+from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.exceptions.service_exceptions import ServiceResponseException
+from semantic_kernel.functions.kernel_function_decorator import kernel_function
+from services import KernelFactory, ResponseCache
+
+
+class WeatherPlugin:
+    @kernel_function
+    def weather(self, city: str) -> str:
+        """Returns the weather of a city."""
+        return f"sunny in {city}"
+
+
+def tool_calling_model(requests: list):
+    """Asks for the weather tool first and answers with its result once it is in the conversation."""
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        tool_results = [message for message in body["messages"] if message["role"] == "tool"]
+        if tool_results:
+            message = {"role": "assistant", "content": f"The weather is {tool_results[-1]['content']}."}
+            finish_reason = "stop"
+        else:
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_1", "type": "function",
+                "function": {"name": "WeatherPlugin-weather", "arguments": json.dumps({"city": "Berlin"})},
+            }]}
+            finish_reason = "tool_calls"
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-{len(requests)}", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+    return httpx.MockTransport(handle)
+
+
+def offline_model(request: httpx.Request) -> httpx.Response:
+    raise AssertionError("replay must not reach the model")
+
+
+async def ask(cache: ResponseCache, cache_mode: str, transport: httpx.AsyncBaseTransport) -> str:
+    factory = KernelFactory(api_key="offline", cache=cache, cache_mode=cache_mode, transport=transport)
+    try:
+        kernel = factory.create_kernel("coder")
+        kernel.add_plugin(WeatherPlugin(), plugin_name="WeatherPlugin")
+        settings = kernel.get_prompt_execution_settings_from_service_id(service_id="coder")
+        settings.function_choice_behavior = FunctionChoiceBehavior.Auto()
+        history = ChatHistory()
+        history.add_user_message("What is the weather in Berlin?")
+        service = kernel.get_service("coder")
+        messages = await service.get_chat_message_contents(history, settings, kernel=kernel)
+        return messages[0].content
+    finally:
+        await factory.close()
+
+
+def test_record_then_replay_tool_calling_turn(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    requests = []
+
+    recorded = asyncio.run(ask(cache, "record", tool_calling_model(requests)))
+    assert recorded == "The weather is sunny in Berlin."
+    assert len(requests) == 2
+
+    replayed = asyncio.run(ask(cache, "replay", httpx.MockTransport(offline_model)))
+    assert replayed == recorded
+
+
+def test_auto_mode_reuses_recorded_turn(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    requests = []
+    asyncio.run(ask(cache, "auto", tool_calling_model(requests)))
+    asyncio.run(ask(cache, "auto", tool_calling_model(requests)))
+    assert len(requests) == 2
+
+
+def test_replay_miss_is_an_error(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    with pytest.raises(ServiceResponseException):
+        asyncio.run(ask(cache, "replay", httpx.MockTransport(offline_model)))
@@ -0,0 +1,72 @@
+import pytest
+from semantic_kernel.agents import ChatCompletionAgent
+from semantic_kernel.connectors.ai.open_ai import OpenAIChatPromptExecutionSettings
+from results import llm_usage
+from routing import ModelEscalator, ModelRouter, parse_prices
+from tracing import CURRENT_TRACER, Tracer
+
+TIERS = {"fast": "gpt-4o-mini", "standard": "gpt-4.1-mini", "strong": "gpt-4.1"}
+
+
+def coder(model=None) -> ChatCompletionAgent:
+    settings = OpenAIChatPromptExecutionSettings(service_id="coder", ai_model_id=model)
+    return ChatCompletionAgent(service_id="coder", name="Programmer", execution_settings=settings)
+
+
+def test_router_maps_services_to_tier_models():
+    router = ModelRouter(TIERS, service_tiers={"tester": "strong"})
+    assert router.model_for("coder") == "gpt-4.1-mini"
+    assert router.model_for("tester") == "gpt-4.1"
+    assert router.model_for("unknown") == "gpt-4.1-mini"
+    with pytest.raises(ValueError):
+        ModelRouter({"fast": "gpt-4o-mini", "standard": "gpt-4o"})
+    with pytest.raises(ValueError):
+        ModelRouter(TIERS, service_tiers={"coder": "huge"})
+
+
+def test_cost_uses_prices_per_million_tokens():
+    router = ModelRouter(TIERS, prices=parse_prices("gpt-4.1=3/12, local-model=0/0"))
+    assert router.cost("gpt-4o-mini", 1_000_000, 0) == pytest.approx(0.15)
+    assert router.cost("gpt-4.1", 200_000, 50_000) == pytest.approx(0.6 + 0.6)
+    assert router.cost("unpriced", 10_000, 10_000) == 0.0
+    with pytest.raises(ValueError):
+        parse_prices("gpt-4.1=cheap")
+
+
+def test_escalates_one_tier_after_every_n_failures(tmp_path):
+    router = ModelRouter(TIERS)
+    agent = coder()
+    escalator = ModelEscalator(router, agent, after_failures=2)
+    tracer = Tracer("org__repo-1", path=str(tmp_path / "trace.jsonl"))
+    token = CURRENT_TRACER.set(tracer)
+    try:
+        models = []
+        for _ in range(6):
+            escalator(None)
+            models.append(agent.execution_settings.ai_model_id)
+    finally:
+        CURRENT_TRACER.reset(token)
+
+    assert models == [None, "gpt-4.1", "gpt-4.1", "gpt-4.1", "gpt-4.1", "gpt-4.1"]
+    # Already on the strongest tier, so later failures change nothing
+    assert (escalator.tier, escalator.escalations, escalator.failures) == ("strong", 1, 6)
+    assert llm_usage(tracer.close())["escalations"] == 1
+
+
+def test_tiers_sharing_a_model_are_skipped():
+    router = ModelRouter({"fast": "gpt-4o-mini", "standard": "gpt-4o-mini", "strong": "gpt-4o"},
+                         service_tiers={"coder": "fast"})
+    agent = coder()
+    escalator = ModelEscalator(router, agent, after_failures=1)
+    escalator(None)
+    assert agent.execution_settings.ai_model_id == "gpt-4o"
+    assert escalator.tier == "strong"
+
+
+def test_escalation_can_be_disabled():
+    agent = coder("gpt-4o-mini")
+    escalator = ModelEscalator(ModelRouter(TIERS), agent, after_failures=0)
+    for _ in range(3):
+        escalator(None)
+    assert agent.execution_settings.ai_model_id == "gpt-4o-mini"
+    assert escalator.escalations == 0
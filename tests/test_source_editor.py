@@ -0,0 +1,68 @@
+import ast
+import pytest
+from plugins import source_editor
+from plugins.file_plugin import FilePlugin
+from plugins.source_editor import SourceEditError
+
+MODULE = '''def f(x):
+    """Doc."""
+    return x
+
+
+def g():
+    return 2
+'''
+
+
+@pytest.fixture
+def plugin(tmp_path):
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "m.py").write_text(MODULE)
+    return FilePlugin(workspace=str(tmp_path))
+
+
+def test_modify_function_rejects_unparseable_body(plugin, tmp_path):
+    result = plugin.modify_function("repo", "m.py", "f", "return (x +")
+    assert result.startswith("Error:")
+    assert (tmp_path / "repo" / "m.py").read_text() == MODULE
+    assert plugin.list_functions("repo", "m.py") == ["f", "g"]
+
+
+def test_modify_function_rejects_broken_def(plugin, tmp_path):
+    result = plugin.modify_function("repo", "m.py", "g", "def g(:\n    return 3")
+    assert result.startswith("Error:")
+    assert (tmp_path / "repo" / "m.py").read_text() == MODULE
+
+
+def test_modify_function_body_keeps_docstring(plugin, tmp_path):
+    assert "successful" in plugin.modify_function("repo", "m.py", "f", "return x + 1")
+    assert (tmp_path / "repo" / "m.py").read_text().startswith('def f(x):\n    """Doc."""\n    return x + 1\n')
+
+
+def test_edit_that_would_not_parse_is_not_written(plugin, tmp_path):
+    result = plugin.modify_function_args("repo", "m.py", "f", ["x", "y=", "z"])
+    assert result.startswith("Error:")
+    assert (tmp_path / "repo" / "m.py").read_text() == MODULE
+
+
+@pytest.mark.parametrize("source", [
+    "if a:\n    x = 1\nelse:\n    def f():\n        pass\n",
+    "try:\n    x = 1\nfinally:\n    def f():\n        pass\n",
+    "try:\n    x = 1\nexcept ValueError:\n    def f():\n        pass\n",
+    "class C:\n    def f(self):\n        pass\n",
+])
+def test_remove_only_statement_of_a_block_leaves_pass(source):
+    modified = source_editor.remove_function(source, ast.parse(source), "f")
+    ast.parse(modified)
+    assert "def f" not in modified
+    assert "pass" in modified
+
+
+def test_remove_function_keeps_other_statements():
+    source = "if a:\n    x = 1\n    def f():\n        pass\n"
+    assert source_editor.remove_function(source, ast.parse(source), "f") == "if a:\n    x = 1\n"
+
+
+def test_replace_function_with_invalid_content_raises():
+    with pytest.raises(SourceEditError):
+        source_editor.replace_function(MODULE, ast.parse(MODULE), "f", "return (x +")
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.function_result_content import FunctionResultContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from sk_prompts import TESTER_NAME
+from strategies import LayeredTerminationStrategy, parse_test_output
+
+PASSED = """\
+============================= test session starts ==============================
+collected 3 items
+
+tests/test_m.py ...                                                      [100%]
+
+============================== 3 passed in 0.05s ===============================
+"""
+
+FAILED = """\
+============================= test session starts ==============================
+collected 2 items
+
+tests/test_m.py .F                                                       [100%]
+
+=========================== short test summary info ============================
+FAILED tests/test_m.py::test_edge - AssertionError: assert 1 == 2
+========================= 1 failed, 1 passed in 0.08s ==========================
+"""
+
+QUIET_PASSED = """\
+...                                                                      [100%]
+3 passed in 0.04s
+"""
+
+QUIET_FAILED = """\
+.F.                                                                      [100%]
+=================================== FAILURES ===================================
+___________________________________ test_b ____________________________________
+E       assert 0x7f3a == 2
+FAILED test_temp.py::test_b - assert 0x7f3a == 2
+1 failed, 2 passed, 1 warning in 0.10s
+"""
+
+CRASHED = """\
+exitcode: 1 (execution failed)
+Code output: ModuleNotFoundError: No module named 'astropy'
+"""
+
+EXIT_CODE_PASSED = "exitcode: 0 (execution succeeded)\nCode output: ...                      [100%]\n3 passed in 0.05s\n"
+
+
+@pytest.mark.parametrize("output, exit_code, counts, failures, passed, failed", [
+    (PASSED, None, {"passed": 3}, [], True, False),
+    (FAILED, None, {"failed": 1, "passed": 1}, ["tests/test_m.py::test_edge - AssertionError: assert 1 == 2"], False, True),
+    (QUIET_PASSED, None, {"passed": 3}, [], True, False),
+    (QUIET_FAILED, None, {"failed": 1, "passed": 2}, ["test_temp.py::test_b - assert 0x7f3a == 2"], False, True),
+    (CRASHED, 1, {}, ["Code output: ModuleNotFoundError: No module named 'astropy'"], False, True),
+    (EXIT_CODE_PASSED, 0, {"passed": 3}, [], True, False),
+    ("Installing collected packages: six\n", None, {}, [], False, False),
+], ids=["passed", "failed", "quiet-passed", "quiet-failed", "crashed", "exit-code-passed", "inconclusive"])
+def test_parse_test_output(output, exit_code, counts, failures, passed, failed):
+    outcome = parse_test_output(output)
+    assert outcome.exit_code == exit_code
+    assert outcome.counts == counts
+    assert outcome.failures == failures
+    assert outcome.passed is passed
+    assert outcome.failed is failed
+    assert outcome.conclusive is (passed or failed)
+
+
+def test_signature_ignores_addresses_and_numbers():
+    first = parse_test_output(QUIET_FAILED)
+    second = parse_test_output(QUIET_FAILED.replace("0x7f3a", "0x55c1"))
+    assert first.signature == second.signature
+    assert first.signature != parse_test_output(FAILED).signature
+
+
+def turn_of_tester(output: str) -> list:
+    result = FunctionResultContent(id="call_1", function_name="run_code_executor_agent",
+                                   plugin_name="ExecutorPlugin", result=output)
+    return [
+        ChatMessageContent(role=AuthorRole.USER, content="Fix the bug."),
+        ChatMessageContent(role=AuthorRole.TOOL, name=TESTER_NAME, items=[result]),
+    ]
+
+
+def decide(strategy: LayeredTerminationStrategy, output: str) -> bool:
+    return asyncio.run(strategy.should_agent_terminate(None, turn_of_tester(output)))
+
+
+def test_passing_run_stops_as_passed():
+    strategy = LayeredTerminationStrategy()
+    assert decide(strategy, QUIET_PASSED) is True
+    assert strategy.stop_reason == "passed"
+
+
+def test_repeated_failure_stops_without_counting_as_passed():
+    strategy = LayeredTerminationStrategy(max_repeated_failures=3)
+    assert [decide(strategy, FAILED) for _ in range(3)] == [False, False, True]
+    assert strategy.stop_reason == "repeated_failure"
+    assert strategy.counters["local:repeated_failure"] == 1
@@ -0,0 +1,42 @@
+import os
+from plugins.symbol_index import SymbolIndex
+
+
+def make_index(tmp_path) -> SymbolIndex:
+    return SymbolIndex(repo_path=str(tmp_path / "repo"), index_path=str(tmp_path / "index" / "repo.json"))
+
+
+def test_edits_are_persisted_lazily(tmp_path):
+    (tmp_path / "repo").mkdir()
+    module = tmp_path / "repo" / "m.py"
+    module.write_text("def f():\n    pass\n")
+    index = make_index(tmp_path)
+    assert index.refresh() == 1
+    saved_at = os.stat(index.index_path).st_mtime_ns
+
+    for name in ("g", "h"):
+        source = f"def {name}():\n    pass\n"
+        module.write_text(source)
+        index.update_file("m.py", source)
+    assert [symbol["name"] for symbol in index.symbols()] == ["h"]
+    assert os.stat(index.index_path).st_mtime_ns == saved_at
+    assert index.dirty
+
+    index.flush()
+    assert not index.dirty
+    assert [symbol["name"] for symbol in make_index(tmp_path).symbols()] == ["h"]
+
+
+def test_index_saved_without_pending_edits_is_corrected_by_refresh(tmp_path):
+    (tmp_path / "repo").mkdir()
+    module = tmp_path / "repo" / "m.py"
+    module.write_text("def f():\n    pass\n")
+    make_index(tmp_path).refresh()
+
+    index = make_index(tmp_path)
+    module.write_text("def renamed():\n    pass\n\n\ndef other():\n    pass\n")
+    index.update_file("m.py")
+    # The process ends without a flush; the next one re-indexes the file from its new mtime and size
+    reloaded = make_index(tmp_path)
+    assert reloaded.refresh() == 1
+    assert [symbol["name"] for symbol in reloaded.symbols()] == ["renamed", "other"]
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from transcripts import TranscriptWriter, read_transcript
+
+
+def test_full_queue_makes_writers_wait(tmp_path):
+    writer = TranscriptWriter(str(tmp_path), max_queue=2, flush_interval=0.01)
+
+    async def scenario():
+        async def produce():
+            for turn in range(5):
+                await writer.write("org__repo-1", "assistant", "Programmer", f"turn {turn}")
+
+        producer = asyncio.create_task(produce())
+        await asyncio.sleep(0.05)
+        # Nothing drains the queue yet, so the producer is stuck on the third entry
+        blocked = not producer.done() and writer._queue.full()
+        writer.start()
+        await producer
+        await writer.close()
+        return blocked
+
+    assert asyncio.run(scenario())
+    assert writer.stats["backpressure_waits"] >= 1
+    entries = read_transcript(writer.path("org__repo-1"))
+    assert [entry["content"] for entry in entries] == [f"turn {turn}" for turn in range(5)]
+
+
+def test_close_writes_queued_entries_without_waiting_for_the_interval(tmp_path):
+    received = []
+    writer = TranscriptWriter(str(tmp_path), subscribers=[received.append], batch_size=1000, flush_interval=60)
+
+    async def scenario():
+        async with writer:
+            for instance in ("a", "b"):
+                await writer.write(instance, "user", None, f"issue {instance}")
+                await writer.write(instance, "assistant", "Tester", "3 passed", partial=True)
+            start = time.perf_counter()
+        return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) < 5
+    assert [(entry["instance"], entry["seq"]) for entry in received] == [("a", 1), ("a", 2), ("b", 1), ("b", 2)]
+    assert read_transcript(writer.path("b"))[1] == received[3]
+    assert read_transcript(writer.path("b"))[1]["partial"] is True
+
+
+def test_retry_appends_a_gzip_member_to_the_transcript(tmp_path):
+    async def attempt(content: str):
+        async with TranscriptWriter(str(tmp_path)) as writer:
+            await writer.write("org__repo-1", "user", None, content)
+            await writer.close_instance("org__repo-1")
+        return writer.path("org__repo-1")
+
+    asyncio.run(attempt("first attempt"))
+    path = asyncio.run(attempt("second attempt"))
+    with open(path, "rb") as file:
+        assert file.read().count(b"\x1f\x8b\x08") == 2
+    assert [(entry["seq"], entry["content"]) for entry in read_transcript(path)] == [
+        (1, "first attempt"), (1, "second attempt"),
+    ]
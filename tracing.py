@@ -0,0 +1,198 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from semantic_kernel.filters.functions.function_invocation_context import FunctionInvocationContext
+
+# A sink receives every record (dict) as it is written, and the summary record at the end
+Sink = Callable[[dict], None]
+
+# The tracer of the instance running in the current task; asyncio tasks and to_thread copy it
+CURRENT_TRACER: ContextVar[Optional["Tracer"]] = ContextVar("current_tracer", default=None)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Tracer:
+    """Records timed spans of one instance to a local JSONL file and aggregates them for a summary.
+
+    Numeric fields ending in _tokens or _usd are summed per span name, fields ending in _ms are
+    summarised as percentiles and True booleans are counted.
+
+    Span kinds used in this repo:
+        llm: one chat completion call, named by service id (prompt/completion tokens, model, cached;
+             streamed calls also ttft_ms, the time to the first chunk; routed calls tier and cost_usd)
+        tier: the same calls again, named by model tier, when the services are routed
+        escalation: an agent moved to a stronger tier, named by agent
+        turn: one agent turn, named by agent (streamed turns also ttft_ms, the time to the first text)
+        function: one kernel function invocation, named plugin.function
+        git, docker: process level work below the tools
+        selection, termination: strategy overhead, including fallback model calls
+    """
+
+    def __init__(self, instance_id: str, path: Optional[str] = None, sinks: Optional[List[Sink]] = None):
+        self.instance_id = instance_id
+        self.path = path
+        self.sinks = list(sinks or [])
+        self.started = time.time()
+        self._file = None
+        # (kind, name) -> {"count", "errors", "durations", token and other numeric totals}
+        self._aggregates: Dict[tuple, dict] = defaultdict(lambda: {"count": 0, "errors": 0, "durations": []})
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, kind: str, name: str, duration: float, error: Optional[str] = None, **fields):
+        entry = {
+            "ts": round(time.time(), 3),
+            "instance": self.instance_id,
+            "kind": kind,
+            "name": name,
+            "duration_ms": round(duration * 1000, 2),
+            **fields,
+        }
+        if error:
+            entry["error"] = error
+
+        aggregate = self._aggregates[(kind, name)]
+        aggregate["count"] += 1
+        aggregate["errors"] += 1 if error else 0
+        aggregate["durations"].append(duration)
+        for key, value in fields.items():
+            if key.endswith("_tokens") and isinstance(value, int):
+                aggregate[key] = aggregate.get(key, 0) + value
+            elif key.endswith("_usd") and isinstance(value, float):
+                aggregate[key] = aggregate.get(key, 0.0) + value
+            elif key.endswith("_ms") and isinstance(value, (int, float)) and not isinstance(value, bool):
+                aggregate.setdefault(f"_{key}", []).append(value)
+            elif isinstance(value, bool) and value:
+                aggregate[key] = aggregate.get(key, 0) + 1
+
+        self._write(entry)
+
+    def _write(self, entry: dict):
+        if self._file is not None:
+            self._file.write(json.dumps(entry, default=str) + "\n")
+        for sink in self.sinks:
+            try:
+                sink(entry)
+            except Exception as e:
+                # A broken sink must never take down the instance
+                print(f"TRACE SINK {sink!r} failed: {e}")
+
+    @contextmanager
+    def span(self, kind: str, name: str, **fields):
+        """Times the block; fields added to the yielded dict inside the block are recorded too."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield fields
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - start, error=error, **fields)
+
+    def summary(self) -> dict:
+        spans = defaultdict(dict)
+        for (kind, name), aggregate in sorted(self._aggregates.items()):
+            durations = aggregate["durations"]
+            stats = spans[kind][name] = {
+                "count": aggregate["count"],
+                "errors": aggregate["errors"],
+                "total_s": round(sum(durations), 3),
+                "p50_ms": round(percentile(durations, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(durations, 0.95) * 1000, 1),
+                "max_ms": round(max(durations) * 1000, 1),
+            }
+            for key, value in aggregate.items():
+                if key.startswith("_"):
+                    # e.g. _ttft_ms -> ttft_p50_ms, ttft_p95_ms
+                    field = key[1:-len("_ms")]
+                    stats[f"{field}_p50_ms"] = round(percentile(value, 0.5), 1)
+                    stats[f"{field}_p95_ms"] = round(percentile(value, 0.95), 1)
+                elif key.endswith("_usd"):
+                    stats[key] = round(value, 6)
+                elif key not in ("count", "errors", "durations"):
+                    stats[key] = value
+        return {
+            "instance": self.instance_id,
+            "kind": "summary",
+            "wall_s": round(time.time() - self.started, 3),
+            "spans": dict(spans),
+        }
+
+    def close(self, status: str = "Success") -> dict:
+        """Writes the summary (also to <path>.summary.json) and closes the trace file."""
+        summary = {**self.summary(), "status": status}
+        self._write(summary)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            with open(f"{os.path.splitext(self.path)[0]}.summary.json", "w", encoding="utf-8") as file:
+                json.dump(summary, file, indent=2)
+        return summary
+
+
+def current_tracer() -> Optional[Tracer]:
+    return CURRENT_TRACER.get()
+
+
+def trace(kind: str, name: str, **fields):
+    """Span on the current instance's tracer, or a no-op outside of an instance."""
+    tracer = CURRENT_TRACER.get()
+    if tracer is None:
+        return nullcontext(fields)
+    return tracer.span(kind, name, **fields)
+
+
+async def trace_function_invocation(context: FunctionInvocationContext, next):
+    """Kernel function invocation filter that records every tool call as a 'function' span."""
+    name = f"{context.function.plugin_name}.{context.function.name}" if context.function.plugin_name else context.function.name
+    with trace("function", name):
+        await next(context)
+
+
+def format_summary(summary: dict) -> str:
+    """One line per span kind for the console."""
+    lines = [f"TRACE {summary['instance']} {summary.get('status', '')} in {summary['wall_s']}s"]
+    for kind, names in summary["spans"].items():
+        parts = []
+        for name, stats in names.items():
+            tokens = "".join(f" {key.replace('_tokens', '')}={value}" for key, value in stats.items() if key.endswith("_tokens"))
+            ttft = f" ttft p50 {stats['ttft_p50_ms']}ms" if "ttft_p50_ms" in stats else ""
+            cost = f" ${stats['cost_usd']:.4f}" if "cost_usd" in stats else ""
+            parts.append(f"{name} x{stats['count']} {stats['total_s']}s (p95 {stats['p95_ms']}ms){ttft}{tokens}{cost}")
+        lines.append(f"  {kind}: " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+class AgentOpsSink:
+    """Forwards LLM and tool spans to an agentops session, so agentops stays optional."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def __call__(self, entry: dict):
+        from agentops import LLMEvent, ToolEvent
+
+        if entry["kind"] == "llm":
+            self.session.record(LLMEvent(
+                model=entry.get("model"),
+                prompt_tokens=entry.get("prompt_tokens"),
+                completion_tokens=entry.get("completion_tokens"),
+                params={"service_id": entry["name"], "duration_ms": entry["duration_ms"], "ttft_ms": entry.get("ttft_ms")},
+            ))
+        elif entry["kind"] == "function":
+            self.session.record(ToolEvent(name=entry["name"], params={"duration_ms": entry["duration_ms"]},
+                                          logs=entry.get("error")))
+        elif entry["kind"] == "summary":
+            self.session.end_session("Success" if entry.get("status") == "Success" else "Fail")
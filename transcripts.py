@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional
+
+# A subscriber receives every transcript entry (dict) after its batch was written
+Subscriber = Callable[[dict], None]
+
+# Queue marker that closes the transcript file of one instance
+_CLOSE = object()
+
+
+def console_subscriber(entry: dict):
+    """Prints complete entries the way the group chat loop used to print them inline."""
+    if entry.get("partial"):
+        return
+    print(f"[{entry['instance']}] # {entry['role']} - {entry['name'] or '*'}: '{entry['content']}'")
+
+
+class StreamingConsoleSubscriber:
+    """Prints partial entries (partial=True) inline as they arrive, and complete entries that were not streamed.
+
+    Concurrent instances take turns on the console, so a new header line starts whenever the
+    streaming speaker changes.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._current: Optional[tuple] = None
+        self._streamed = set()
+
+    def __call__(self, entry: dict):
+        key = (entry["instance"], entry["name"])
+        if entry.get("partial"):
+            if key != self._current:
+                self._end_line()
+                self.stream.write(f"[{entry['instance']}] # {entry['role']} - {entry['name'] or '*'}: ")
+                self._current = key
+            self._streamed.add(key)
+            self.stream.write(entry["content"])
+            self.stream.flush()
+            return
+        if key in self._streamed and entry["role"] == "assistant" and entry["content"]:
+            # Already on the console as it was generated
+            self._streamed.discard(key)
+            if key == self._current:
+                self._end_line()
+            return
+        self._end_line()
+        console_subscriber(entry)
+
+    def _end_line(self):
+        if self._current is not None:
+            self.stream.write("\n")
+            self._current = None
+
+
+def read_transcript(path: str) -> List[dict]:
+    """All entries of a transcript file, including those appended by earlier attempts."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class TranscriptWriter:
+    """Writes the messages of every instance to <directory>/<instance_id>.jsonl.gz from a background task.
+
+    Streamed turns add their chunks as entries with partial=True ahead of the complete messages.
+
+    The chat loops only put entries on a bounded queue; the writer task takes them in batches of up
+    to batch_size (or whatever arrived within flush_interval), appends each batch to the instance
+    files in a worker thread and then hands the entries to the subscribers. When the queue is full,
+    write() waits, so a slow disk slows the chats down instead of growing memory without bound.
+    """
+
+    def __init__(self, directory: str, subscribers: Optional[List[Subscriber]] = None, max_queue: int = 1024,
+                 batch_size: int = 64, flush_interval: float = 0.5):
+        self.directory = directory
+        self.subscribers = list(subscribers or [])
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = Counter()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._files: Dict[str, object] = {}
+        self._sequence: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, instance_id: str) -> str:
+        return os.path.join(self.directory, f"{instance_id}.jsonl.gz")
+
+    async def __aenter__(self) -> "TranscriptWriter":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def write(self, instance_id: str, role: str, name: Optional[str], content: Optional[str], **fields):
+        """Queues one message of an instance; waits while the queue is full."""
+        self._sequence[instance_id] += 1
+        entry = {
+            "ts": round(time.time(), 3),
+            "instance": instance_id,
+            "seq": self._sequence[instance_id],
+            "role": role,
+            "name": name,
+            "content": content,
+            **fields,
+        }
+        await self._put((instance_id, entry))
+
+    async def close_instance(self, instance_id: str):
+        """Closes the instance's file once its queued entries are written."""
+        await self._put((instance_id, _CLOSE))
+
+    async def close(self):
+        """Writes everything still queued and closes all files."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _put(self, item):
+        if self._queue.full():
+            self.stats["backpressure_waits"] += 1
+        await self._queue.put(item)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                stopping = True
+
+            try:
+                await asyncio.to_thread(self._write_batch, batch, stopping)
+            except Exception as e:
+                # Losing a transcript must never take down the instances
+                print(f"TRANSCRIPT write failed: {e}")
+            self.stats["batches"] += 1
+            for _, entry in batch:
+                if entry is _CLOSE:
+                    continue
+                self.stats["entries"] += 1
+                for subscriber in self.subscribers:
+                    try:
+                        subscriber(entry)
+                    except Exception as e:
+                        print(f"TRANSCRIPT SUBSCRIBER {subscriber!r} failed: {e}")
+
+    def _write_batch(self, batch: list, close_all: bool):
+        """Runs in a worker thread: one write and one flush per instance file in the batch."""
+        lines = defaultdict(list)
+        closing = []
+        for instance_id, entry in batch:
+            if entry is _CLOSE:
+                closing.append(instance_id)
+            else:
+                lines[instance_id].append(json.dumps(entry, default=str) + "\n")
+        for instance_id, chunk in lines.items():
+            file = self._files.get(instance_id)
+            if file is None:
+                # Appending adds a gzip member per attempt; gzip readers concatenate them
+                file = self._files[instance_id] = gzip.open(self.path(instance_id), "at", encoding="utf-8")
+            file.write("".join(chunk))
+            file.flush()
+        for instance_id in list(self._files) if close_all else closing:
+            file = self._files.pop(instance_id, None)
+            if file is not None:
+                file.close()